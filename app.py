@@ -1,27 +1,68 @@
-from flask import Flask
-from config.config import TELEGRAM_TOKEN
+import threading
+from config.config import TELEGRAM_TOKEN, METRICS_ENABLED, METRICS_HOST, METRICS_PORT
 from utils.db_init import initialize_database
 from services.database.db_service import DatabaseService
+from services.dispatch.dispatch_service import DispatchService
 from services.telegram.telegram_service import TelegramService
+from services.metrics.metrics import registry
 
-app = Flask(__name__)
+def create_app(telegram_service: TelegramService = None):
+    '''Flask app for health checks and metrics; Flask is only imported when it is served'''
+    from flask import Flask, Response
 
-initialize_database()
+    app = Flask(__name__)
 
-db_service = DatabaseService()
-telegram_service = TelegramService(TELEGRAM_TOKEN, db_service)
+    @app.route('/')
+    def home():
+        return "Momentum Financial Bot is running!"
 
-@app.route('/')
-def home():
-    return "Momentum Financial Bot is running!"
+    @app.route('/metrics')
+    def metrics():
+        gauges = None
+        if telegram_service is not None:
+            try:
+                gauges = telegram_service.stats()
+            except Exception as e:
+                # The bot's event loop may be changing the stats while they are read
+                print(f"Error reading service stats: {e}")
+        return Response(registry.render(gauges), mimetype='text/plain; version=0.0.4')
+
+    return app
+
+def serve_metrics(telegram_service: TelegramService):
+    '''Serve the Flask app on METRICS_PORT; runs in its own thread next to the bot'''
+    from werkzeug.serving import make_server
+
+    try:
+        make_server(METRICS_HOST, METRICS_PORT, create_app(telegram_service), threaded=True).serve_forever()
+    except Exception as e:
+        print(f"Error serving metrics on port {METRICS_PORT}: {e}")
+
+def prepare_database(db_service: DatabaseService):
+    '''Create the schema, then open the pool's connections; retries can take over a minute'''
+    try:
+        initialize_database()
+    finally:
+        # If initialization gave up, queries fail with the database's own error rather than hang
+        db_service.mark_ready()
+    db_service.prefill()
 
 def main():
-    print("Bot is running!")
-    telegram_service.setup()
-    telegram_service.run()
+    db_service = DatabaseService(prefill=False, schema_ready=False)
+    dispatch_service = DispatchService()
+    # The schema is created alongside bot startup; database calls wait until it exists
+    threading.Thread(target=prepare_database, args=(db_service,), name='db-init', daemon=True).start()
 
-if __name__ == '__main__':
+    telegram_service = TelegramService(TELEGRAM_TOKEN, db_service, dispatch_service)
+    if METRICS_ENABLED:
+        threading.Thread(target=serve_metrics, args=(telegram_service,), name='metrics', daemon=True).start()
     try:
-        main()
+        print("Bot is running!")
+        telegram_service.setup()
+        telegram_service.run()
     finally:
-        db_service.close()
\ No newline at end of file
+        dispatch_service.shutdown(wait=False)
+        db_service.close()
+
+if __name__ == '__main__':
+    main()
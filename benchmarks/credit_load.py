@@ -0,0 +1,73 @@
+'''
+Concurrent credit consumption load test against a real MySQL database.
+
+Gives one throwaway user `--credits` credits, then lets `--threads` threads call
+use_credit as fast as they can. Passes when exactly `--credits` calls succeed and
+the balance ends at zero. Uses the DB_* environment variables like the bot.
+
+    python -m benchmarks.credit_load --threads 32 --credits 500
+'''
+import argparse
+import threading
+import time
+from datetime import datetime
+from utils.db_init import initialize_database
+from services.database.db_service import DatabaseService
+
+TEST_TELEGRAM_ID = -9_000_000_001
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--credits', type=int, default=500)
+    args = parser.parse_args()
+
+    initialize_database()
+    db = DatabaseService()
+    db.get_or_create_user(TEST_TELEGRAM_ID, username='credit_load_test')
+    with db.connection() as connection, connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE users SET credits = %s, last_reset = %s WHERE telegram_id = %s',
+            (args.credits, datetime.now(), TEST_TELEGRAM_ID)
+        )
+
+    successes = []
+    lock = threading.Lock()
+    start = threading.Barrier(args.threads)
+
+    def worker():
+        start.wait()
+        while True:
+            success, credits_left = db.use_credit(TEST_TELEGRAM_ID)
+            if not success:
+                return
+            with lock:
+                successes.append(credits_left)
+
+    threads = [threading.Thread(target=worker) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    # Read from MySQL; the user cache could hide a lost update
+    final_credits = db.fetch_user(TEST_TELEGRAM_ID)['credits']
+    with db.connection() as connection, connection.cursor() as cursor:
+        cursor.execute('DELETE FROM users WHERE telegram_id = %s', (TEST_TELEGRAM_ID,))
+    db.close()
+
+    print(f'threads:            {args.threads}')
+    print(f'successful uses:    {len(successes)} / {args.credits}')
+    print(f'final balance:      {final_credits}')
+    print(f'distinct balances:  {len(set(successes))}')
+    print(f'throughput:         {len(successes) / elapsed:.0f} credits/s')
+
+    assert len(successes) == args.credits, 'credits were over- or under-consumed'
+    assert final_credits == 0, 'balance went negative or was not fully consumed'
+    assert len(set(successes)) == len(successes), 'two requests observed the same balance'
+    print('OK: no overdraft under concurrency')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import time
+import zlib
+import threading
+from collections import Counter
+from unittest import mock
+import pandas as pd
+from benchmarks.fixtures import make_history, make_info, make_news
+
+# Bars served per ticker; covers the bar store's default two year backfill
+FAKE_HISTORY_BARS = 520
+
+class FakeMarketData:
+    '''
+    Local stand-ins for yfinance (Ticker.info, .news, .history and download) and NewsApiClient,
+    answering from the deterministic fixtures after a configurable delay per call.
+    Every ticker gets its own price history, seeded from its symbol, so runs are repeatable.
+    Use as a context manager to patch the libraries for the duration of a run.
+    '''
+
+    def __init__(self, yahoo_latency: float = 0.3, news_latency: float = 0.3):
+        self.yahoo_latency = yahoo_latency
+        self.news_latency = news_latency
+        self.histories = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self.patches = []
+
+    def history(self, ticker: str) -> pd.DataFrame:
+        with self.lock:
+            if ticker not in self.histories:
+                self.histories[ticker] = make_history(FAKE_HISTORY_BARS, seed=zlib.crc32(ticker.encode()))
+            return self.histories[ticker]
+
+    def call(self, name: str, latency: float):
+        with self.lock:
+            self.calls[name] += 1
+        if latency:
+            time.sleep(latency)
+
+    def ticker_class(self):
+        market = self
+
+        class FakeTicker:
+            def __init__(self, ticker: str):
+                self.ticker = ticker
+
+            @property
+            def info(self) -> dict:
+                market.call('yahoo.info', market.yahoo_latency)
+                return {**make_info(), 'symbol': self.ticker}
+
+            @property
+            def news(self) -> list:
+                market.call('yahoo.news', market.yahoo_latency)
+                return make_news()
+
+            def history(self, period: str = None, start: str = None, **kwargs) -> pd.DataFrame:
+                market.call('yahoo.history', market.yahoo_latency)
+                hist = market.history(self.ticker)
+                if start is not None:
+                    return hist[hist.index >= pd.Timestamp(start, tz=hist.index.tz)]
+                return hist
+
+        return FakeTicker
+
+    def download(self, tickers, start: str = None, **kwargs) -> pd.DataFrame:
+        '''yf.download with group_by='ticker': exchange-local dates without a timezone, one column group per ticker'''
+        self.call('yahoo.download', self.yahoo_latency)
+        frames = {}
+        for ticker in ([tickers] if isinstance(tickers, str) else tickers):
+            hist = self.history(ticker)
+            if start is not None:
+                hist = hist[hist.index >= pd.Timestamp(start, tz=hist.index.tz)]
+            frames[ticker] = hist.tz_localize(None)
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+    def news_client_class(self):
+        market = self
+
+        class FakeNewsApiClient:
+            def __init__(self, api_key=None, **kwargs):
+                pass
+
+            def get_top_headlines(self, page_size: int = 20, **kwargs) -> dict:
+                market.call('newsapi.top_headlines', market.news_latency)
+                return {'status': 'ok', 'articles': [{
+                    'title': item['content']['title'],
+                    'description': 'Markets weigh the latest earnings and rate expectations.',
+                    'url': f'https://example.com/news/{i}',
+                    'source': {'name': 'Example Wire'},
+                    'publishedAt': item['content']['pubDate'],
+                    'content': 'Stocks moved as investors assessed quarterly results and central bank signals.',
+                } for i, item in enumerate(make_news(page_size))]}
+
+        return FakeNewsApiClient
+
+    def start(self):
+        import yfinance
+        import services.data.news_service
+
+        self.patches = [
+            mock.patch.object(yfinance, 'Ticker', self.ticker_class()),
+            mock.patch.object(yfinance, 'download', self.download),
+            mock.patch.object(services.data.news_service, 'NewsApiClient', self.news_client_class()),
+        ]
+        for patch in self.patches:
+            patch.start()
+        return self
+
+    def stop(self):
+        for patch in reversed(self.patches):
+            patch.stop()
+        self.patches = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
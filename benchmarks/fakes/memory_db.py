@@ -0,0 +1,222 @@
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+# Column defaults from utils/db_init.py
+DEFAULT_CREDITS = 3
+DEFAULT_LANGUAGE = 'en'
+
+class MemoryDatabase:
+    '''
+    In-memory stand-in for the MySQL tables behind DatabaseService, for load tests.
+    It understands exactly the statements DatabaseService issues and raises on any
+    other, so a new query shows up here instead of being silently miscounted.
+    Every execute is counted per statement and can be delayed by `latency` seconds
+    to model the network round trip to MySQL.
+    '''
+
+    def __init__(self, latency: float = 0.0, credits: int = DEFAULT_CREDITS):
+        self.latency = latency
+        self.credits = credits
+        self.users = {}
+        self.analysis_logs = []
+        self.watchlists = []
+        self.queries = Counter()
+        self.lock = threading.Lock()
+
+    def connect(self) -> 'MemoryConnection':
+        return MemoryConnection(self)
+
+    def service(self):
+        '''A DatabaseService whose pool hands out connections to this database'''
+        from services.database.db_service import DatabaseService
+
+        database = self
+
+        class MemoryDatabaseService(DatabaseService):
+            def connect(self):
+                return database.connect()
+
+        return MemoryDatabaseService(prefill=False)
+
+    def query_count(self) -> int:
+        return sum(self.queries.values())
+
+    def execute(self, sql: str, seq_params: list) -> tuple:
+        '''
+        Run a statement once per parameter tuple and return (rows, rowcount, lastrowid).
+        pymysql sends executemany INSERTs as one multi-row statement, so this counts as one query.
+        '''
+        sql = ' '.join(sql.split())
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            for pattern, name, handler in STATEMENTS:
+                match = pattern.match(sql)
+                if match:
+                    self.queries[name] += 1
+                    rows, rowcount, lastrowid = [], 0, 0
+                    for params in seq_params:
+                        rows, affected, lastrowid = handler(self, match, list(params or ()))
+                        rowcount += affected
+                    return rows, rowcount, lastrowid
+        raise NotImplementedError(f'MemoryDatabase does not support: {sql}')
+
+    def _select_user(self, match, params):
+        user = self.users.get(params[0])
+        return ([dict(user)] if user else []), int(user is not None), 0
+
+    def _insert_user(self, match, params):
+        telegram_id, username, first_name, last_name, language = params
+        now = datetime.now()
+        self.users[telegram_id] = {
+            'id': len(self.users) + 1,
+            'telegram_id': telegram_id,
+            'username': username,
+            'first_name': first_name,
+            'last_name': last_name,
+            'credits': self.credits,
+            'language': language or DEFAULT_LANGUAGE,
+            'last_reset': now,
+            'created_at': now,
+            'updated_at': now,
+        }
+        return [], 1, self.users[telegram_id]['id']
+
+    def _update_profile(self, match, params):
+        user = self.users.get(params[-1])
+        if user is None:
+            return [], 0, 0
+        for column, value in zip(re.findall(r'(\w+) = %s', match.group(1)), params):
+            user[column] = value
+        return [], 1, 0
+
+    def _user_by_id(self, user_id):
+        return next((user for user in self.users.values() if user['id'] == user_id), None)
+
+    def _renew_credits(self, match, params):
+        current_time, user_id, renew_before = params
+        user = self._user_by_id(user_id)
+        if user is None or user['last_reset'] > renew_before:
+            return [], 0, 0
+        user['credits'] = max(user['credits'], 3)
+        user['last_reset'] = current_time
+        return [], 1, user['credits']
+
+    def _use_credit(self, match, params):
+        renew_before, _, current_time, telegram_id, _ = params
+        user = self.users.get(telegram_id)
+        if user is None:
+            return [], 0, 0
+        due = user['last_reset'] <= renew_before
+        if user['credits'] <= 0 and not due:
+            return [], 0, 0
+        user['credits'] = (max(user['credits'], 3) if due else user['credits']) - 1
+        if due:
+            user['last_reset'] = current_time
+        # LAST_INSERT_ID(expr) reports the new balance as lastrowid
+        return [], 1, user['credits']
+
+    def _refund_credit(self, match, params):
+        user = self.users.get(params[0])
+        if user is None:
+            return [], 0, 0
+        user['credits'] += 1
+        return [], 1, user['credits']
+
+    def _log_analysis(self, match, params):
+        user_id, ticker_symbol, replicate_id, cache_hit = params
+        self.analysis_logs.append({
+            'id': len(self.analysis_logs) + 1,
+            'user_id': user_id,
+            'ticker_symbol': ticker_symbol,
+            'replicate_id': replicate_id,
+            'cache_hit': bool(cache_hit),
+            'created_at': datetime.now(),
+        })
+        return [], 1, len(self.analysis_logs)
+
+    def _top_tickers(self, match, params):
+        since, limit = params
+        counts = Counter(log['ticker_symbol'] for log in self.analysis_logs if log['created_at'] >= since)
+        return [{'ticker_symbol': ticker, 'requests': count} for ticker, count in counts.most_common(limit)], 0, 0
+
+    def _get_watchlist(self, match, params):
+        rows = [{'ticker_symbol': row['ticker_symbol']} for row in self.watchlists if row['user_id'] == params[0]]
+        return rows, len(rows), 0
+
+    def _add_to_watchlist(self, match, params):
+        user_id, ticker_symbol = params
+        if any(row['user_id'] == user_id and row['ticker_symbol'] == ticker_symbol for row in self.watchlists):
+            return [], 0, 0
+        self.watchlists.append({'user_id': user_id, 'ticker_symbol': ticker_symbol})
+        return [], 1, 0
+
+    def _remove_from_watchlist(self, match, params):
+        user_id, tickers = params[0], set(params[1:])
+        kept = [row for row in self.watchlists if not (row['user_id'] == user_id and row['ticker_symbol'] in tickers)]
+        removed = len(self.watchlists) - len(kept)
+        self.watchlists = kept
+        return [], removed, 0
+
+# (pattern on whitespace-normalized SQL, statement name, handler)
+STATEMENTS = [(re.compile(pattern), name, handler) for pattern, name, handler in (
+    (r'SELECT \* FROM users WHERE telegram_id = %s$', 'select_user', MemoryDatabase._select_user),
+    (r'INSERT INTO users \(telegram_id, username, first_name, last_name, language\)', 'insert_user', MemoryDatabase._insert_user),
+    (r'UPDATE users SET credits = LAST_INSERT_ID\(GREATEST\(credits, 3\)\), last_reset = %s WHERE id = %s', 'renew_credits', MemoryDatabase._renew_credits),
+    (r'UPDATE users SET credits = LAST_INSERT_ID\(credits \+ 1\) WHERE telegram_id = %s', 'refund_credit', MemoryDatabase._refund_credit),
+    (r'UPDATE users SET credits = LAST_INSERT_ID\(IF', 'use_credit', MemoryDatabase._use_credit),
+    (r'UPDATE users SET ((?:\w+ = %s(?:, )?)+) WHERE telegram_id = %s$', 'update_user', MemoryDatabase._update_profile),
+    (r'INSERT INTO analysis_logs ', 'log_analysis', MemoryDatabase._log_analysis),
+    (r'SELECT ticker_symbol, COUNT\(\*\) AS requests FROM analysis_logs', 'top_tickers', MemoryDatabase._top_tickers),
+    (r'SELECT ticker_symbol FROM watchlists WHERE user_id = %s', 'get_watchlist', MemoryDatabase._get_watchlist),
+    (r'INSERT IGNORE INTO watchlists ', 'add_to_watchlist', MemoryDatabase._add_to_watchlist),
+    (r'DELETE FROM watchlists WHERE user_id = %s AND ticker_symbol IN', 'remove_from_watchlist', MemoryDatabase._remove_from_watchlist),
+)]
+
+class MemoryConnection:
+    '''The subset of a pymysql connection that ConnectionPool and DatabaseService use'''
+
+    def __init__(self, database: MemoryDatabase):
+        self.database = database
+        self.open = True
+
+    def cursor(self) -> 'MemoryCursor':
+        return MemoryCursor(self.database)
+
+    def ping(self, reconnect: bool = False):
+        pass
+
+    def close(self):
+        self.open = False
+
+class MemoryCursor:
+    '''DictCursor look-alike; rowcount and lastrowid follow MySQL's OK packet'''
+
+    def __init__(self, database: MemoryDatabase):
+        self.database = database
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def execute(self, sql: str, params=None) -> int:
+        self.rows, self.rowcount, self.lastrowid = self.database.execute(sql, [params])
+        return self.rowcount
+
+    def executemany(self, sql: str, seq_params) -> int:
+        self.rows, self.rowcount, self.lastrowid = self.database.execute(sql, list(seq_params))
+        return self.rowcount
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
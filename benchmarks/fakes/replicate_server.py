@@ -0,0 +1,191 @@
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler
+from benchmarks.fakes.server import LoadTestHTTPServer
+
+DEFAULT_OUTPUT = (
+    '<b>公司概覽</b>\n'
+    'ACME公司是科技行業的領先企業，專注於AI驅動的解決方案。\n\n'
+    '<b>關鍵訊號</b>\n'
+    '✅ 強勁的利潤率(23.4%)\n'
+    '❎ 高負債權益比(1.8)\n'
+)
+
+class FakeReplicateServer:
+    '''
+    Local stand-in for the Replicate predictions API.
+    Predictions succeed after `latency` seconds and return `output` split into tokens.
+    Streaming predictions emit their first token after `first_token_delay` seconds and
+    spread the remaining tokens evenly until `latency`.
+    '''
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 2.0, output: str = DEFAULT_OUTPUT, first_token_delay: float = 0.5):
+        self.latency = latency
+        self.first_token_delay = min(first_token_delay, latency)
+        self.output = output
+        self.predictions = {}
+        self.request_counts = {'create': 0, 'get': 0, 'cancel': 0, 'stream': 0}
+        self.lock = threading.Lock()
+        self.httpd = LoadTestHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def tokens(self):
+        return re.findall(r'\S+\s*|\s+', self.output)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def create(self, model: str, body: dict) -> dict:
+        prediction_id = uuid.uuid4().hex
+        prediction = {
+            'id': prediction_id,
+            'model': model,
+            'input': body.get('input', {}),
+            'status': 'starting',
+            'output': None,
+            'error': None,
+            'created_at': time.time(),
+            'urls': {
+                'get': f'{self.base_url}/predictions/{prediction_id}',
+                'cancel': f'{self.base_url}/predictions/{prediction_id}/cancel',
+            },
+        }
+        if body.get('stream'):
+            prediction['urls']['stream'] = f'{self.base_url}/predictions/{prediction_id}/stream'
+        with self.lock:
+            self.request_counts['create'] += 1
+            self.predictions[prediction_id] = prediction
+        return self.view(prediction)
+
+    def get(self, prediction_id: str):
+        with self.lock:
+            self.request_counts['get'] += 1
+            prediction = self.predictions.get(prediction_id)
+        return self.view(prediction) if prediction else None
+
+    def cancel(self, prediction_id: str):
+        with self.lock:
+            self.request_counts['cancel'] += 1
+            prediction = self.predictions.get(prediction_id)
+            if prediction and prediction['status'] not in ('succeeded', 'failed'):
+                prediction['status'] = 'canceled'
+        return self.view(prediction) if prediction else None
+
+    def stream_events(self, prediction_id: str):
+        '''Yield (event, data) pairs for a streaming prediction, sleeping between tokens'''
+        with self.lock:
+            self.request_counts['stream'] += 1
+            prediction = self.predictions.get(prediction_id)
+        if prediction is None:
+            return
+
+        tokens = self.tokens()
+        start = prediction['created_at'] + self.first_token_delay
+        step = (self.latency - self.first_token_delay) / max(len(tokens) - 1, 1)
+        for i, token in enumerate(tokens):
+            if prediction['status'] == 'canceled':
+                yield 'done', json.dumps({'reason': 'canceled'})
+                return
+            delay = start + i * step - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            yield 'output', token
+        yield 'done', '{}'
+
+    def view(self, prediction: dict) -> dict:
+        '''Advance the prediction's status from elapsed time and return its public fields'''
+        if prediction['status'] in ('starting', 'processing'):
+            elapsed = time.time() - prediction['created_at']
+            if elapsed >= self.latency:
+                prediction['status'] = 'succeeded'
+                prediction['output'] = self.tokens()
+            else:
+                prediction['status'] = 'processing'
+        return {key: value for key, value in prediction.items() if key != 'created_at'}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_json(self) -> dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                return json.loads(self.rfile.read(length) or b'{}')
+
+            def do_POST(self):
+                match = re.fullmatch(r'/v1/models/([^/]+/[^/]+)/predictions', self.path)
+                if match:
+                    return self._send_json(201, server.create(match.group(1), self._read_json()))
+
+                match = re.fullmatch(r'/v1/predictions/([^/]+)/cancel', self.path)
+                if match:
+                    prediction = server.cancel(match.group(1))
+                    return self._send_json(200, prediction) if prediction else self._send_json(404, {'detail': 'Not found'})
+
+                self._send_json(404, {'detail': 'Not found'})
+
+            def _send_events(self, events):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-store')
+                self.end_headers()
+                for event, data in events:
+                    lines = [f'event: {event}'] + [f'data: {line}' for line in data.split('\n')]
+                    self.wfile.write(('\n'.join(lines) + '\n\n').encode('utf-8'))
+                    self.wfile.flush()
+
+            def do_GET(self):
+                match = re.fullmatch(r'/v1/predictions/([^/]+)/stream', self.path)
+                if match:
+                    return self._send_events(server.stream_events(match.group(1)))
+
+                match = re.fullmatch(r'/v1/predictions/([^/]+)', self.path)
+                if match:
+                    prediction = server.get(match.group(1))
+                    return self._send_json(200, prediction) if prediction else self._send_json(404, {'detail': 'Not found'})
+
+                self._send_json(404, {'detail': 'Not found'})
+
+        return Handler
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Run a local fake Replicate API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=2.0)
+    parser.add_argument('--first-token-delay', type=float, default=0.5)
+    args = parser.parse_args()
+
+    fake = FakeReplicateServer(port=args.port, latency=args.latency, first_token_delay=args.first_token_delay)
+    print(f'Fake Replicate API listening on {fake.base_url}')
+    fake.httpd.serve_forever()
@@ -0,0 +1,7 @@
+from http.server import ThreadingHTTPServer
+
+class LoadTestHTTPServer(ThreadingHTTPServer):
+    '''Threaded HTTP server for the fakes, able to take many connections at once'''
+    # The default backlog of 5 resets connections when a load test opens dozens together
+    request_queue_size = 1024
+    daemon_threads = True
@@ -0,0 +1,149 @@
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qsl
+from benchmarks.fakes.server import LoadTestHTTPServer
+
+BOT_USER = {'id': 123456, 'is_bot': True, 'first_name': 'Momentum', 'username': 'momentum_bot'}
+
+class FakeTelegramServer:
+    '''
+    Local stand-in for the Telegram Bot API, enough for the bot's handlers:
+    getMe, sendMessage, editMessageText, deleteMessage, answerCallbackQuery and the
+    menu setup calls. Every call takes `latency` seconds and is counted per method.
+    With flood_global or flood_chat set, a call beyond that many in the last second, overall
+    or in its chat, is answered 429 with retry_after like the real API, and counted in flooded.
+    Point the bot at it with TELEGRAM_API_BASE=<base_url>.
+    '''
+
+    def __init__(
+        self,
+        host: str = '127.0.0.1',
+        port: int = 0,
+        latency: float = 0.05,
+        flood_global: int = None,
+        flood_chat: int = None,
+        retry_after: int = 1,
+    ):
+        self.latency = latency
+        self.flood_global = flood_global
+        self.flood_chat = flood_chat
+        self.retry_after = retry_after
+        self.recent = deque()
+        self.recent_by_chat = {}
+        self.flooded = Counter()
+        self.request_counts = Counter()
+        self.message_ids = Counter()
+        self.lock = threading.Lock()
+        self.httpd = LoadTestHTTPServer((host, port), self._handler_class())
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}/bot'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def message(self, chat_id: int, message_id: int, text: str = '') -> dict:
+        return {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': BOT_USER,
+            'text': text,
+        }
+
+    def flood_check(self, params: dict) -> bool:
+        '''Record a call and return True if it is over a flood limit'''
+        now = time.monotonic()
+        with self.lock:
+            windows = [(self.recent, self.flood_global)]
+            if 'chat_id' in params:
+                windows.append((self.recent_by_chat.setdefault(str(params['chat_id']), deque()), self.flood_chat))
+            for window, limit in windows:
+                while window and window[0] <= now - 1:
+                    window.popleft()
+            if any(limit is not None and len(window) >= limit for window, limit in windows):
+                return True
+            for window, _ in windows:
+                window.append(now)
+            return False
+
+    def call(self, method: str, params: dict):
+        '''Result of one Bot API method, or None for an unknown method'''
+        with self.lock:
+            self.request_counts[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'sendMessage':
+            chat_id = int(params['chat_id'])
+            with self.lock:
+                self.message_ids[chat_id] += 1
+                message_id = self.message_ids[chat_id]
+            return self.message(chat_id, message_id, params.get('text', ''))
+        if method == 'editMessageText':
+            return self.message(int(params['chat_id']), int(params['message_id']), params.get('text', ''))
+        if method in ('deleteMessage', 'answerCallbackQuery', 'setMyCommands', 'setChatMenuButton', 'setWebhook', 'deleteWebhook'):
+            return True
+        return None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _read_params(self) -> dict:
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode('utf-8')
+                if 'json' in (self.headers.get('Content-Type') or ''):
+                    return json.loads(body or '{}')
+                return dict(parse_qsl(body))
+
+            def do_POST(self):
+                match = re.fullmatch(r'/bot[^/]+/(\w+)', self.path)
+                params = self._read_params()
+                if match and (server.flood_global or server.flood_chat) and server.flood_check(params):
+                    with server.lock:
+                        server.flooded[match.group(1)] += 1
+                    return self._send_json(429, {
+                        'ok': False,
+                        'error_code': 429,
+                        'description': f'Too Many Requests: retry after {server.retry_after}',
+                        'parameters': {'retry_after': server.retry_after},
+                    })
+                result = server.call(match.group(1), params) if match else None
+                if result is None:
+                    return self._send_json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+                self._send_json(200, {'ok': True, 'result': result})
+
+        return Handler
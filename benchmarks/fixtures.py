@@ -0,0 +1,104 @@
+'''Deterministic market data fixtures for benchmarks'''
+import numpy as np
+import pandas as pd
+
+# Daily bars in one month, one year and ten years of trading
+HISTORY_SIZES = {'1mo': 21, '1y': 252, '10y': 2520}
+
+def make_history(bars: int, seed: int = 7, end: str = '2026-10-16', tz: str = 'America/New_York') -> pd.DataFrame:
+    '''Random-walk OHLCV frame shaped like yfinance's Ticker.history output'''
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=end, periods=bars, tz=tz)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    high = close * (1 + rng.uniform(0, 0.02, bars))
+    low = close * (1 - rng.uniform(0, 0.02, bars))
+    open_ = np.clip(close * (1 + rng.normal(0, 0.01, bars)), low, high)
+    volume = rng.integers(1_000_000, 50_000_000, bars)
+    return pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+
+def make_info(sparse: bool = False) -> dict:
+    '''yfinance Ticker.info for a large US company, or a small listing with most fields missing'''
+    info = {
+        'longName': 'Acme Corporation',
+        'sector': 'Technology',
+        'industry': 'Semiconductors',
+        'longBusinessSummary': 'Acme Corporation designs and sells accelerated computing platforms, networking and software for data centers, gaming and automotive markets worldwide. ' * 3,
+        'currentPrice': 123.456789,
+        'previousClose': 121.1,
+        'marketCap': 3_012_345_678_901,
+        'fiftyTwoWeekLow': 86.62,
+        'fiftyTwoWeekHigh': 153.13,
+        'fiftyDayAverage': 118.23456,
+        'twoHundredDayAverage': 110.98765,
+        'averageVolume': 250_123_456,
+    }
+    if sparse:
+        return info
+    info.update({
+        'trailingPE': 51.123456,
+        'forwardPE': 31.987654,
+        'trailingEps': 2.53,
+        'forwardEps': 4.12,
+        'priceToBook': 45.678,
+        'priceToSalesTrailing12Months': 26.54321,
+        'trailingPegRatio': 1.2345,
+        'totalRevenue': 130_497_000_000,
+        'grossMargins': 0.74987,
+        'operatingMargins': 0.62058,
+        'profitMargins': 0.55848,
+        'totalCash': 43_210_000_000,
+        'totalDebt': 10_270_000_000,
+        'debtToEquity': 12.953,
+        'currentRatio': 4.439,
+        'quickRatio': 3.878,
+        'operatingCashflow': 64_089_000_000,
+        'freeCashflow': 55_120_000_000,
+        'returnOnAssets': 0.53526,
+        'returnOnEquity': 1.19178,
+        'dividendYield': 0.03,
+        'targetMeanPrice': 165.7234,
+        'recommendationKey': 'strong_buy',
+        'numberOfAnalystOpinions': 57,
+    })
+    return info
+
+def make_news(count: int = 5) -> list:
+    '''Ticker.news items in yfinance's current layout'''
+    return [{
+        'content': {
+            'title': f'Acme shares move as analysts revisit data center demand, part {i}',
+            'pubDate': f'2026-10-{16 - i:02d}T13:30:00Z',
+        }
+    } for i in range(count)]
+
+# Sizes of model output, in UTF-8 bytes, from a short answer to a long batch comparison
+LLM_OUTPUT_SIZES = {'2KB': 2_048, '8KB': 8_192, '20KB': 20_480}
+
+LLM_SECTION = '''<b>關鍵訊號</b>
+✅ 強勁的利潤率(23.4%)，超過行業平均水平7.2%
+✅ RSI 為 58.3，介於 30 < RSI < 70 的中性區間
+❎ 預期市盈率>=25.3，相比同行估值偏高
+❎ 負債權益比 1.8 > 1.5，槓桿偏高
+
+<b>市場洞察</b>
+股價在過去一個月上升 5.2%，收於 $123.45，高於 20 日均線 $118.20。MACD (1.25) > 訊號線 (0.98)，動能偏向正面；成交量較 50 日平均高出 12%。
+近期新聞顯示數據中心需求持續增長，<i>分析師</i>上調目標價至 $150，但估值已反映大部分樂觀預期。
+
+'''
+
+def make_llm_output(size: int, think: bool = True) -> str:
+    '''Analysis text shaped like the model's answers: an optional <think> block, then repeated sections, about `size` bytes'''
+    head = '<think>\n先檢視估值與技術指標，RSI<70 而 MACD>0，再對照新聞。\n</think>\n\n' if think else ''
+    head += '# ACME | $123.45 | 🔺 1.92%\n\n<b>公司概覽</b>\nACME公司是科技行業的領先企業。\n\n'
+    tail = '<b>建議：買入 🟢</b>\n目標價 $150，時間框架 6-12 個月。\n\n<b>風險級別：中等 🟠</b>\n波動性 (32.1%) 高於大市。'
+    section_bytes = len(LLM_SECTION.encode('utf-8'))
+    fixed_bytes = len((head + tail).encode('utf-8'))
+    return head + LLM_SECTION * max(1, round((size - fixed_bytes) / section_bytes)) + tail
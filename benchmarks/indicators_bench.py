@@ -0,0 +1,100 @@
+'''
+Parity check and benchmark for services.data.indicators against the
+previous pandas implementation of get_historical_data's indicators.
+
+    python -m benchmarks.indicators_bench
+'''
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+from benchmarks.fixtures import HISTORY_SIZES, make_history
+from services.data.indicators import compute_indicators
+
+def pandas_indicators(hist: pd.DataFrame) -> dict:
+    '''Indicator columns as get_historical_data used to add them'''
+    hist = hist.copy()
+    hist['SMA_20'] = hist['Close'].rolling(window=20).mean()
+    hist['SMA_50'] = hist['Close'].rolling(window=50).mean()
+    hist['SMA_200'] = hist['Close'].rolling(window=200).mean()
+
+    delta = hist['Close'].diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
+    rs = gain / loss
+    hist['RSI'] = 100 - (100 / (1 + rs))
+
+    hist['BB_Middle'] = hist['Close'].rolling(window=20).mean()
+    hist['BB_Std'] = hist['Close'].rolling(window=20).std()
+    hist['BB_Upper'] = hist['BB_Middle'] + (hist['BB_Std'] * 2)
+    hist['BB_Lower'] = hist['BB_Middle'] - (hist['BB_Std'] * 2)
+
+    high_low = hist['High'] - hist['Low']
+    high_close = abs(hist['High'] - hist['Close'].shift())
+    low_close = abs(hist['Low'] - hist['Close'].shift())
+    ranges = pd.concat([high_low, high_close, low_close], axis=1)
+    true_range = ranges.max(axis=1)
+    hist['ATR'] = true_range.rolling(14).mean()
+
+    hist['EMA_12'] = hist['Close'].ewm(span=12, adjust=False).mean()
+    hist['EMA_26'] = hist['Close'].ewm(span=26, adjust=False).mean()
+    hist['MACD'] = hist['EMA_12'] - hist['EMA_26']
+    hist['MACD_Signal'] = hist['MACD'].ewm(span=9, adjust=False).mean()
+    hist['MACD_Hist'] = hist['MACD'] - hist['MACD_Signal']
+    return hist
+
+COLUMN_NAMES = {
+    'sma20': 'SMA_20', 'sma50': 'SMA_50', 'sma200': 'SMA_200', 'rsi': 'RSI',
+    'bb_middle': 'BB_Middle', 'bb_upper': 'BB_Upper', 'bb_lower': 'BB_Lower', 'atr': 'ATR',
+    'ema12': 'EMA_12', 'ema26': 'EMA_26', 'macd': 'MACD', 'macd_signal': 'MACD_Signal', 'macd_hist': 'MACD_Hist',
+}
+
+def arrays(hist: pd.DataFrame):
+    return (hist[column].to_numpy(dtype=np.float64) for column in ('Close', 'High', 'Low'))
+
+def check_parity(hist: pd.DataFrame) -> list:
+    expected = pandas_indicators(hist)
+    series = compute_indicators(*arrays(hist), full=True)
+    last = compute_indicators(*arrays(hist))
+    failures = []
+    for name, column in COLUMN_NAMES.items():
+        want = expected[column].to_numpy(dtype=np.float64)
+        if not np.allclose(series[name], want, rtol=1e-9, atol=1e-9, equal_nan=True):
+            failures.append(f'{name} (series)')
+        if not np.allclose(last[name], want[-1], rtol=1e-9, atol=1e-9, equal_nan=True):
+            failures.append(f'{name} (last value)')
+
+    # A left-padded 2-D batch must match per-ticker results
+    padded = np.full((2, len(hist) + 30), np.nan)
+    batch = []
+    for values in arrays(hist):
+        rows = padded.copy()
+        rows[0, 30:] = values
+        rows[1, 30:] = values
+        batch.append(rows)
+    stacked = compute_indicators(*batch)
+    for name in COLUMN_NAMES:
+        if not np.allclose(stacked[name], last[name], rtol=1e-9, atol=1e-9, equal_nan=True):
+            failures.append(f'{name} (padded batch)')
+    return failures
+
+def main():
+    ok = True
+    print(f'{"history":>8} {"bars":>6} {"pandas":>10} {"numpy":>10} {"speedup":>8}  parity')
+    for label, bars in HISTORY_SIZES.items():
+        hist = make_history(bars)
+        failures = check_parity(hist)
+        ok = ok and not failures
+
+        close, high, low = arrays(hist)
+        number = 200
+        pandas_time = timeit.timeit(lambda: pandas_indicators(hist), number=number) / number
+        numpy_time = timeit.timeit(lambda: compute_indicators(close, high, low), number=number) / number
+        print(
+            f'{label:>8} {bars:>6} {pandas_time * 1e3:>8.3f}ms {numpy_time * 1e3:>8.3f}ms '
+            f'{pandas_time / numpy_time:>7.1f}x  {"ok" if not failures else ", ".join(failures)}'
+        )
+    sys.exit(0 if ok else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+'''
+End-to-end load test of the bot's handlers with every outside service faked locally.
+
+Synthetic users send /analyze, batch /analyze and /news commands through the real
+TelegramService, DatabaseService, job queue and model router. Yahoo Finance and NewsAPI
+are patched with fixture-backed fakes, Replicate and the Telegram Bot API are local HTTP
+servers, and MySQL is an in-memory stand-in that counts queries. Each fake takes a
+configurable latency. Reports throughput, latency percentiles, DB queries and Bot API
+calls per request, and the mean time of each traced stage. Timings vary by up to
+about 10% between identical runs; query and call counts are deterministic.
+
+The bot's global send rate limit is off unless --global-rate is given, so runs measure
+the handlers rather than Telegram's 30 messages a second. With --flood-control the fake
+Bot API answers 429 beyond Telegram's limits and the bot runs with its configured limits.
+
+    python -m benchmarks.load_test --users 2000 --concurrency 64
+    python -m benchmarks.load_test --users 200 --flood-control
+    python -m benchmarks.load_test --users 500 --llm-latency 0.5 --save benchmarks/results/load.json
+    python -m benchmarks.load_test --users 500 --llm-latency 0.5 --baseline benchmarks/results/load.json
+'''
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from benchmarks.fakes.replicate_server import FakeReplicateServer
+from benchmarks.fakes.telegram_server import FakeTelegramServer
+from benchmarks.fakes.memory_db import MemoryDatabase
+
+TOKEN = '123456:load-test'
+TICKERS = (
+    'AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'AVGO', 'AMD', 'NFLX',
+    'ORCL', 'CRM', 'ADBE', 'INTC', 'QCOM', 'TXN', 'MU', 'AMAT', 'SHOP', 'UBER',
+    'JPM', 'BAC', 'V', 'MA', 'KO', 'PEP', 'WMT', 'COST', 'DIS', 'NKE',
+    '0700', '9988', '3690', '1810', '0005', '1299', '0941', '2318', '0388', '1211',
+)
+# Metrics compared against a saved baseline; True where higher is better
+REPORTED = {
+    'throughput_rps': True,
+    'p50_ms': False,
+    'p90_ms': False,
+    'p99_ms': False,
+    'db_queries_per_request': False,
+    'telegram_calls_per_request': False,
+}
+
+def percentile(values: list, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))] if ordered else 0.0
+
+def plan_requests(args) -> list:
+    '''Commands each user sends in order, as lists of message texts, from a seeded generator'''
+    rng = random.Random(args.seed)
+    tickers = TICKERS[:args.tickers]
+    plans = []
+    for _ in range(args.users):
+        texts = []
+        for _ in range(args.requests_per_user):
+            roll = rng.random()
+            if roll < args.news_ratio:
+                texts.append('/news')
+            elif roll < args.news_ratio + args.batch_ratio:
+                texts.append('/analyze ' + ' '.join(rng.sample(tickers, 3)))
+            else:
+                texts.append(f'/analyze {rng.choice(tickers)}')
+        plans.append(texts)
+    return plans
+
+def request_kind(text: str) -> str:
+    if text == '/news':
+        return 'news'
+    return 'batch' if len(text.split()) > 2 else 'analyze'
+
+async def run(args, telegram: FakeTelegramServer, replicate: FakeReplicateServer, database: MemoryDatabase) -> dict:
+    # Services read config at import, so they are only imported once the fakes' URLs are in the environment
+    from telegram import Update
+    from benchmarks.fakes.market_data import FakeMarketData
+    from services.dispatch.dispatch_service import DispatchService
+    from services.telegram.telegram_service import TelegramService
+    from services.metrics.metrics import STAGE_SECONDS, REQUEST_SECONDS
+
+    with FakeMarketData(yahoo_latency=args.yahoo_latency, news_latency=args.news_latency) as market:
+        dispatch = DispatchService()
+        service = TelegramService(TOKEN, database.service(), dispatch)
+        service.setup()
+        application = service.application
+        await application.initialize()
+
+        plans = plan_requests(args)
+        latencies = []
+        kinds = Counter()
+        update_ids = iter(range(1, 10 ** 9))
+
+        def make_update(user_id: int, text: str) -> Update:
+            command = text.split()[0]
+            return Update.de_json({
+                'update_id': next(update_ids),
+                'message': {
+                    'message_id': next(update_ids),
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}', 'language_code': 'zh-hk'},
+                    'text': text,
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(command)}],
+                },
+            }, application.bot)
+
+        async def user(user_id: int, texts: list):
+            # A user waits for each reply before sending the next command
+            for text in texts:
+                started = time.perf_counter()
+                await application.process_update(make_update(user_id, text))
+                latencies.append(time.perf_counter() - started)
+                kinds[request_kind(text)] += 1
+
+        users = asyncio.Queue()
+        for i, texts in enumerate(plans):
+            users.put_nowait((100_000 + i, texts))
+
+        async def worker():
+            while not users.empty():
+                await user(*users.get_nowait())
+
+        queries_before = database.query_count()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        await application.shutdown()
+        if service.built('replicate_service'):
+            await service.replicate_service.client.aclose()
+        dispatch.shutdown()
+
+    requests = len(latencies)
+    outcomes = Counter()
+    for (kind, outcome), (count, _) in REQUEST_SECONDS.totals().items():
+        outcomes[outcome] += count
+    stages = {
+        stage: round(total / count * 1000, 1)
+        for (stage,), (count, total) in sorted(STAGE_SECONDS.totals().items()) if count
+    }
+    return {
+        'requests': requests,
+        'kinds': dict(kinds),
+        'outcomes': dict(outcomes),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'db_queries_per_request': round((database.query_count() - queries_before) / requests, 2),
+        'db_queries': dict(database.queries),
+        'telegram_calls_per_request': round((sum(telegram.request_counts.values()) - telegram.request_counts['getMe']) / requests, 2),
+        'telegram_calls': dict(telegram.request_counts),
+        'telegram_flooded': dict(telegram.flooded),
+        'replicate_requests': dict(replicate.request_counts),
+        'market_data_calls': dict(market.calls),
+        'stage_mean_ms': stages,
+    }
+
+def report(result: dict, baseline: dict = None):
+    print(f"requests:           {result['requests']} {result['kinds']}")
+    print(f"outcomes:           {result['outcomes']}")
+    print(f"elapsed:            {result['elapsed_s']}s")
+    print(f"latency max:        {result['max_ms']}ms")
+    for name, higher_is_better in REPORTED.items():
+        line = f'{name + ":":<28}{result[name]:>10}'
+        if baseline and name in baseline and baseline[name]:
+            change = (result[name] - baseline[name]) / baseline[name] * 100
+            better = change > 0 if higher_is_better else change < 0
+            line += f'   baseline {baseline[name]:>10}   {change:+6.1f}%{"" if abs(change) < 1 else " better" if better else " worse"}'
+        print(line)
+    print(f"db queries:         {result['db_queries']}")
+    print(f"telegram calls:     {result['telegram_calls']}")
+    print(f"telegram 429s:      {result['telegram_flooded']}")
+    print(f"replicate requests: {result['replicate_requests']}")
+    print(f"market data calls:  {result['market_data_calls']}")
+    print('stage means (ms):')
+    for stage, mean in result['stage_mean_ms'].items():
+        print(f'  {stage:<28}{mean:>10}')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--requests-per-user', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=64, help='users sending commands at the same time')
+    parser.add_argument('--tickers', type=int, default=20, choices=range(1, len(TICKERS) + 1), metavar=f'1-{len(TICKERS)}')
+    parser.add_argument('--batch-ratio', type=float, default=0.1)
+    parser.add_argument('--news-ratio', type=float, default=0.1)
+    parser.add_argument('--credits', type=int, default=3, help='starting credits of each new user')
+    parser.add_argument('--llm-latency', type=float, default=3.0, help='seconds per prediction')
+    parser.add_argument('--first-token-delay', type=float, default=0.5)
+    parser.add_argument('--telegram-latency', type=float, default=0.05)
+    parser.add_argument('--flood-control', action='store_true', help="fake Bot API answers 429 beyond 30 calls a second overall or 3 per chat")
+    parser.add_argument('--global-rate', type=float, default=None, help="bot's global sends per second; 0 disables")
+    parser.add_argument('--chat-rate', type=float, default=None, help="bot's sends per second per chat; 0 disables")
+    parser.add_argument('--yahoo-latency', type=float, default=0.3)
+    parser.add_argument('--news-latency', type=float, default=0.3)
+    parser.add_argument('--db-latency', type=float, default=0.001)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--verbose', action='store_true', help="show the services' own output")
+    parser.add_argument('--save', help='write the results as JSON to this path')
+    parser.add_argument('--baseline', help='compare against results saved earlier with --save')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    database = MemoryDatabase(latency=args.db_latency, credits=args.credits)
+    with tempfile.TemporaryDirectory() as bar_dir, \
+            FakeTelegramServer(
+                latency=args.telegram_latency,
+                flood_global=30 if args.flood_control else None,
+                flood_chat=3 if args.flood_control else None,
+            ) as telegram, \
+            FakeReplicateServer(latency=args.llm_latency, first_token_delay=args.first_token_delay) as replicate:
+        os.environ.update({
+            'TELEGRAM_API_BASE': telegram.base_url,
+            'REPLICATE_API_BASE': replicate.base_url,
+            'REPLICATE_API_TOKEN': 'fake',
+            'NEWS_API_KEY': 'fake',
+            'BAR_STORE_DIR': bar_dir,
+            'STOCK_CACHE_DIR': '',
+            'PERSISTENCE_BACKEND': 'memory',
+            'PREWARM_ENABLED': 'false',
+            'TRACE_LOG': 'false',
+        })
+        if args.global_rate is not None or not args.flood_control:
+            os.environ['TELEGRAM_GLOBAL_RATE'] = str(args.global_rate or 0)
+        if args.chat_rate is not None:
+            os.environ['TELEGRAM_CHAT_RATE'] = str(args.chat_rate)
+        # Services print status lines, e.g. per DB connection; handler errors still reach stderr
+        with contextlib.redirect_stdout(sys.stdout if args.verbose else io.StringIO()):
+            result = asyncio.run(run(args, telegram, replicate, database))
+
+    result['config'] = vars(args)
+    report(result, baseline)
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as f:
+            json.dump(result, f, indent=2, sort_keys=True)
+        print(f'saved to {args.save}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+'''
+Micro-benchmarks for the pure-CPU code that runs on every request: indicators,
+historical data summaries, StockData serialization, prompt building and the
+Telegram formatting of model output. Fixtures are fixed: 1 month, 1 year and
+10 years of daily bars, and model outputs of 2, 8 and 20 KB.
+
+Each benchmark is timed over several repeats of enough calls to take ~50ms; the
+fastest repeat is the reported time. Results can be saved per commit under
+benchmarks/results/micro/ and compared with an earlier run, flagging slowdowns.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter sanitize --repeat 9
+    python -m benchmarks.micro --save                    # writes results/micro/<commit>.json
+    python -m benchmarks.micro --compare 1a2b3c4          # exits 1 on a regression
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+from typing import Callable, Dict, List, Tuple
+import numpy as np
+from benchmarks.fixtures import HISTORY_SIZES, LLM_OUTPUT_SIZES, make_history, make_info, make_news, make_llm_output
+from services.data.indicators import compute_indicators
+from services.data.yahoo_service import YahooFinanceService, SUMMARY_INDICATORS
+from services.llm.replicate_service import ReplicateService
+from services.llm.prompts.prompt_stock_analysis import StockAnalysisPrompt
+from services.llm.prompts.prompt_batch_analysis import BatchAnalysisPrompt
+from utils.validation import Validation
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results', 'micro')
+
+def build_benchmarks() -> List[Tuple[str, Callable[[], object]]]:
+    '''(name, zero-argument callable) for every benchmark, with fixtures built up front'''
+    benchmarks = []
+    histories = {name: make_history(bars) for name, bars in HISTORY_SIZES.items()}
+    info, news = make_info(), make_news(10)
+
+    for name, hist in histories.items():
+        close, high, low = (hist[column].to_numpy(dtype=np.float64) for column in ('Close', 'High', 'Low'))
+        stock_data = YahooFinanceService.build_stock_data('ACME', '1mo', info, hist, news)
+        benchmarks += [
+            (f'indicators[{name}]', lambda close=close, high=high, low=low: compute_indicators(close, high, low, names=SUMMARY_INDICATORS)),
+            (f'historical_data[{name}]', lambda hist=hist: YahooFinanceService.get_historical_data(hist, '1mo')),
+            (f'build_stock_data[{name}]', lambda hist=hist: YahooFinanceService.build_stock_data('ACME', '1mo', info, hist, news)),
+            # Serialization for the analysis cache key; replaced format_float_values' JSON round trip
+            (f'stock_data_to_json[{name}]', stock_data.to_json),
+        ]
+
+    full = YahooFinanceService.build_stock_data('ACME', '1mo', info, histories['1y'], news)
+    sparse = YahooFinanceService.build_stock_data('ACME', '1mo', make_info(sparse=True), histories['1mo'], [])
+    batch = [YahooFinanceService.build_stock_data(ticker, '1mo', info, histories['1y'], news) for ticker in ('AAA', 'BBB', 'CCC', 'DDD', 'EEE')]
+    benchmarks += [
+        ('stock_prompt[full]', lambda: StockAnalysisPrompt.build_prompt(full)),
+        ('stock_prompt[sparse]', lambda: StockAnalysisPrompt.build_prompt(sparse)),
+        ('batch_prompt[5]', lambda: BatchAnalysisPrompt.build_prompt(batch)),
+    ]
+
+    service = ReplicateService(client=object())
+    validation = Validation()
+    for name, size in LLM_OUTPUT_SIZES.items():
+        output = make_llm_output(size)
+        tokens = output.split(' ')
+        cleaned = service.remove_think_blocks(output)
+        # A streaming edit renders the buffer so far; time it at the halfway point
+        partial = output[:len(output) // 2]
+        benchmarks += [
+            (f'remove_think_blocks[{name}]', lambda output=output: service.remove_think_blocks(output)),
+            (f'sanitize_telegram_html[{name}]', lambda cleaned=cleaned: service.sanitize_telegram_html(cleaned)),
+            (f'format_output[{name}]', lambda tokens=tokens: service.format_output(tokens)),
+            (f'format_partial_output[{name}]', lambda partial=partial: service.format_partial_output(partial)),
+            (f'format_telegram_message[{name}]', lambda output=output: validation.format_telegram_message(output)),
+        ]
+    return benchmarks
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    '''Per-call time in microseconds: fastest and median repeat'''
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    # autorange stops at 0.2s; scale down to about 50ms per repeat
+    number = max(1, int(number * 0.05 / elapsed)) if elapsed > 0.05 else number
+    times = sorted(t / number * 1e6 for t in timer.repeat(repeat=repeat, number=number))
+    return {'min_us': round(times[0], 3), 'median_us': round(times[len(times) // 2], 3), 'calls': number}
+
+def git_label() -> str:
+    '''Short HEAD commit, marked -dirty when the working tree has changes'''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+def load_results(reference: str) -> dict:
+    '''Saved results by path, or by label under RESULTS_DIR'''
+    path = reference if os.path.exists(reference) else os.path.join(RESULTS_DIR, f'{reference}.json')
+    with open(path) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--save', action='store_true', help='save results as results/micro/<label>.json')
+    parser.add_argument('--label', default=None, help='name for saved results; defaults to the git commit')
+    parser.add_argument('--compare', default=None, help='label or path of earlier results to compare against')
+    parser.add_argument('--threshold', type=float, default=10.0, help='slowdown in percent counted as a regression')
+    args = parser.parse_args()
+
+    baseline = load_results(args.compare)['results'] if args.compare else {}
+    results = {}
+    regressions = []
+    print(f'{"benchmark":<36} {"min":>12} {"median":>12}' + (f' {"baseline":>12} {"change":>8}' if baseline else ''))
+    for name, func in build_benchmarks():
+        if args.filter not in name:
+            continue
+        result = results[name] = measure(func, args.repeat)
+        line = f'{name:<36} {result["min_us"]:>10.2f}us {result["median_us"]:>10.2f}us'
+        if name in baseline:
+            before = baseline[name]['min_us']
+            change = (result['min_us'] - before) / before * 100
+            line += f' {before:>10.2f}us {change:>+7.1f}%'
+            if change > args.threshold:
+                regressions.append(name)
+                line += '  REGRESSION'
+        print(line)
+
+    if args.save:
+        label = args.label or git_label()
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f'{label}.json')
+        with open(path, 'w') as f:
+            json.dump({
+                'label': label,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'numpy': np.__version__,
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f'saved to {path}')
+
+    if regressions:
+        print(f'{len(regressions)} regression(s) over {args.threshold:g}%: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
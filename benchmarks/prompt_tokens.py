@@ -0,0 +1,42 @@
+'''
+Estimated input tokens and build time of the analysis prompts.
+
+    python -m benchmarks.prompt_tokens
+
+"prefix" is the static instruction block shared by every prompt of a kind;
+"data" is the per-stock part that changes between requests.
+'''
+import timeit
+from benchmarks.fixtures import make_history, make_info, make_news
+from services.data.yahoo_service import YahooFinanceService
+from services.llm.prompts.prompt_compiler import estimate_tokens
+from services.llm.prompts.prompt_stock_analysis import StockAnalysisPrompt
+from services.llm.prompts.prompt_batch_analysis import BatchAnalysisPrompt
+
+def stock_data(ticker: str, bars: int, sparse: bool) -> dict:
+    news = [] if sparse else make_news()
+    return YahooFinanceService.build_stock_data(ticker, '1mo', make_info(sparse), make_history(bars), news)
+
+def report(label: str, prompt: str, prefix: str, build):
+    number = 200
+    build_time = min(timeit.repeat(build, number=number, repeat=5)) / number
+    total = estimate_tokens(prompt)
+    shared = estimate_tokens(prefix)
+    print(f'{label:<24} {total:>7} {shared:>7} {total - shared:>7} {len(prompt):>7} {build_time * 1e3:>8.3f}ms')
+
+def main():
+    print(f'{"prompt":<24} {"tokens":>7} {"prefix":>7} {"data":>7} {"chars":>7} {"build":>10}')
+    for label, bars, sparse in (('stock, full info', 260, False), ('stock, sparse info', 260, True), ('stock, new listing', 30, True)):
+        data = stock_data('ACME', bars, sparse)
+        report(label, StockAnalysisPrompt.build_prompt(data), StockAnalysisPrompt.INSTRUCTIONS, lambda: StockAnalysisPrompt.build_prompt(data))
+
+    batch = [stock_data(f'T{i}', 260, i % 2 == 1) for i in range(10)]
+    report('batch of 10', BatchAnalysisPrompt.build_prompt(batch), BatchAnalysisPrompt.INSTRUCTIONS, lambda: BatchAnalysisPrompt.build_prompt(batch))
+
+    hist, info, news = make_history(2520), make_info(), make_news()
+    number = 20
+    build_time = min(timeit.repeat(lambda: YahooFinanceService.build_stock_data('ACME', '1y', info, hist, news), number=number, repeat=5)) / number
+    print(f'\nbuild_stock_data, 10y of bars: {build_time * 1e3:.2f}ms')
+
+if __name__ == '__main__':
+    main()
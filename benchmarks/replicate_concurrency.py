@@ -0,0 +1,64 @@
+'''
+Track many concurrent predictions against the fake Replicate server.
+
+    python -m benchmarks.replicate_concurrency --predictions 300 --latency 3
+    python -m benchmarks.replicate_concurrency --predictions 50 --latency 10 --stream
+'''
+import argparse
+import asyncio
+import statistics
+import time
+from benchmarks.fakes.replicate_server import FakeReplicateServer
+from services.llm.replicate_service import ReplicateService
+from services.llm.replicate_client import AsyncReplicateClient
+
+async def run(predictions: int, latency: float, stream: bool):
+    with FakeReplicateServer(latency=latency) as fake:
+        client = AsyncReplicateClient(api_token='fake', base_url=fake.base_url)
+        service = ReplicateService(client)
+        first_token_times = []
+
+        async def one(i: int):
+            started = time.perf_counter()
+            prompt_input = service.build_input(f'prompt {i}')
+            if not stream:
+                prediction = await client.run(service.router.models[0], prompt_input)
+                return service.format_output(prediction['output'])
+
+            partial = []
+
+            async def on_token(token: str):
+                if not partial:
+                    first_token_times.append(time.perf_counter() - started)
+                partial.append(token)
+                service.format_partial_output(''.join(partial))
+
+            prediction = await client.run_streaming(service.router.models[0], prompt_input, on_token)
+            return service.format_output(prediction['output'])
+
+        started = time.perf_counter()
+        outputs = await asyncio.gather(*(one(i) for i in range(predictions)))
+        elapsed = time.perf_counter() - started
+        await client.aclose()
+
+        assert all(outputs), 'empty prediction output'
+        counts = fake.request_counts
+        print(f'predictions:         {predictions}')
+        print(f'generation latency:  {latency:.2f}s')
+        print(f'wall time:           {elapsed:.2f}s')
+        print(f'create requests:     {counts["create"]}')
+        print(f'poll requests:       {counts["get"]} ({counts["get"] / predictions:.1f} per prediction)')
+        if first_token_times:
+            print(f'first token p50:     {statistics.median(first_token_times):.2f}s')
+            print(f'first token max:     {max(first_token_times):.2f}s')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--predictions', type=int, default=300)
+    parser.add_argument('--latency', type=float, default=3.0)
+    parser.add_argument('--stream', action='store_true', help='consume output over SSE instead of polling')
+    args = parser.parse_args()
+    asyncio.run(run(args.predictions, args.latency, args.stream))
+
+if __name__ == '__main__':
+    main()
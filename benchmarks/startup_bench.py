@@ -0,0 +1,73 @@
+'''
+Startup time of the bot process, up to the point where it can take updates.
+Exits non-zero if importing app and building TelegramService goes over budget,
+or if a heavy module that should load on first use is imported at startup.
+
+    python -m benchmarks.startup_bench
+    python -m benchmarks.startup_bench --budget-ms 600 --top 15
+'''
+import argparse
+import subprocess
+import sys
+
+# Loaded by the market data, LLM and HTTP paths on first use, never at startup
+DEFERRED_MODULES = ('pandas', 'numpy', 'yfinance', 'newsapi', 'flask')
+
+STARTUP = '''
+import sys, time
+started = time.perf_counter()
+import app
+from services.database.db_service import DatabaseService
+from services.dispatch.dispatch_service import DispatchService
+from services.telegram.telegram_service import TelegramService
+TelegramService('123456:startup-bench', DatabaseService(prefill=False), DispatchService()).setup()
+print(round((time.perf_counter() - started) * 1000, 1))
+print('deferred:' + ','.join(name for name in {deferred!r} if name in sys.modules))
+'''
+
+def parse_importtime(stderr: str) -> list:
+    '''(cumulative_us, self_us, module) for every line of -X importtime output'''
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        # One space before a top-level module, two more per nesting level
+        rows.append((int(cumulative_us), int(self_us), module.rstrip()[1:]))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget-ms', type=float, default=800.0)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='slowest top-level imports to list')
+    args = parser.parse_args()
+
+    code = STARTUP.format(deferred=DEFERRED_MODULES)
+    times = []
+    for _ in range(args.runs):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+        elapsed, loaded = result.stdout.strip().splitlines()[-2:]
+        loaded = loaded[len('deferred:'):]
+        times.append(float(elapsed))
+
+    # app and the modules it imports directly, slowest first
+    rows = parse_importtime(result.stderr)
+    direct = sorted((row for row in rows if row[2] == 'app' or (row[2].startswith('  ') and not row[2].startswith('    '))), reverse=True)
+    print(f'{"cumulative":>12} {"self":>10}  module')
+    for cumulative_us, self_us, module in direct[:args.top]:
+        print(f'{cumulative_us / 1000:>10.1f}ms {self_us / 1000:>8.1f}ms  {module.strip()}')
+
+    best = min(times)
+    print(f'\nstartup: {best:.0f}ms (best of {args.runs}), budget {args.budget_ms:.0f}ms')
+    failures = []
+    if best > args.budget_ms:
+        failures.append(f'startup took {best:.0f}ms')
+    if loaded:
+        failures.append(f'imported at startup: {loaded}')
+    for failure in failures:
+        print(f'FAIL: {failure}')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+'''
+Time and memory per YahooFinanceService.build_stock_data call, and the cost of
+serializing the result for cache keys.
+
+    python -m benchmarks.stock_data_bench
+'''
+import timeit
+import tracemalloc
+from benchmarks.fixtures import make_history, make_info, make_news
+from services.data.yahoo_service import YahooFinanceService
+
+def allocations(build) -> tuple:
+    '''(peak bytes, allocated blocks still referenced by the result) for one call'''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        result = build()
+        after = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    del result
+    return peak, blocks
+
+def main():
+    print(f'{"bars":>6} {"period":>6} {"build":>10} {"peak":>9} {"blocks":>7} {"to_json":>10} {"bytes":>7}')
+    for bars, period in ((21, '1mo'), (260, '1mo'), (260, '1y'), (2520, '1y')):
+        hist, info, news = make_history(bars), make_info(), make_news(10)
+
+        def build():
+            return YahooFinanceService.build_stock_data('ACME', period, info, hist, news)
+
+        stock_data = build()
+        number = 50
+        build_time = min(timeit.repeat(build, number=number, repeat=5)) / number
+        json_time = min(timeit.repeat(stock_data.to_json, number=number, repeat=5)) / number
+        peak, blocks = allocations(build)
+        print(
+            f'{bars:>6} {period:>6} {build_time * 1e3:>8.3f}ms {peak / 1024:>6.1f}KiB {blocks:>7} '
+            f'{json_time * 1e6:>8.1f}us {len(stock_data.to_json()):>7}'
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+'''
+Parity check and benchmark for the Telegram HTML formatting of model output against
+the multi-pass versions it replaced: remove_think_blocks, sanitize_telegram_html,
+strip_incomplete_tag and close_open_tags. Outputs must be identical on the model
+output fixtures and on random strings dense in <, >, newlines and tags.
+
+    python -m benchmarks.telegram_format_bench
+'''
+import random
+import re
+import sys
+import timeit
+from benchmarks.fixtures import LLM_OUTPUT_SIZES, make_llm_output
+from services.llm.replicate_service import ReplicateService
+from utils.telegram_html import TAG_PATTERN, close_open_tags, is_balanced, scan_tags, strip_incomplete_tag
+
+def old_remove_think_blocks(text: str) -> str:
+    cleaned_text = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+    cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
+    return cleaned_text.strip()
+
+def old_sanitize_telegram_html(text: str) -> str:
+    text = re.sub(r'<(\d|\s|\.)', r'&lt;\1', text)
+    text = re.sub(r'(\d|\s)>', r'\1&gt;', text)
+    text = text.replace('<=', '&lt;=')
+    text = text.replace('>=', '&gt;=')
+    allowed_tags = r'</?(?:b|strong|i|em|u|ins|s|strike|del|a|code|pre)(?:\s+[^>]*)?>'
+    return re.sub(allowed_tags, lambda match: match.group(0), text, flags=re.IGNORECASE)
+
+def old_strip_incomplete_tag(text: str) -> str:
+    match = re.search(r'<(?:/?[a-zA-Z][^<>]*|/)?$', text)
+    return text[:match.start()] if match else text
+
+def old_close_open_tags(text: str) -> str:
+    stack = []
+    for match in TAG_PATTERN.finditer(text):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append(name)
+        elif name in stack:
+            del stack[len(stack) - 1 - stack[::-1].index(name):]
+    return text + ''.join(f'</{name}>' for name in reversed(stack))
+
+# Pieces random strings are built from, weighted towards the characters the passes care about
+PIECES = [
+    '<', '>', '<=', '>=', '\n', '\n\n\n', ' ', '\t', '　', '1', '٣', '.', '=', 'a', 'x', '/',
+    '<b>', '</b>', '<i>', '</I>', '<a href="x">', '</a>', '<code>', '</code>', '<pre>', '</pre>', '<b', '</',
+    '<think>', '</think>', '<think>\n', '\n</think>', 'think>',
+]
+
+def random_text(rng: random.Random) -> str:
+    return ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, 40)))
+
+def check_parity(samples: int = 50000, seed: int = 1) -> list:
+    service = ReplicateService(client=object())
+    pairs = [
+        ('remove_think_blocks', old_remove_think_blocks, service.remove_think_blocks),
+        ('sanitize_telegram_html', old_sanitize_telegram_html, service.sanitize_telegram_html),
+        ('strip_incomplete_tag', old_strip_incomplete_tag, strip_incomplete_tag),
+        ('close_open_tags', old_close_open_tags, close_open_tags),
+    ]
+    rng = random.Random(seed)
+    texts = [make_llm_output(size, think=think) for size in LLM_OUTPUT_SIZES.values() for think in (True, False)]
+    texts += [random_text(rng) for _ in range(samples)]
+    failures = []
+    for name, old, new in pairs:
+        for text in texts:
+            if old(text) != new(text):
+                failures.append(f'{name}: {text!r}')
+                break
+    for text in texts:
+        # A balanced text has nothing left open and no stray closing tags
+        if is_balanced(text) and scan_tags(text) != ([], []):
+            failures.append(f'is_balanced: {text!r}')
+            break
+    return failures
+
+def main():
+    failures = check_parity()
+    for failure in failures:
+        print(f'MISMATCH {failure[:200]}')
+
+    service = ReplicateService(client=object())
+    print(f'{"benchmark":<32} {"before":>10} {"after":>10} {"speedup":>8}')
+    for label, size in LLM_OUTPUT_SIZES.items():
+        output = make_llm_output(size)
+        cleaned = service.remove_think_blocks(output)
+        for name, old, new, text in (
+            ('remove_think_blocks', old_remove_think_blocks, service.remove_think_blocks, output),
+            ('sanitize_telegram_html', old_sanitize_telegram_html, service.sanitize_telegram_html, cleaned),
+        ):
+            number = 200
+            before = min(timeit.repeat(lambda: old(text), number=number, repeat=5)) / number
+            after = min(timeit.repeat(lambda: new(text), number=number, repeat=5)) / number
+            print(f'{name + "[" + label + "]":<32} {before * 1e6:>8.1f}us {after * 1e6:>8.1f}us {before / after:>7.1f}x')
+    print('parity ok' if not failures else f'{len(failures)} mismatch(es)')
+    sys.exit(0 if not failures else 1)
+
+if __name__ == '__main__':
+    main()
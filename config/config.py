@@ -4,4 +4,161 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-REPLICATE_TOKEN = os.getenv('REPLICATE_API_TOKEN')
\ No newline at end of file
+# Bot API endpoint the token is appended to; point at a local Bot API server or a fake one for load tests
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org/bot')
+REPLICATE_TOKEN = os.getenv('REPLICATE_API_TOKEN')
+
+# Replicate
+REPLICATE_API_BASE = os.getenv('REPLICATE_API_BASE', 'https://api.replicate.com/v1')
+# Every streamed prediction holds one connection for its whole generation
+REPLICATE_MAX_CONNECTIONS = int(os.getenv('REPLICATE_MAX_CONNECTIONS', '100'))
+# Poll interval for in-flight predictions grows from min to max while they run
+REPLICATE_POLL_MIN_INTERVAL = float(os.getenv('REPLICATE_POLL_MIN_INTERVAL', '0.5'))
+REPLICATE_POLL_MAX_INTERVAL = float(os.getenv('REPLICATE_POLL_MAX_INTERVAL', '5'))
+
+# Streaming analysis replies
+STREAM_ANALYSIS = os.getenv('STREAM_ANALYSIS', 'true').lower() == 'true'
+# Edit the placeholder message every N tokens or T seconds, whichever comes first
+STREAM_EDIT_TOKENS = int(os.getenv('STREAM_EDIT_TOKENS', '40'))
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '2'))
+# Telegram allows roughly one edit per second per chat
+STREAM_EDIT_MIN_INTERVAL = float(os.getenv('STREAM_EDIT_MIN_INTERVAL', '1.2'))
+
+# Outbound Telegram flood control
+# Bot API limits are about 30 messages a second overall, one a second per chat with short
+# bursts allowed, and 20 a minute per group. Rates are per second; 0 disables a limit.
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+TELEGRAM_GLOBAL_BURST = int(os.getenv('TELEGRAM_GLOBAL_BURST', '25'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = int(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_GROUP_RATE = float(os.getenv('TELEGRAM_GROUP_RATE', '0.33'))
+# Times a call is retried after a 429 response, waiting the retry_after it names
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+
+# Concurrency
+# Number of Telegram updates processed at the same time by the bot
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+# Thread pool sizes for blocking service calls
+MARKET_DATA_WORKERS = int(os.getenv('MARKET_DATA_WORKERS', '8'))
+DB_WORKERS = int(os.getenv('DB_WORKERS', '10'))
+
+# Database connection pool
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+# Keep at least DB_WORKERS so no DB thread waits on the pool
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+# Seconds an idle connection above the minimum size is kept open
+DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))
+# Connections idle for longer than this are pinged on checkout
+DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+
+
+# User row cache
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', '300'))
+
+# Market data cache
+STOCK_CACHE_SIZE = int(os.getenv('STOCK_CACHE_SIZE', '512'))
+# Per-field TTLs in seconds: price history/quotes, company info, news
+STOCK_QUOTE_TTL = float(os.getenv('STOCK_QUOTE_TTL', '60'))
+STOCK_INFO_TTL = float(os.getenv('STOCK_INFO_TTL', '21600'))
+STOCK_NEWS_TTL = float(os.getenv('STOCK_NEWS_TTL', '900'))
+# Directory for the on-disk cache backend; leave empty to keep the cache in memory only
+STOCK_CACHE_DIR = os.getenv('STOCK_CACHE_DIR', '')
+
+# Finished LLM analyses are reused for identical prompts within this many seconds
+ANALYSIS_CACHE_TTL = float(os.getenv('ANALYSIS_CACHE_TTL', '300'))
+ANALYSIS_CACHE_SIZE = int(os.getenv('ANALYSIS_CACHE_SIZE', '256'))
+
+# Local daily bar store used for price history and long-window indicators
+BAR_STORE_DIR = os.getenv('BAR_STORE_DIR', 'data/bars')
+# History fetched the first time a ticker is seen; 2y keeps 200-day indicators well populated
+BAR_STORE_BACKFILL_PERIOD = os.getenv('BAR_STORE_BACKFILL_PERIOD', '2y')
+BAR_STORE_MAX_BARS = int(os.getenv('BAR_STORE_MAX_BARS', '1300'))
+
+# Batch analysis and watchlists
+MAX_BATCH_TICKERS = int(os.getenv('MAX_BATCH_TICKERS', '10'))
+MAX_WATCHLIST_SIZE = int(os.getenv('MAX_WATCHLIST_SIZE', '20'))
+
+# Shared /news digest
+# Seconds NewsAPI headlines are reused; 900s stays under 100 requests a day
+NEWS_API_CACHE_TTL = float(os.getenv('NEWS_API_CACHE_TTL', '900'))
+# How often the prewarm job re-checks headlines and rebuilds the digest if they changed
+NEWS_DIGEST_INTERVAL = float(os.getenv('NEWS_DIGEST_INTERVAL', '1800'))
+# Summaries are keyed by their article set, so an unchanged set is reused for this long
+NEWS_DIGEST_TTL = float(os.getenv('NEWS_DIGEST_TTL', '86400'))
+NEWS_DIGEST_ARTICLES = int(os.getenv('NEWS_DIGEST_ARTICLES', '5'))
+
+# Prewarm job for the most requested tickers
+PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'true').lower() == 'true'
+# Seconds between cycles; matching STOCK_QUOTE_TTL keeps warmed quotes from expiring between cycles
+PREWARM_INTERVAL = float(os.getenv('PREWARM_INTERVAL', '60'))
+PREWARM_TOP_TICKERS = int(os.getenv('PREWARM_TOP_TICKERS', '10'))
+# Ranking window over analysis_logs and how often it is recomputed
+PREWARM_LOOKBACK_HOURS = float(os.getenv('PREWARM_LOOKBACK_HOURS', '24'))
+PREWARM_RANK_INTERVAL = float(os.getenv('PREWARM_RANK_INTERVAL', '900'))
+# Pre-generated analyses cost a prediction each, so they are off by default and budgeted
+PREWARM_ANALYSES = os.getenv('PREWARM_ANALYSES', 'false').lower() == 'true'
+# A pre-generated analysis matches user requests only while its quote snapshot is
+# current, so each ticker is regenerated at most once per PREWARM_ANALYSIS_INTERVAL
+PREWARM_ANALYSIS_INTERVAL = float(os.getenv('PREWARM_ANALYSIS_INTERVAL', '900'))
+PREWARM_CONCURRENCY = int(os.getenv('PREWARM_CONCURRENCY', '2'))
+# Daily cap on predictions run by the prewarm job (analyses and news digests), shared by all workers
+PREWARM_MAX_PREDICTIONS_PER_DAY = int(os.getenv('PREWARM_MAX_PREDICTIONS_PER_DAY', '100'))
+
+# Update delivery: polling (single process), webhook (receiver that enqueues updates)
+# or worker (processes queued updates; run as many as needed)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '5000'))
+# Chats are spread over partitions; each partition is processed by one worker at a time
+UPDATE_QUEUE_PARTITIONS = int(os.getenv('UPDATE_QUEUE_PARTITIONS', '64'))
+# Seconds a worker keeps its partitions without a heartbeat
+UPDATE_QUEUE_LEASE = float(os.getenv('UPDATE_QUEUE_LEASE', '30'))
+UPDATE_QUEUE_POLL_INTERVAL = float(os.getenv('UPDATE_QUEUE_POLL_INTERVAL', '0.5'))
+# Maximum updates a worker holds in memory at once
+UPDATE_QUEUE_BATCH = int(os.getenv('UPDATE_QUEUE_BATCH', '200'))
+
+# Persistence of PTB user_data/chat_data (e.g. awaiting_ticker): mysql, sqlite or memory
+PERSISTENCE_BACKEND = os.getenv('PERSISTENCE_BACKEND', 'mysql').lower()
+PERSISTENCE_SQLITE_PATH = os.getenv('PERSISTENCE_SQLITE_PATH', 'data/persistence.sqlite')
+# Seconds between batched writes of changed data
+PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '5'))
+# Conversation state left unchanged for this long is dropped
+PERSISTENCE_STATE_TTL = float(os.getenv('PERSISTENCE_STATE_TTL', '86400'))
+# Users and chats kept in memory; the least recently used are unloaded beyond this
+PERSISTENCE_MAX_ENTRIES = int(os.getenv('PERSISTENCE_MAX_ENTRIES', '10000'))
+# Idle entries are re-read after this many seconds in case another worker changed them
+PERSISTENCE_RELOAD_AFTER = float(os.getenv('PERSISTENCE_RELOAD_AFTER', '60'))
+PERSISTENCE_PURGE_INTERVAL = float(os.getenv('PERSISTENCE_PURGE_INTERVAL', '3600'))
+
+# LLM job queue in front of analyses and news summaries
+# Predictions running at once across all users; later jobs wait in line
+LLM_MAX_CONCURRENT_JOBS = int(os.getenv('LLM_MAX_CONCURRENT_JOBS', '20'))
+# Seconds from submission, including the wait, before a job is cancelled and its credit refunded
+LLM_JOB_TIMEOUT = float(os.getenv('LLM_JOB_TIMEOUT', '180'))
+# Minimum seconds between queue position edits of one message
+JOB_POSITION_UPDATE_INTERVAL = float(os.getenv('JOB_POSITION_UPDATE_INTERVAL', '3'))
+
+# Model routing
+# Models tried in this order until latency data is available, comma separated
+LLM_MODELS = [model.strip() for model in os.getenv('LLM_MODELS', 'meta/llama-4-maverick-instruct,meta/llama-4-scout-instruct').split(',') if model.strip()]
+# Seconds a prediction may take in total, across retries and hedges; below LLM_JOB_TIMEOUT
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', '150'))
+# Start the next model if the first has produced no token after this many seconds
+LLM_HEDGE_AFTER = float(os.getenv('LLM_HEDGE_AFTER', '10'))
+# A model failing this many times in a row is skipped for the cooldown in seconds
+LLM_UNHEALTHY_AFTER = int(os.getenv('LLM_UNHEALTHY_AFTER', '3'))
+LLM_UNHEALTHY_COOLDOWN = float(os.getenv('LLM_UNHEALTHY_COOLDOWN', '60'))
+# Instrumentation
+# Print one JSON line with the stage timings of every analysis and news request
+TRACE_LOG = os.getenv('TRACE_LOG', 'true').lower() == 'true'
+# Serve Prometheus metrics at /metrics on the Flask app
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_HOST = os.getenv('METRICS_HOST', '0.0.0.0')
+# Separate from WEBHOOK_PORT, which the webhook receiver uses
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9100'))
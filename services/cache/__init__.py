@@ -0,0 +1,4 @@
+from services.cache.ttl_cache import TTLCache
+from services.cache.disk_cache import DiskCache
+
+__all__ = ['TTLCache', 'DiskCache']
\ No newline at end of file
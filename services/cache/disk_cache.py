@@ -0,0 +1,72 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Hashable, Optional, Tuple
+
+class DiskCache:
+    '''
+    SQLite-backed cache store so entries survive process restarts.
+    Values are pickled; the store keeps at most max_size entries, dropping
+    the ones closest to expiry first.
+    '''
+
+    def __init__(self, path: str, max_size: int = 10000):
+        self.path = path
+        self.max_size = max_size
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    expires_at REAL NOT NULL,
+    value BLOB NOT NULL
+)
+        ''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)')
+
+    def get(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        '''Return (seconds_left, value) for a live entry, or None'''
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT expires_at, value FROM cache WHERE key = ?', (repr(key),)
+            ).fetchone()
+        if row is None:
+            return None
+        seconds_left = row[0] - time.time()
+        if seconds_left <= 0:
+            return None
+        try:
+            return seconds_left, pickle.loads(row[1])
+        except Exception:
+            self.delete(key)
+            return None
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO cache (key, expires_at, value) VALUES (?, ?, ?)',
+                (repr(key), time.time() + ttl, blob)
+            )
+            self._connection.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+            self._connection.execute('''
+DELETE FROM cache WHERE key IN (
+    SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+)
+            ''', (self.max_size,))
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._connection.execute('DELETE FROM cache WHERE key = ?', (repr(key),))
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM cache')
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
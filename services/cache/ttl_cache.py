@@ -0,0 +1,183 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+class TTLCache:
+    '''
+    Thread-safe, size-bounded cache with per-entry expiry.
+    When full, the least recently used entry is evicted. An optional backend
+    (e.g. DiskCache) is read on memory misses and written on every set.
+    '''
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300, backend=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._loading: Dict[Hashable, Future] = {}
+        self._loading_async: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.backend is not None:
+            stored = self.backend.get(key)
+            if stored is not None:
+                seconds_left, value = stored
+                self._store(key, value, seconds_left)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        '''Return a live in-memory entry without counting a hit or miss or refreshing its recency'''
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.backend is not None:
+            self.backend.set(key, value, ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        '''
+        Return the cached value, or call loader() and cache its result.
+        Concurrent misses for the same key share a single loader call.
+        Exceptions from loader are raised in every waiting caller and not cached.
+        '''
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            # Another caller may have finished loading since the miss above
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            future = self._loading.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._loading[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    async def get_or_load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        '''
+        Asyncio version of get_or_load: concurrent misses for the same key
+        await a single loader() coroutine. If that caller is cancelled, a waiting
+        caller takes over and runs its own loader() instead of being cancelled too.
+        '''
+        while True:
+            value = self.get(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+            future = self._loading_async.get(key)
+            if future is None:
+                break
+            with self._lock:
+                self.coalesced += 1
+            # Shield so a cancelled follower does not cancel the shared load
+            value = await asyncio.shield(future)
+            if value is not _LOADER_CANCELLED:
+                return value
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading_async[key] = future
+        try:
+            value = await loader()
+            self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            # Wake the followers; the first to retry becomes the new loader
+            future.set_result(_LOADER_CANCELLED)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else is waiting
+            future.exception()
+            raise
+        finally:
+            self._loading_async.pop(key, None)
+
+    def _store(self, key: Hashable, value: Any, ttl: float):
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'coalesced': self.coalesced,
+            }
+
+_MISSING = object()
+# Result of a shared async load whose loader was cancelled; followers retry
+_LOADER_CANCELLED = object()
@@ -0,0 +1,209 @@
+import os
+import json
+import threading
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+BAR_DTYPE = np.dtype([
+    ('ts', 'i8'),  # bar start, UTC nanoseconds
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+])
+
+COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+class BarStore:
+    '''
+    Local store of daily OHLCV bars, one memory-mapped .npy file per ticker.
+    The first request backfills `backfill_period` of history; later requests only
+    fetch bars from the last stored day onwards and merge them in. The meta file
+    records the date of the latest split or dividend the stored prices are adjusted
+    for, so only an action newer than that triggers a rebuild.
+    '''
+
+    def __init__(self, directory: str, backfill_period: str = '2y', max_bars: int = 1300):
+        self.directory = directory
+        self.backfill_period = backfill_period
+        self.max_bars = max_bars
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_history(self, ticker: str) -> pd.DataFrame:
+        '''Return all stored bars for ticker after fetching whatever is missing'''
+        with self._lock(ticker):
+            bars, tz = self.read(ticker)
+            if bars is None or len(bars) == 0:
+                bars, tz = self._fetch(ticker, period=self.backfill_period)
+            else:
+                bars, tz = self._update(ticker, bars, tz)
+            return self.to_frame(bars, tz)
+
+    def get_histories(self, tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        '''
+        Return stored bars for several tickers. Deltas for tickers already in the
+        store are fetched with one bulk yf.download; new tickers are backfilled individually.
+        '''
+        locks = [self._lock(ticker) for ticker in sorted(set(tickers))]
+        for lock in locks:
+            lock.acquire()
+        try:
+            stored = {ticker: self.read(ticker) for ticker in tickers}
+            known = {ticker: (bars, tz) for ticker, (bars, tz) in stored.items() if bars is not None and len(bars)}
+
+            result = {}
+            for ticker in tickers:
+                if ticker not in known:
+                    bars, tz = self._fetch(ticker, period=self.backfill_period)
+                    result[ticker] = self.to_frame(bars, tz)
+
+            if known:
+                start = min(self._last_day(bars, tz) for bars, tz in known.values())
+                deltas = self._download(list(known), start)
+                for ticker, (bars, tz) in known.items():
+                    bars, tz = self._merge(ticker, bars, tz, deltas.get(ticker))
+                    result[ticker] = self.to_frame(bars, tz)
+
+            return {ticker: result[ticker] for ticker in tickers}
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def _download(self, tickers: List[str], start: pd.Timestamp) -> Dict[str, pd.DataFrame]:
+        data = yf.download(
+            tickers,
+            start=start.strftime('%Y-%m-%d'),
+            group_by='ticker',
+            auto_adjust=True,
+            actions=True,
+            threads=True,
+            progress=False,
+            multi_level_index=True,
+        )
+        if data is None or data.empty:
+            return {}
+
+        deltas = {}
+        for ticker in tickers:
+            if ticker not in data.columns.get_level_values(0):
+                continue
+            delta = data[ticker].dropna(subset=['Close'])
+            if not delta.empty:
+                deltas[ticker] = delta
+        return deltas
+
+    def read(self, ticker: str):
+        '''Stored bars as a read-only memory map plus the exchange timezone, or (None, None)'''
+        path, meta_path = self._paths(ticker)
+        if not os.path.exists(path) or not os.path.exists(meta_path):
+            return None, None
+        with open(meta_path) as f:
+            tz = json.load(f)['tz']
+        return np.load(path, mmap_mode='r'), tz
+
+    def _actions_applied(self, ticker: str, bars: np.ndarray) -> int:
+        '''UTC nanoseconds of the latest corporate action the stored bars are adjusted for'''
+        _, meta_path = self._paths(ticker)
+        with open(meta_path) as f:
+            applied = json.load(f).get('actions_applied')
+        # Stores written before this was recorded rebuilt on every action they saw
+        return int(bars['ts'][-1]) if applied is None else applied
+
+    def _last_day(self, bars: np.ndarray, tz: str) -> pd.Timestamp:
+        return pd.Timestamp(int(bars['ts'][-1]), tz='UTC').tz_convert(tz).normalize()
+
+    def _update(self, ticker: str, bars: np.ndarray, tz: str):
+        # Re-fetch the last stored day too, since it may have been a partial bar
+        last_day = self._last_day(bars, tz)
+        stock = yf.Ticker(ticker)
+        delta = stock.history(start=last_day.strftime('%Y-%m-%d'), auto_adjust=True, actions=True)
+        return self._merge(ticker, bars, tz, delta)
+
+    def _merge(self, ticker: str, bars: np.ndarray, tz: str, delta: pd.DataFrame):
+        if delta is None or delta.empty:
+            return bars, tz
+
+        # Bulk downloads return exchange-local dates without a timezone
+        if delta.index.tz is None:
+            delta = delta.tz_localize(tz)
+        # A shared bulk download may start before this ticker's last stored day
+        delta = delta[delta.index >= self._last_day(bars, tz)]
+        if delta.empty:
+            return bars, tz
+
+        # A split or dividend re-adjusts all earlier prices, so rebuild from scratch.
+        # The re-fetched last day repeats an action already applied, which is skipped
+        applied = self._actions_applied(ticker, bars)
+        if self._latest_action(delta) > applied:
+            return self._fetch(ticker, period=self.backfill_period)
+
+        new_bars = self.to_bars(delta)
+        kept = bars[bars['ts'] < new_bars['ts'][0]]
+        merged = np.concatenate([kept, new_bars])[-self.max_bars:]
+        self._write(ticker, merged, tz, applied)
+        return merged, tz
+
+    def _fetch(self, ticker: str, period: str):
+        hist = yf.Ticker(ticker).history(period=period, auto_adjust=True, actions=True)
+        if hist.empty:
+            return np.empty(0, dtype=BAR_DTYPE), 'UTC'
+        tz = str(hist.index.tz) if hist.index.tz is not None else 'UTC'
+        bars = self.to_bars(hist)[-self.max_bars:]
+        self._write(ticker, bars, tz, self._latest_action(hist))
+        return bars, tz
+
+    def _latest_action(self, hist: pd.DataFrame) -> int:
+        '''UTC nanoseconds of the latest split or dividend in hist, or 0 if there is none'''
+        latest = 0
+        for column in ('Dividends', 'Stock Splits'):
+            if column in hist.columns:
+                dates = hist.index[(hist[column].fillna(0) != 0).to_numpy()]
+                if len(dates):
+                    latest = max(latest, int(self.to_utc_ns(dates).max()))
+        return latest
+
+    def _write(self, ticker: str, bars: np.ndarray, tz: str, actions_applied: int):
+        path, meta_path = self._paths(ticker)
+        # Write to temporary files and rename so readers never see a partial file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, bars)
+        os.replace(tmp_path, path)
+        tmp_meta_path = f'{meta_path}.{os.getpid()}.tmp'
+        with open(tmp_meta_path, 'w') as f:
+            json.dump({'tz': tz, 'actions_applied': actions_applied}, f)
+        os.replace(tmp_meta_path, meta_path)
+
+    def _paths(self, ticker: str):
+        name = ticker.upper().replace('/', '_')
+        base = os.path.join(self.directory, name)
+        return f'{base}.npy', f'{base}.json'
+
+    def _lock(self, ticker: str) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(ticker.upper(), threading.Lock())
+
+    @staticmethod
+    def to_utc_ns(index: pd.DatetimeIndex) -> np.ndarray:
+        index = index if index.tz is not None else index.tz_localize('UTC')
+        return index.tz_convert('UTC').as_unit('ns').asi8
+
+    @staticmethod
+    def to_bars(hist: pd.DataFrame) -> np.ndarray:
+        bars = np.empty(len(hist), dtype=BAR_DTYPE)
+        bars['ts'] = BarStore.to_utc_ns(hist.index)
+        for field, column in COLUMNS.items():
+            bars[field] = hist[column].to_numpy(dtype='f8')
+        return bars
+
+    @staticmethod
+    def to_frame(bars: np.ndarray, tz: str) -> pd.DataFrame:
+        index = pd.DatetimeIndex(pd.to_datetime(np.asarray(bars['ts']), utc=True)).tz_convert(tz)
+        frame = pd.DataFrame({column: np.array(bars[field]) for field, column in COLUMNS.items()}, index=index)
+        frame['Volume'] = frame['Volume'].fillna(0).astype('int64')
+        return frame
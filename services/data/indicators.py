@@ -0,0 +1,137 @@
+'''
+Technical indicators on NumPy arrays.
+
+All functions work along the last axis, so a 2-D array of shape
+(tickers, bars) computes one row per ticker. Rows may be left-padded with NaN
+when tickers have different history lengths; windows that reach into the
+padding come out as NaN, the same as a window that is not yet full.
+'''
+from typing import Dict, Iterable, Optional
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+INDICATORS = (
+    'sma20', 'sma50', 'sma200',
+    'rsi',
+    'bb_middle', 'bb_upper', 'bb_lower',
+    'atr',
+    'ema12', 'ema26', 'macd', 'macd_signal', 'macd_hist',
+)
+
+def rolling_mean(x: np.ndarray, window: int, full: bool = True) -> np.ndarray:
+    '''Mean over the trailing window; NaN until the window is full'''
+    if not full:
+        if x.shape[-1] < window:
+            return np.full(x.shape[:-1], np.nan)
+        return x[..., -window:].mean(axis=-1)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = sliding_window_view(x, window, axis=-1).mean(axis=-1)
+    return out
+
+def rolling_std(x: np.ndarray, window: int, full: bool = True) -> np.ndarray:
+    '''Sample standard deviation (ddof=1) over the trailing window'''
+    if not full:
+        if x.shape[-1] < window:
+            return np.full(x.shape[:-1], np.nan)
+        return x[..., -window:].std(axis=-1, ddof=1)
+    out = np.full(x.shape, np.nan)
+    if x.shape[-1] >= window:
+        out[..., window - 1:] = sliding_window_view(x, window, axis=-1).std(axis=-1, ddof=1)
+    return out
+
+def ema(x: np.ndarray, span: int) -> np.ndarray:
+    '''Exponential moving average seeded with the first value (pandas ewm(adjust=False))'''
+    alpha = 2.0 / (span + 1.0)
+    decay = 1.0 - alpha
+    if x.ndim == 1:
+        # A plain float loop beats per-step NumPy calls for a single series
+        out = np.empty(len(x))
+        previous = np.nan
+        for i, value in enumerate(x.tolist()):
+            previous = value if previous != previous else alpha * value + decay * previous
+            out[i] = previous
+        return out
+
+    out = np.empty(x.shape)
+    previous = np.full(x.shape[:-1], np.nan)
+    for i in range(x.shape[-1]):
+        value = x[..., i]
+        previous = np.where(np.isnan(previous), value, alpha * value + decay * previous)
+        out[..., i] = previous
+    return out
+
+def compute_indicators(
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    names: Optional[Iterable[str]] = None,
+    full: bool = False,
+) -> Dict[str, np.ndarray]:
+    '''
+    Compute the requested indicators in one pass, sharing intermediates.
+    Returns the last value of each indicator (a scalar per row), or the whole
+    series when full=True. names defaults to all INDICATORS.
+    '''
+    close = np.asarray(close, dtype=np.float64)
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    wanted = set(INDICATORS if names is None else names)
+    unknown = wanted - set(INDICATORS)
+    if unknown:
+        raise ValueError(f'Unknown indicators: {sorted(unknown)}')
+
+    def last(series: np.ndarray) -> np.ndarray:
+        return series if full else series[..., -1]
+
+    result = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for window in (20, 50, 200):
+            if f'sma{window}' in wanted:
+                result[f'sma{window}'] = rolling_mean(close, window, full)
+
+        if wanted & {'bb_middle', 'bb_upper', 'bb_lower'}:
+            middle = result['sma20'] if 'sma20' in result else rolling_mean(close, 20, full)
+            band = rolling_std(close, 20, full) * 2
+            result['bb_middle'] = middle
+            result['bb_upper'] = middle + band
+            result['bb_lower'] = middle - band
+
+        missing = np.isnan(close)
+        if 'rsi' in wanted:
+            delta = np.diff(close, axis=-1, prepend=np.nan)
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+            # Padding stays NaN; the first real bar has no change and counts as zero
+            gain[missing] = np.nan
+            loss[missing] = np.nan
+            rs = rolling_mean(gain, 14, full) / rolling_mean(loss, 14, full)
+            result['rsi'] = 100 - (100 / (1 + rs))
+
+        if 'atr' in wanted:
+            previous_close = np.concatenate([np.full(close.shape[:-1] + (1,), np.nan), close[..., :-1]], axis=-1)
+            # fmax skips NaN, so the first bar's true range is its high-low range
+            true_range = np.fmax(np.fmax(high - low, np.abs(high - previous_close)), np.abs(low - previous_close))
+            result['atr'] = rolling_mean(true_range, 14, full)
+
+        if wanted & {'ema12', 'ema26', 'macd', 'macd_signal', 'macd_hist'}:
+            ema12 = ema(close, 12)
+            ema26 = ema(close, 26)
+            macd = ema12 - ema26
+            signal = ema(macd, 9)
+            result['ema12'] = last(ema12)
+            result['ema26'] = last(ema26)
+            result['macd'] = last(macd)
+            result['macd_signal'] = last(signal)
+            result['macd_hist'] = last(macd - signal)
+
+    return {name: result[name] for name in wanted}
+
+def annualized_volatility(close: np.ndarray, periods_per_year: int = 252) -> np.ndarray:
+    '''Sample standard deviation of simple returns, annualized'''
+    close = np.asarray(close, dtype=np.float64)
+    returns = close[..., 1:] / close[..., :-1] - 1
+    if returns.shape[-1] < 2:
+        return np.full(close.shape[:-1], np.nan)
+    with np.errstate(invalid='ignore'):
+        return np.nanstd(returns, axis=-1, ddof=1) * np.sqrt(periods_per_year)
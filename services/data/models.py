@@ -0,0 +1,252 @@
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional
+import orjson
+
+# News items kept per stock; the prompts use at most five
+MAX_NEWS_ITEMS = 5
+
+def rounded(value, digits: int = 2) -> Optional[float]:
+    '''Float rounded to `digits` places, or None for missing, NaN or non-numeric values'''
+    if value is None or isinstance(value, (str, bool)):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) or math.isinf(number) else round(number, digits)
+
+def whole(value) -> Optional[int]:
+    number = rounded(value, 0)
+    return None if number is None else int(number)
+
+def text(value) -> Optional[str]:
+    return value if isinstance(value, str) and value else None
+
+def flag(value) -> Optional[bool]:
+    return None if value is None else bool(value)
+
+@dataclass(slots=True)
+class StockInfo:
+    '''Company fundamentals and quote from yfinance's Ticker.info; None where Yahoo has no value'''
+    name: Optional[str] = None
+    sector: Optional[str] = None
+    industry: Optional[str] = None
+    current_price: Optional[float] = None
+    previous_close: Optional[float] = None
+    open: Optional[float] = None
+    day_low: Optional[float] = None
+    day_high: Optional[float] = None
+    fifty_two_week_low: Optional[float] = None
+    fifty_two_week_high: Optional[float] = None
+    fifty_day_average: Optional[float] = None
+    two_hundred_day_average: Optional[float] = None
+    volume: Optional[int] = None
+    average_volume: Optional[int] = None
+    average_volume_10d: Optional[int] = None
+    market_cap: Optional[int] = None
+    beta: Optional[float] = None
+    shares_outstanding: Optional[int] = None
+    float_shares: Optional[int] = None
+    pe_ratio: Optional[float] = None
+    forward_pe: Optional[float] = None
+    eps: Optional[float] = None
+    forward_eps: Optional[float] = None
+    price_to_book: Optional[float] = None
+    price_to_sales: Optional[float] = None
+    peg_ratio: Optional[float] = None
+    revenue: Optional[int] = None
+    revenue_per_share: Optional[float] = None
+    gross_margins: Optional[float] = None
+    operating_margins: Optional[float] = None
+    profit_margins: Optional[float] = None
+    ebitda: Optional[int] = None
+    ebitda_margins: Optional[float] = None
+    total_cash: Optional[int] = None
+    total_cash_per_share: Optional[float] = None
+    total_debt: Optional[int] = None
+    debt_to_equity: Optional[float] = None
+    current_ratio: Optional[float] = None
+    quick_ratio: Optional[float] = None
+    book_value: Optional[float] = None
+    operating_cash_flow: Optional[int] = None
+    free_cash_flow: Optional[int] = None
+    return_on_assets: Optional[float] = None
+    return_on_equity: Optional[float] = None
+    earnings_growth: Optional[float] = None
+    revenue_growth: Optional[float] = None
+    year_to_date_change: Optional[float] = None
+    dividend_rate: Optional[float] = None
+    dividend_yield: Optional[float] = None
+    payout_ratio: Optional[float] = None
+    ex_dividend_date: Optional[int] = None
+    target_mean_price: Optional[float] = None
+    target_high_price: Optional[float] = None
+    target_low_price: Optional[float] = None
+    recommendation: Optional[str] = None
+    num_analyst_opinions: Optional[int] = None
+    shares_short: Optional[int] = None
+    short_ratio: Optional[float] = None
+    short_percent_of_float: Optional[float] = None
+    business_summary: Optional[str] = None
+
+    @classmethod
+    def from_info(cls, info: dict) -> 'StockInfo':
+        get = info.get
+        summary = text(get('longBusinessSummary'))
+        return cls(
+            name=text(get('longName')),
+            sector=text(get('sector')),
+            industry=text(get('industry')),
+            current_price=rounded(get('currentPrice')),
+            previous_close=rounded(get('previousClose')),
+            open=rounded(get('open')),
+            day_low=rounded(get('dayLow')),
+            day_high=rounded(get('dayHigh')),
+            fifty_two_week_low=rounded(get('fiftyTwoWeekLow')),
+            fifty_two_week_high=rounded(get('fiftyTwoWeekHigh')),
+            fifty_day_average=rounded(get('fiftyDayAverage')),
+            two_hundred_day_average=rounded(get('twoHundredDayAverage')),
+            volume=whole(get('volume')),
+            average_volume=whole(get('averageVolume')),
+            average_volume_10d=whole(get('averageVolume10days')),
+            market_cap=whole(get('marketCap')),
+            beta=rounded(get('beta')),
+            shares_outstanding=whole(get('sharesOutstanding')),
+            float_shares=whole(get('floatShares')),
+            pe_ratio=rounded(get('trailingPE')),
+            forward_pe=rounded(get('forwardPE')),
+            eps=rounded(get('trailingEps')),
+            forward_eps=rounded(get('forwardEps')),
+            price_to_book=rounded(get('priceToBook')),
+            price_to_sales=rounded(get('priceToSalesTrailing12Months')),
+            peg_ratio=rounded(get('trailingPegRatio')),
+            revenue=whole(get('totalRevenue')),
+            revenue_per_share=rounded(get('revenuePerShare')),
+            # Margins and returns are ratios, so keep enough places for one decimal of percent
+            gross_margins=rounded(get('grossMargins'), 4),
+            operating_margins=rounded(get('operatingMargins'), 4),
+            profit_margins=rounded(get('profitMargins'), 4),
+            ebitda=whole(get('ebitda')),
+            ebitda_margins=rounded(get('ebitdaMargins'), 4),
+            total_cash=whole(get('totalCash')),
+            total_cash_per_share=rounded(get('totalCashPerShare')),
+            total_debt=whole(get('totalDebt')),
+            debt_to_equity=rounded(get('debtToEquity')),
+            current_ratio=rounded(get('currentRatio')),
+            quick_ratio=rounded(get('quickRatio')),
+            book_value=rounded(get('bookValue')),
+            operating_cash_flow=whole(get('operatingCashflow')),
+            free_cash_flow=whole(get('freeCashflow')),
+            return_on_assets=rounded(get('returnOnAssets'), 4),
+            return_on_equity=rounded(get('returnOnEquity'), 4),
+            earnings_growth=rounded(get('earningsGrowth'), 4),
+            revenue_growth=rounded(get('revenueGrowth'), 4),
+            year_to_date_change=rounded(get('52WeekChange'), 4),
+            dividend_rate=rounded(get('dividendRate')),
+            dividend_yield=rounded(get('dividendYield')),
+            payout_ratio=rounded(get('payoutRatio'), 4),
+            ex_dividend_date=whole(get('exDividendDate')),
+            target_mean_price=rounded(get('targetMeanPrice')),
+            target_high_price=rounded(get('targetHighPrice')),
+            target_low_price=rounded(get('targetLowPrice')),
+            recommendation=text(get('recommendationKey')),
+            num_analyst_opinions=whole(get('numberOfAnalystOpinions')),
+            shares_short=whole(get('sharesShort')),
+            short_ratio=rounded(get('shortRatio')),
+            short_percent_of_float=rounded(get('shortPercentOfFloat'), 4),
+            business_summary=summary[:300] + '...' if summary else None,
+        )
+
+@dataclass(slots=True)
+class Indicators:
+    '''Last value of each technical indicator'''
+    price: Optional[float] = None
+    sma20: Optional[float] = None
+    sma50: Optional[float] = None
+    sma200: Optional[float] = None
+    rsi: Optional[float] = None
+    macd: Optional[float] = None
+    macd_signal: Optional[float] = None
+    upper_bollinger: Optional[float] = None
+    lower_bollinger: Optional[float] = None
+    atr: Optional[float] = None
+
+@dataclass(slots=True)
+class Signals:
+    '''Technical signals derived from Indicators; None when an input is missing'''
+    price_above_sma20: Optional[bool] = None
+    price_above_sma50: Optional[bool] = None
+    price_above_sma200: Optional[bool] = None
+    sma20_above_sma50: Optional[bool] = None
+    rsi_overbought: Optional[bool] = None
+    rsi_oversold: Optional[bool] = None
+    macd_bullish: Optional[bool] = None
+
+@dataclass(slots=True)
+class Bar:
+    date: str
+    open: Optional[float]
+    high: Optional[float]
+    low: Optional[float]
+    close: Optional[float]
+    volume: Optional[int]
+
+@dataclass(slots=True)
+class HistoricalData:
+    '''Price summary over the requested period, with indicators over all available bars'''
+    start_date: str
+    end_date: str
+    start_price: Optional[float]
+    end_price: Optional[float]
+    price_change: Optional[float]
+    percent_change: Optional[float]
+    max_price: Optional[float]
+    min_price: Optional[float]
+    avg_volume: Optional[float]
+    max_volume: Optional[int]
+    volatility: Optional[float]
+    data_points: int
+    current_indicators: Indicators
+    technical_signals: Signals
+    # Last 5 days
+    recent_days: List[Bar] = field(default_factory=list)
+
+@dataclass(slots=True)
+class NewsItem:
+    title: str
+    # YYYY-MM-DD, or None if Yahoo did not give a publish date
+    date: Optional[str] = None
+
+    @classmethod
+    def from_yahoo(cls, items: list) -> List['NewsItem']:
+        '''Headlines from Ticker.news, skipping items without a title'''
+        news = []
+        for item in items or []:
+            content = item.get('content') or {}
+            title = text(content.get('title'))
+            if title:
+                published = text(content.get('pubDate'))
+                news.append(cls(title, published[:10] if published else None))
+            if len(news) == MAX_NEWS_ITEMS:
+                break
+        return news
+
+@dataclass(slots=True)
+class StockData:
+    '''Everything the analysis prompts need for one stock, or the reason it could not be loaded'''
+    ticker: str
+    period: str = '1mo'
+    stock_info: StockInfo = field(default_factory=StockInfo)
+    # None when no price history is available
+    historical_data: Optional[HistoricalData] = None
+    news: List[NewsItem] = field(default_factory=list)
+    error: Optional[str] = None
+
+    @classmethod
+    def failed(cls, ticker: str, error: str) -> 'StockData':
+        return cls(ticker, error=error)
+
+    def to_json(self) -> bytes:
+        '''Compact JSON with sorted keys, so equal data always serializes to equal bytes'''
+        return orjson.dumps(self, option=orjson.OPT_SORT_KEYS)
@@ -1,11 +1,15 @@
 import os
 from typing import List, Dict
 from newsapi import NewsApiClient
+from services.cache.ttl_cache import TTLCache
+from config.config import NEWS_API_CACHE_TTL
 
 class NewsService:
     def __init__(self):
         self.api_key = os.getenv('NEWS_API_KEY')
         self.newsapi = NewsApiClient(api_key=self.api_key)
+        # Headline responses by page size, shared by all users to stay within the NewsAPI quota
+        self.headlines_cache = TTLCache(max_size=16, ttl=NEWS_API_CACHE_TTL)
     
     def get_highlighted_news(self, limit: int = 5) -> List[Dict]:
         """
@@ -18,27 +22,36 @@ class NewsService:
             List of news articles
         """
         try:
-            # Get headlines from business category
-            business_news = self.newsapi.get_top_headlines(
-                category='business',
-                language='en',
-                page_size=limit
-            )
-            
-            # Format the results
-            articles = []
-            if business_news['status'] == 'ok':
-                for article in business_news['articles'][:limit]:
-                    articles.append({
-                        'title': article['title'],
-                        'description': article['description'],
-                        'url': article['url'],
-                        'source': article['source']['name'],
-                        'published_at': article['publishedAt'],
-                        'content': article['content']
-                    })
-            
-            return articles
+            return self.headlines_cache.get_or_load(limit, lambda: self.fetch_highlighted_news(limit))
         except Exception as e:
             print(f"Error fetching news: {e}")
-            return []
\ No newline at end of file
+            return []
+
+    def invalidate_highlighted_news(self):
+        '''Drop cached headlines so the next call asks NewsAPI again'''
+        self.headlines_cache.clear()
+
+    def fetch_highlighted_news(self, limit: int) -> List[Dict]:
+        '''Request headlines from NewsAPI. Raises on failure so errors are not cached'''
+        # Get headlines from business category
+        business_news = self.newsapi.get_top_headlines(
+            category='business',
+            language='en',
+            page_size=limit
+        )
+        if business_news['status'] != 'ok':
+            raise RuntimeError(business_news.get('message', business_news['status']))
+
+        # Format the results
+        articles = []
+        for article in business_news['articles'][:limit]:
+            articles.append({
+                'title': article['title'],
+                'description': article['description'],
+                'url': article['url'],
+                'source': article['source']['name'],
+                'published_at': article['publishedAt'],
+                'content': article['content']
+            })
+
+        return articles
\ No newline at end of file
@@ -1,299 +1,295 @@
-import json
+import os
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 import numpy as np
 import pandas as pd
 import yfinance as yf
+from services.cache.ttl_cache import TTLCache
+from services.cache.disk_cache import DiskCache
+from services.data.bar_store import BarStore
+from services.data.indicators import compute_indicators, annualized_volatility
+from services.metrics.metrics import span
+from services.data.models import StockData, StockInfo, HistoricalData, Indicators, Signals, Bar, NewsItem, rounded, whole
+from config.config import (
+    STOCK_CACHE_SIZE,
+    STOCK_QUOTE_TTL,
+    STOCK_INFO_TTL,
+    STOCK_NEWS_TTL,
+    STOCK_CACHE_DIR,
+    BAR_STORE_DIR,
+    BAR_STORE_BACKFILL_PERIOD,
+    BAR_STORE_MAX_BARS,
+    MARKET_DATA_WORKERS,
+)
+
+# Indicators reported in historical_data['current_indicators']
+SUMMARY_INDICATORS = ('sma20', 'sma50', 'sma200', 'rsi', 'bb_upper', 'bb_lower', 'atr', 'macd', 'macd_signal')
+
+PERIOD_OFFSETS = {
+    '1d': pd.DateOffset(days=1),
+    '5d': pd.DateOffset(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+}
+
+_shared_lock = threading.Lock()
+
+def shared(factory):
+    '''Build factory() on first call and return that object from then on, across threads'''
+    cached = functools.cache(factory)
+
+    @functools.wraps(factory)
+    def get():
+        with _shared_lock:
+            return cached()
+    return get
+
+def build_cache(name: str, ttl: float) -> TTLCache:
+    '''Memory cache for one kind of market data, persisted to STOCK_CACHE_DIR when set'''
+    backend = None
+    if STOCK_CACHE_DIR:
+        backend = DiskCache(os.path.join(STOCK_CACHE_DIR, f'{name}.sqlite'), max_size=STOCK_CACHE_SIZE * 4)
+    return TTLCache(max_size=STOCK_CACHE_SIZE, ttl=ttl, backend=backend)
 
 class YahooFinanceService:
     '''Fetch and process stock data from Yahoo Finance'''
 
+    # Built on first use, so importing this module does not open cache files or start threads.
+    # Quotes change by the minute, news by the hour, company fundamentals by the day
+    history_cache = staticmethod(shared(lambda: build_cache('history', STOCK_QUOTE_TTL)))
+    info_cache = staticmethod(shared(lambda: build_cache('info', STOCK_INFO_TTL)))
+    news_cache = staticmethod(shared(lambda: build_cache('news', STOCK_NEWS_TTL)))
+    bar_store = staticmethod(shared(
+        lambda: BarStore(BAR_STORE_DIR, backfill_period=BAR_STORE_BACKFILL_PERIOD, max_bars=BAR_STORE_MAX_BARS)
+    ))
+    # Fan-out pool for per-ticker info/news fetches in batch requests
+    fetch_pool = staticmethod(shared(
+        lambda: ThreadPoolExecutor(max_workers=MARKET_DATA_WORKERS, thread_name_prefix='yahoo-fetch')
+    ))
+
     @staticmethod
-    def get_stock_data(ticker: str, period: str = '1mo') -> dict:
+    def get_stock_data(ticker: str, period: str = '1mo') -> StockData:
         '''Get basic information about a stock.'''
 
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
-            hist = stock.history(period=period)
+            with span('yahoo.info'):
+                info = YahooFinanceService.get_info(ticker)
+            with span('yahoo.history'):
+                hist = YahooFinanceService.history_cache().get_or_load(ticker, lambda: YahooFinanceService.bar_store().get_history(ticker))
+            with span('yahoo.news'):
+                news = YahooFinanceService.get_news(ticker)
+            with span('stock_data.build'):
+                return YahooFinanceService.build_stock_data(ticker, period, info, hist, news)
+        except Exception as e:
+            return StockData.failed(ticker, f"Error retrieving information for {ticker}: {str(e)}")
 
-            data_info = YahooFinanceService.get_stock_info(info)
-            data_hist = YahooFinanceService.get_historical_data(hist)
-            data = {
-                'ticker': ticker,
-                'period': period,
-                'stock_info': data_info,
-                'historical_data': data_hist,
-                'news': stock.news,
-            }
+    @staticmethod
+    def get_batch_stock_data(tickers: List[str], period: str = '1mo') -> Dict[str, StockData]:
+        '''
+        Get stock data for several tickers at once, keyed by ticker.
+        History comes from one bulk download, info and news are fetched concurrently,
+        and indicators are computed for all tickers on one stacked array.
+        '''
+        pool = YahooFinanceService.fetch_pool()
+        info_futures = {ticker: pool.submit(YahooFinanceService.get_info, ticker) for ticker in tickers}
+        news_futures = {ticker: pool.submit(YahooFinanceService.get_news, ticker) for ticker in tickers}
 
-            data_serialized = json.loads(json.dumps(data, cls=JSONEncoder))        
-            return format_float_values(data_serialized)
+        results = {}
+        histories = {}
+        try:
+            with span('yahoo.history'):
+                histories = YahooFinanceService.get_histories(tickers)
         except Exception as e:
-            return {'error': f"Error retrieving information for {ticker}: {str(e)}"}
-        
+            for ticker in tickers:
+                results[ticker] = StockData.failed(ticker, f"Error retrieving information for {ticker}: {str(e)}")
+
+        valid = [ticker for ticker in tickers if ticker in histories and not histories[ticker].empty]
+        stacked = {}
+        if valid:
+            close, high, low = (
+                YahooFinanceService.stack_column([histories[ticker] for ticker in valid], column)
+                for column in ('Close', 'High', 'Low')
+            )
+            with span('indicators'):
+                stacked = compute_indicators(close, high, low, names=SUMMARY_INDICATORS)
+
+        for ticker in tickers:
+            if ticker in results:
+                continue
+            try:
+                indicators = None
+                if ticker in valid:
+                    row = valid.index(ticker)
+                    indicators = {name: values[row] for name, values in stacked.items()}
+                results[ticker] = YahooFinanceService.build_stock_data(
+                    ticker,
+                    period,
+                    info_futures[ticker].result(),
+                    histories.get(ticker, pd.DataFrame()),
+                    news_futures[ticker].result(),
+                    indicators,
+                )
+            except Exception as e:
+                results[ticker] = StockData.failed(ticker, f"Error retrieving information for {ticker}: {str(e)}")
+        return results
+
     @staticmethod
-    def get_stock_info(info: dict) -> dict:
-        '''Get stock information for a given ticker.'''
-        analysis_info = {
-            # Basic Information
-            'name': info.get('longName', 'N/A'),
-            'sector': info.get('sector', 'N/A'),
-            'industry': info.get('industry', 'N/A'),
-            
-            # Price Information
-            'current_price': info.get('currentPrice', 'N/A'),
-            'previous_close': info.get('previousClose', 'N/A'),
-            'open': info.get('open', 'N/A'),
-            'day_low': info.get('dayLow', 'N/A'),
-            'day_high': info.get('dayHigh', 'N/A'),
-            'fifty_two_week_low': info.get('fiftyTwoWeekLow', 'N/A'),
-            'fifty_two_week_high': info.get('fiftyTwoWeekHigh', 'N/A'),
-            'fifty_day_average': info.get('fiftyDayAverage', 'N/A'),
-            'two_hundred_day_average': info.get('twoHundredDayAverage', 'N/A'),
-            
-            # Volume and Market Information
-            'volume': info.get('volume', 'N/A'),
-            'average_volume': info.get('averageVolume', 'N/A'),
-            'average_volume_10d': info.get('averageVolume10days', 'N/A'),
-            'market_cap': info.get('marketCap', 'N/A'),
-            'beta': info.get('beta', 'N/A'),
-            'shares_outstanding': info.get('sharesOutstanding', 'N/A'),
-            'float_shares': info.get('floatShares', 'N/A'),
-            
-            # Value Metrics
-            'pe_ratio': info.get('trailingPE', 'N/A'),
-            'forward_pe': info.get('forwardPE', 'N/A'),
-            'eps': info.get('trailingEps', 'N/A'),
-            'forward_eps': info.get('forwardEps', 'N/A'),
-            'price_to_book': info.get('priceToBook', 'N/A'),
-            'price_to_sales': info.get('priceToSalesTrailing12Months', 'N/A'),
-            'peg_ratio': info.get('trailingPegRatio', 'N/A'),
-            
-            # Income Statement Metrics
-            'revenue': info.get('totalRevenue', 'N/A'),
-            'revenue_per_share': info.get('revenuePerShare', 'N/A'),
-            'gross_margins': info.get('grossMargins', 'N/A'),
-            'operating_margins': info.get('operatingMargins', 'N/A'),
-            'profit_margins': info.get('profitMargins', 'N/A'),
-            'ebitda': info.get('ebitda', 'N/A'),
-            'ebitda_margins': info.get('ebitdaMargins', 'N/A'),
-            
-            # Balance Sheet Metrics
-            'total_cash': info.get('totalCash', 'N/A'),
-            'total_cash_per_share': info.get('totalCashPerShare', 'N/A'),
-            'total_debt': info.get('totalDebt', 'N/A'),
-            'debt_to_equity': info.get('debtToEquity', 'N/A'),
-            'current_ratio': info.get('currentRatio', 'N/A'),
-            'quick_ratio': info.get('quickRatio', 'N/A'),
-            'book_value': info.get('bookValue', 'N/A'),
-            
-            # Cash Flow Metrics
-            'operating_cash_flow': info.get('operatingCashflow', 'N/A'),
-            'free_cash_flow': info.get('freeCashflow', 'N/A'),
-            
-            # Performance Metrics
-            'return_on_assets': info.get('returnOnAssets', 'N/A'),
-            'return_on_equity': info.get('returnOnEquity', 'N/A'),
-            'earnings_growth': info.get('earningsGrowth', 'N/A'),
-            'revenue_growth': info.get('revenueGrowth', 'N/A'),
-            'year_to_date_change': info.get('52WeekChange', 'N/A'),
-            
-            # Dividend Information
-            'dividend_rate': info.get('dividendRate', 'N/A'),
-            'dividend_yield': info.get('dividendYield', 'N/A'),
-            'payout_ratio': info.get('payoutRatio', 'N/A'),
-            'ex_dividend_date': info.get('exDividendDate', 'N/A'),
-            
-            # Analyst Information
-            'target_mean_price': info.get('targetMeanPrice', 'N/A'),
-            'target_high_price': info.get('targetHighPrice', 'N/A'),
-            'target_low_price': info.get('targetLowPrice', 'N/A'),
-            'recommendation': info.get('recommendationKey', 'N/A'),
-            'num_analyst_opinions': info.get('numberOfAnalystOpinions', 'N/A'),
-            
-            # Short Interest
-            'shares_short': info.get('sharesShort', 'N/A'),
-            'short_ratio': info.get('shortRsatio', 'N/A'),
-            'short_percent_of_float': info.get('shortPercentOfFloat', 'N/A'),
-            
-            # Business Summary
-            'business_summary': info.get('longBusinessSummary', 'N/A')[:300] + '...' if info.get('longBusinessSummary', 'N/A') else 'N/A',
-        }
-        
-        return analysis_info
+    def refresh_batch_stock_data(tickers: List[str], period: str = '1mo') -> Dict[str, StockData]:
+        '''Like get_batch_stock_data, but reloads price history even if it is still cached'''
+        for ticker in tickers:
+            YahooFinanceService.history_cache().delete(ticker)
+        return YahooFinanceService.get_batch_stock_data(tickers, period)
+
+    @staticmethod
+    def get_info(ticker: str) -> dict:
+        return YahooFinanceService.info_cache().get_or_load(ticker, lambda: yf.Ticker(ticker).info)
+
+    @staticmethod
+    def get_news(ticker: str) -> list:
+        return YahooFinanceService.news_cache().get_or_load(ticker, lambda: yf.Ticker(ticker).news)
+
+    @staticmethod
+    def get_histories(tickers: List[str]) -> Dict[str, pd.DataFrame]:
+        '''Price history for several tickers, fetching all cache misses from the bar store together'''
+        histories = {ticker: YahooFinanceService.history_cache().get(ticker) for ticker in tickers}
+        missing = [ticker for ticker, hist in histories.items() if hist is None]
+        if missing:
+            for ticker, hist in YahooFinanceService.bar_store().get_histories(missing).items():
+                YahooFinanceService.history_cache().set(ticker, hist)
+                histories[ticker] = hist
+        return histories
+
+    @staticmethod
+    def stack_column(histories: List[pd.DataFrame], column: str) -> np.ndarray:
+        '''Stack one column of several histories into a (tickers, bars) array, right-aligned and NaN-padded'''
+        stacked = np.full((len(histories), max(len(hist) for hist in histories)), np.nan)
+        for row, hist in enumerate(histories):
+            stacked[row, stacked.shape[1] - len(hist):] = hist[column].to_numpy(dtype=np.float64)
+        return stacked
+
+    @staticmethod
+    def build_stock_data(ticker: str, period: str, info: dict, hist: pd.DataFrame, news: list, indicators: dict = None) -> StockData:
+        '''Assemble the StockData used by the prompts from raw info, history and news.'''
+        stock_info = StockInfo.from_info(info)
+        YahooFinanceService.apply_latest_quote(stock_info, hist)
+        return StockData(
+            ticker=ticker,
+            period=period,
+            stock_info=stock_info,
+            historical_data=YahooFinanceService.get_historical_data(hist, period, indicators),
+            news=NewsItem.from_yahoo(news),
+        )
+
+    @staticmethod
+    def apply_latest_quote(stock_info: StockInfo, hist: pd.DataFrame):
+        '''Refresh quote fields from the short-lived price history, since company info is cached for longer.'''
+        if len(hist) < 2:
+            return
+
+        last = hist.iloc[-1]
+        stock_info.current_price = rounded(last['Close'])
+        stock_info.open = rounded(last['Open'])
+        stock_info.day_low = rounded(last['Low'])
+        stock_info.day_high = rounded(last['High'])
+        stock_info.volume = whole(last['Volume'])
+        stock_info.previous_close = rounded(hist['Close'].iloc[-2])
         
     @staticmethod
-    def get_historical_data(hist: dict) -> dict:
-        '''Get historical price data for a stock with analysis metrics.'''
+    def period_start(hist: pd.DataFrame, period: str) -> pd.Timestamp:
+        '''First timestamp covered by a yfinance-style period ending at the last bar.'''
+        end = hist.index[-1]
+        if period == 'ytd':
+            return end.replace(month=1, day=1).normalize()
+        if period in PERIOD_OFFSETS:
+            return end.normalize() - PERIOD_OFFSETS[period]
+        return hist.index[0]
+
+    @staticmethod
+    def get_historical_data(hist: pd.DataFrame, period: str = '1mo', indicators: dict = None) -> Optional[HistoricalData]:
+        '''
+        Get historical price data for a stock with analysis metrics, or None without history.
+        Indicators are computed over all bars in hist, unless precomputed last values
+        are passed in; summary statistics only cover `period`.
+        '''
         try:
             if hist.empty:
-                return {'error': f"No historical data available"}
-            
-            # Calculate price changes
-            price_change = hist['Close'].iloc[-1] - hist['Close'].iloc[0]
-            percent_change = (price_change / hist['Close'].iloc[0]) * 100
-            
-            # Calculate moving averages
-            hist['SMA_20'] = hist['Close'].rolling(window=20).mean()
-            hist['SMA_50'] = hist['Close'].rolling(window=50).mean()
-            hist['SMA_200'] = hist['Close'].rolling(window=200).mean()
-            
-            # Calculate RSI
-            delta = hist['Close'].diff()
-            gain = delta.where(delta > 0, 0).rolling(window=14).mean()
-            loss = -delta.where(delta < 0, 0).rolling(window=14).mean()
-            rs = gain / loss
-            hist['RSI'] = 100 - (100 / (1 + rs))
-            
-            # Calculate Bollinger Bands
-            hist['BB_Middle'] = hist['Close'].rolling(window=20).mean()
-            hist['BB_Std'] = hist['Close'].rolling(window=20).std()
-            hist['BB_Upper'] = hist['BB_Middle'] + (hist['BB_Std'] * 2)
-            hist['BB_Lower'] = hist['BB_Middle'] - (hist['BB_Std'] * 2)
-            
-            # Calculate Average True Range (ATR)
-            high_low = hist['High'] - hist['Low']
-            high_close = abs(hist['High'] - hist['Close'].shift())
-            low_close = abs(hist['Low'] - hist['Close'].shift())
-            ranges = pd.concat([high_low, high_close, low_close], axis=1)
-            true_range = ranges.max(axis=1)
-            hist['ATR'] = true_range.rolling(14).mean()
-            
-            # Calculate MACD
-            hist['EMA_12'] = hist['Close'].ewm(span=12, adjust=False).mean()
-            hist['EMA_26'] = hist['Close'].ewm(span=26, adjust=False).mean()
-            hist['MACD'] = hist['EMA_12'] - hist['EMA_26']
-            hist['MACD_Signal'] = hist['MACD'].ewm(span=9, adjust=False).mean()
-            hist['MACD_Hist'] = hist['MACD'] - hist['MACD_Signal']
-            
-            # Get recent values for key indicators
-            current_price = hist['Close'].iloc[-1]
-            current_sma20 = hist['SMA_20'].iloc[-1] if not pd.isna(hist['SMA_20'].iloc[-1]) else None
-            current_sma50 = hist['SMA_50'].iloc[-1] if not pd.isna(hist['SMA_50'].iloc[-1]) else None
-            current_sma200 = hist['SMA_200'].iloc[-1] if not pd.isna(hist['SMA_200'].iloc[-1]) else None
-            current_rsi = hist['RSI'].iloc[-1] if not pd.isna(hist['RSI'].iloc[-1]) else None
-            current_macd = hist['MACD'].iloc[-1] if not pd.isna(hist['MACD'].iloc[-1]) else None
-            current_macd_signal = hist['MACD_Signal'].iloc[-1] if not pd.isna(hist['MACD_Signal'].iloc[-1]) else None
-            
-            # Calculate volatility
-            daily_returns = hist['Close'].pct_change()
-            volatility = daily_returns.std() * np.sqrt(252)  # Annualized volatility
-            
-            # Prepare monthly data
-            if len(hist) > 30:
-                monthly = hist.resample('M').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                })
-                monthly_data = [{
-                    'date': idx.strftime('%Y-%m'),
-                    'open': row['Open'],
-                    'high': row['High'],
-                    'low': row['Low'],
-                    'close': row['Close'],
-                    'volume': row['Volume']
-                } for idx, row in monthly.iterrows()]
-            else:
-                monthly_data = []
-            
-            # Prepare weekly data
-            if len(hist) > 7:
-                weekly = hist.resample('W').agg({
-                    'Open': 'first',
-                    'High': 'max',
-                    'Low': 'min',
-                    'Close': 'last',
-                    'Volume': 'sum'
-                })
-                weekly_data = [{
-                    'date': idx.strftime('%Y-%m-%d'),
-                    'open': row['Open'],
-                    'high': row['High'],
-                    'low': row['Low'],
-                    'close': row['Close'],
-                    'volume': row['Volume']
-                } for idx, row in weekly.iterrows()]
-            else:
-                weekly_data = []
-            
-            # Create return dictionary with analysis data
-            analysis_data = {
-                'start_date': hist.index[0].strftime('%Y-%m-%d'),
-                'end_date': hist.index[-1].strftime('%Y-%m-%d'),
-                'start_price': hist['Close'].iloc[0],
-                'end_price': hist['Close'].iloc[-1],
-                'price_change': price_change,
-                'percent_change': percent_change,
-                'max_price': hist['High'].max(),
-                'min_price': hist['Low'].min(),
-                'avg_volume': hist['Volume'].mean(),
-                'max_volume': hist['Volume'].max(),
-                'volatility': volatility,
-                'data_points': len(hist),
-                
-                # Technical indicators
-                'current_indicators': {
-                    'price': current_price,
-                    'sma20': current_sma20,
-                    'sma50': current_sma50,
-                    'sma200': current_sma200,
-                    'rsi': current_rsi,
-                    'macd': current_macd,
-                    'macd_signal': current_macd_signal,
-                    'upper_bollinger': hist['BB_Upper'].iloc[-1] if not pd.isna(hist['BB_Upper'].iloc[-1]) else None,
-                    'lower_bollinger': hist['BB_Lower'].iloc[-1] if not pd.isna(hist['BB_Lower'].iloc[-1]) else None,
-                    'atr': hist['ATR'].iloc[-1] if not pd.isna(hist['ATR'].iloc[-1]) else None,
-                },
-                
-                # Signal analysis
-                'technical_signals': {
-                    'price_above_sma20': bool(current_price > current_sma20) if current_sma20 is not None else None,
-                    'price_above_sma50': bool(current_price > current_sma50) if current_sma50 is not None else None,
-                    'price_above_sma200': bool(current_price > current_sma200) if current_sma200 is not None else None,
-                    'sma20_above_sma50': bool(current_sma20 > current_sma50) if (current_sma20 is not None and current_sma50 is not None) else None,
-                    'rsi_overbought': bool(current_rsi > 70) if current_rsi is not None else None,
-                    'rsi_oversold': bool(current_rsi < 30) if current_rsi is not None else None,
-                    'macd_bullish': bool(current_macd > current_macd_signal) if (current_macd is not None and current_macd_signal is not None) else None,
-                },
-                
-                # Historical data summaries
-                'monthly_data': monthly_data,
-                'weekly_data': weekly_data,
-                
-                # Last 5 days
-                'recent_days': [{
-                    'date': idx.strftime('%Y-%m-%d'),
-                    'open': row['Open'],
-                    'high': row['High'],
-                    'low': row['Low'],
-                    'close': row['Close'],
-                    'volume': row['Volume']
-                } for idx, row in hist.tail(5).iterrows()]
-            }
-            
-            return analysis_data
-            
+                return None
+
+            close = hist['Close'].to_numpy(dtype=np.float64)
+            # Technical indicators over all bars, last values only
+            if indicators is None:
+                with span('indicators'):
+                    indicators = compute_indicators(
+                        close,
+                        hist['High'].to_numpy(dtype=np.float64),
+                        hist['Low'].to_numpy(dtype=np.float64),
+                        names=SUMMARY_INDICATORS,
+                    )
+            current = Indicators(
+                price=rounded(close[-1]),
+                sma20=rounded(indicators['sma20']),
+                sma50=rounded(indicators['sma50']),
+                sma200=rounded(indicators['sma200']),
+                rsi=rounded(indicators['rsi']),
+                macd=rounded(indicators['macd']),
+                macd_signal=rounded(indicators['macd_signal']),
+                upper_bollinger=rounded(indicators['bb_upper']),
+                lower_bollinger=rounded(indicators['bb_lower']),
+                atr=rounded(indicators['atr']),
+            )
+
+            # Signals compare unrounded values
+            def above(a, b):
+                return None if np.isnan(a) or np.isnan(b) else bool(a > b)
+
+            price = close[-1]
+            signals = Signals(
+                price_above_sma20=above(price, indicators['sma20']),
+                price_above_sma50=above(price, indicators['sma50']),
+                price_above_sma200=above(price, indicators['sma200']),
+                sma20_above_sma50=above(indicators['sma20'], indicators['sma50']),
+                rsi_overbought=above(indicators['rsi'], 70),
+                rsi_oversold=above(30, indicators['rsi']),
+                macd_bullish=above(indicators['macd'], indicators['macd_signal']),
+            )
+
+            # Summaries below only cover the requested period
+            start = int(hist.index.searchsorted(YahooFinanceService.period_start(hist, period)))
+            dates = hist.index[start:]
+            period_close = close[start:]
+            high = hist['High'].to_numpy(dtype=np.float64)[start:]
+            low = hist['Low'].to_numpy(dtype=np.float64)[start:]
+            open_ = hist['Open'].to_numpy(dtype=np.float64)[start:]
+            volume = hist['Volume'].to_numpy(dtype=np.float64)[start:]
+            price_change = period_close[-1] - period_close[0]
+
+            recent = range(max(len(dates) - 5, 0), len(dates))
+            return HistoricalData(
+                start_date=dates[0].strftime('%Y-%m-%d'),
+                end_date=dates[-1].strftime('%Y-%m-%d'),
+                start_price=rounded(period_close[0]),
+                end_price=rounded(period_close[-1]),
+                price_change=rounded(price_change),
+                percent_change=rounded(price_change / period_close[0] * 100),
+                max_price=rounded(high.max()),
+                min_price=rounded(low.min()),
+                avg_volume=rounded(volume.mean()),
+                max_volume=whole(volume.max()),
+                volatility=rounded(annualized_volatility(period_close)),
+                data_points=len(dates),
+                current_indicators=current,
+                technical_signals=signals,
+                recent_days=[
+                    Bar(dates[i].strftime('%Y-%m-%d'), rounded(open_[i]), rounded(high[i]), rounded(low[i]), rounded(period_close[i]), whole(volume[i]))
+                    for i in recent
+                ],
+            )
         except Exception as e:
-            return {'error': f"Error retrieving historical data: {str(e)}"}
-        
-class JSONEncoder(json.JSONEncoder):
-    '''Custom JSON encoder for NumPy types.'''
-    def default(self, obj):
-        if isinstance(obj, (np.integer, np.int64, np.int32)):
-            return int(obj)
-        elif pd.isna(obj):
+            print(f"Error computing historical data: {e}")
             return None
-        return super().default(obj)
-    
-def format_float_values(data):
-    '''Recursively format all float values in a dictionary/list structure to 2 decimal places.'''
-    if isinstance(data, dict):
-        return {k: format_float_values(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [format_float_values(item) for item in data]
-    elif isinstance(data, float):
-        return round(data, 2)
-    else:
-        return data
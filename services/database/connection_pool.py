@@ -0,0 +1,204 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict
+import pymysql
+
+class PoolTimeout(Exception):
+    '''Raised when no connection becomes available within the checkout timeout'''
+    pass
+
+class ConnectionPool:
+    '''
+    Thread-safe pool of pymysql connections.
+    Connections are health checked on checkout when they have been idle for longer
+    than health_check_interval, and idle connections above min_size are closed
+    once they have been unused for idle_timeout seconds.
+    '''
+
+    def __init__(
+        self,
+        connect: Callable[[], pymysql.connections.Connection],
+        min_size: int = 1,
+        max_size: int = 10,
+        idle_timeout: float = 300,
+        health_check_interval: float = 30,
+        checkout_timeout: float = 10,
+    ):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = deque()  # (connection, last_used), most recently used on the right
+        self._size = 0
+        self._in_use = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+        self._created = 0
+        self._discarded = 0
+        self._timeouts = 0
+
+    def fill(self):
+        '''Open connections up to min_size'''
+        while True:
+            with self._condition:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                connection = self._open()
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                raise
+            with self._condition:
+                self._idle.append((connection, time.monotonic()))
+                self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        '''Check out a connection for the duration of the with block'''
+        connection = self._checkout()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._checkin(connection, broken)
+
+    def _open(self):
+        connection = self._connect()
+        with self._condition:
+            self._created += 1
+        return connection
+
+    def _checkout(self):
+        started = time.monotonic()
+        deadline = started + self.checkout_timeout
+        while True:
+            connection, last_used, create = None, None, False
+            with self._condition:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout('Connection pool is closed')
+                    if self._idle:
+                        connection, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(f'No database connection available after {self.checkout_timeout}s')
+                    self._condition.wait(remaining)
+                self._in_use += 1
+
+            if create:
+                try:
+                    connection = self._open()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif time.monotonic() - last_used > self.health_check_interval and not self._is_healthy(connection):
+                self._discard(connection)
+                continue
+
+            self._record_checkout(time.monotonic() - started)
+            return connection
+
+    def _is_healthy(self, connection) -> bool:
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _checkin(self, connection, broken: bool = False):
+        if broken or not connection.open:
+            self._discard(connection)
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._condition:
+            self._in_use -= 1
+            if self._closed:
+                self._size -= 1
+                expired.append(connection)
+            else:
+                self._idle.append((connection, now))
+                # Evict connections that have been idle too long, oldest first
+                while self._size > self.min_size and self._idle and now - self._idle[0][1] > self.idle_timeout:
+                    expired.append(self._idle.popleft()[0])
+                    self._size -= 1
+            self._condition.notify()
+
+        for stale in expired:
+            self._close_quietly(stale)
+
+    def _discard(self, connection):
+        self._release_slot()
+        with self._condition:
+            self._discarded += 1
+        self._close_quietly(connection)
+
+    def _release_slot(self):
+        with self._condition:
+            self._in_use -= 1
+            self._size -= 1
+            self._condition.notify()
+
+    def _record_checkout(self, waited: float):
+        with self._condition:
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict:
+        '''Pool size, utilisation and checkout wait-time statistics'''
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'peak_in_use': self._peak_in_use,
+                'max_size': self.max_size,
+                'utilisation': self._in_use / self.max_size if self.max_size else 0.0,
+                'checkouts': self._checkouts,
+                'avg_wait_ms': (self._total_wait / self._checkouts * 1000) if self._checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+                'timeouts': self._timeouts,
+                'created': self._created,
+                'discarded': self._discarded,
+            }
+
+    def close(self):
+        '''Close idle connections; checked out connections are closed when returned'''
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._condition.notify_all()
+        for connection in idle:
+            self._close_quietly(connection)
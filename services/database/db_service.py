@@ -1,178 +1,339 @@
 import os
+import threading
 import pymysql
 from datetime import datetime, timedelta
+from services.database.connection_pool import ConnectionPool
+from services.cache.ttl_cache import TTLCache
+from config.config import (
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_IDLE_TIMEOUT,
+    DB_POOL_HEALTH_CHECK_INTERVAL,
+    DB_POOL_TIMEOUT,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+)
+
+PROFILE_FIELDS = ('username', 'first_name', 'last_name', 'language')
+
+# Locks credit writes are spread over, by telegram_id
+CREDIT_LOCKS = 64
 
 class DatabaseService:
-    def __init__(self):
-        self.connection = None
-        self.connect()
-        
-    def connect(self):
-        '''Establish connection to the MySQL database'''
+    def __init__(self, prefill: bool = True, schema_ready: bool = True):
+        # Cleared while the schema is still being created; connections wait for mark_ready()
+        self.ready = threading.Event()
+        if schema_ready:
+            self.ready.set()
+        self.pool = ConnectionPool(
+            self.connect,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            idle_timeout=DB_POOL_IDLE_TIMEOUT,
+            health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+            checkout_timeout=DB_POOL_TIMEOUT,
+        )
+        # User rows keyed by telegram_id, kept in sync on every write
+        self.user_cache = TTLCache(max_size=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        # Bumped on every credit write, so a read that raced a write does not cache its row
+        self.cache_generation = 0
+        self.cache_lock = threading.Lock()
+        # Held from a credit UPDATE until its result is in the cache, so the cache sees
+        # a user's credit writes in the order MySQL applied them
+        self.credit_locks = [threading.Lock() for _ in range(CREDIT_LOCKS)]
+        if prefill:
+            self.prefill()
+
+    def prefill(self):
+        '''Open the pool's minimum connections now instead of on first use'''
         try:
-            self.connection = pymysql.connect(
-                host=os.getenv('DB_HOST', 'localhost'),
-                user=os.getenv('DB_USER', ''),
-                password=os.getenv('DB_PASSWORD', ''),
-                database=os.getenv('DB_NAME', 'momentum'),
-                charset='utf8mb4',
-                cursorclass=pymysql.cursors.DictCursor
-            )
-            print('Database connection established successfully')
+            self.pool.fill()
+            print('Database connection pool established successfully')
         except Exception as e:
             print(f'Error connecting to database: {e}')
+        
+    def connect(self):
+        '''Open a new connection to the MySQL database'''
+        return pymysql.connect(
+            host=os.getenv('DB_HOST', 'localhost'),
+            user=os.getenv('DB_USER', ''),
+            password=os.getenv('DB_PASSWORD', ''),
+            database=os.getenv('DB_NAME', 'momentum'),
+            charset='utf8mb4',
+            cursorclass=pymysql.cursors.DictCursor,
+            # Every statement is its own transaction, so reads always see the latest rows
+            autocommit=True
+        )
 
-    def ensure_connection(self):
-        '''Ensure database connection is alive, reconnect if needed'''
-        try:
-            if self.connection is None or not self.connection.open:
-                self.connect()
-            self.connection.ping(reconnect=True)
-        except Exception as e:
-            print(f'Connection lost, reconnecting: {e}')
-            self.connect()
+    def mark_ready(self):
+        '''Let connections through once the schema exists, or once creating it has given up'''
+        self.ready.set()
+
+    def connection(self):
+        '''Check out a pooled connection: `with db.connection() as connection: ...`'''
+        if not self.ready.is_set():
+            # Runs on dispatch threads, so handlers wait here instead of hitting missing tables
+            self.ready.wait()
+        return self.pool.connection()
+
+    def pool_stats(self):
+        '''Connection pool wait-time and utilisation statistics'''
+        return self.pool.stats()
+
+    def cache_stats(self):
+        '''User cache hit/miss statistics'''
+        return self.user_cache.stats()
     
     def get_user(self, telegram_id):
-        '''Get user by Telegram ID'''
-        self.ensure_connection()
-        self.connection.commit()
-        with self.connection.cursor() as cursor:
+        '''Get user by Telegram ID, from the cache when possible'''
+        user = self.user_cache.get(telegram_id)
+        if user is None:
+            user = self.fetch_user(telegram_id)
+        return user
+
+    def fetch_user(self, telegram_id):
+        '''Read user from the database and refresh the cache'''
+        generation = self.cache_generation
+        with self.connection() as connection, connection.cursor() as cursor:
             sql = 'SELECT * FROM users WHERE telegram_id = %s'
             cursor.execute(sql, (telegram_id,))
-            return cursor.fetchone()
+            user = cursor.fetchone()
+        if user:
+            with self.cache_lock:
+                if generation == self.cache_generation:
+                    self.user_cache.set(telegram_id, user)
+        return user
+
+    def credit_lock(self, telegram_id):
+        return self.credit_locks[hash(telegram_id) % CREDIT_LOCKS]
+
+    def write_through(self, telegram_id, **changes):
+        '''Apply a credit write to the cached row, if there is one'''
+        with self.cache_lock:
+            self.cache_generation += 1
+            user = self.user_cache.peek(telegram_id)
+            if user is not None:
+                self.user_cache.set(telegram_id, {**user, **changes})
     
     def create_user(self, telegram_id, username=None, first_name=None, last_name=None, language=None):
         '''Create a new user in the database'''
-        self.ensure_connection()
-        with self.connection.cursor() as cursor:
+        with self.connection() as connection, connection.cursor() as cursor:
             sql = '''
 INSERT INTO users (telegram_id, username, first_name, last_name, language) 
 VALUES (%s, %s, %s, %s, %s)
             '''
             cursor.execute(sql, (telegram_id, username, first_name, last_name, language))
-            self.connection.commit()
-            return self.get_user(telegram_id)
+        return self.fetch_user(telegram_id)
     
     def update_user(self, telegram_id, username=None, first_name=None, last_name=None, language=None):
         '''Update user information'''
-        self.ensure_connection()
-        with self.connection.cursor() as cursor:
-            # Build dynamic update query based on provided fields
-            updates = []
-            params = []
-            
-            if username is not None:
-                updates.append('username = %s')
-                params.append(username)
-            
-            if first_name is not None:
-                updates.append('first_name = %s')
-                params.append(first_name)
-                
-            if last_name is not None:
-                updates.append('last_name = %s')
-                params.append(last_name)
-
-            if language is not None:
-                updates.append('language = %s')
-                params.append(language)
+        # Build dynamic update query based on provided fields
+        updates = []
+        params = []
+        
+        if username is not None:
+            updates.append('username = %s')
+            params.append(username)
+        
+        if first_name is not None:
+            updates.append('first_name = %s')
+            params.append(first_name)
             
-            if not updates:
-                # Nothing to update
-                return self.get_user(telegram_id)
-                
-            update_clause = ', '.join(updates)
-            params.append(telegram_id)
+        if last_name is not None:
+            updates.append('last_name = %s')
+            params.append(last_name)
+
+        if language is not None:
+            updates.append('language = %s')
+            params.append(language)
+        
+        if not updates:
+            # Nothing to update
+            return self.get_user(telegram_id)
             
+        update_clause = ', '.join(updates)
+        params.append(telegram_id)
+        
+        with self.connection() as connection, connection.cursor() as cursor:
             sql = f'UPDATE users SET {update_clause} WHERE telegram_id = %s'
             cursor.execute(sql, params)
-            self.connection.commit()
-            return self.get_user(telegram_id)
+        return self.fetch_user(telegram_id)
     
     def get_or_create_user(self, telegram_id, username=None, first_name=None, last_name=None, language=None):
         '''Get user or create if not exists'''
         user = self.get_user(telegram_id)
         if user:
-            # Update user information if it's changed
+            # Update user information only if it's changed
+            profile = dict(zip(PROFILE_FIELDS, (username, first_name, last_name, language)))
+            if all(value is None or user.get(field) == value for field, value in profile.items()):
+                return user
             return self.update_user(telegram_id, username, first_name, last_name, language)
         else:
             return self.create_user(telegram_id, username, first_name, last_name, language)
     
-    def log_analysis(self, user_id, ticker_symbol, replicate_id):
+    def log_analysis(self, user_id, ticker_symbol, replicate_id, cache_hit=False):
         '''Log an analysis request'''
-        self.ensure_connection()
-        with self.connection.cursor() as cursor:
+        with self.connection() as connection, connection.cursor() as cursor:
             sql = '''
-INSERT INTO analysis_logs (user_id, ticker_symbol, replicate_id)
-VALUES (%s, %s, %s)
+INSERT INTO analysis_logs (user_id, ticker_symbol, replicate_id, cache_hit)
+VALUES (%s, %s, %s, %s)
             '''
-            cursor.execute(sql, (user_id, ticker_symbol, replicate_id))
-            self.connection.commit()
+            cursor.execute(sql, (user_id, ticker_symbol, replicate_id, cache_hit))
             return cursor.lastrowid
         
+    def get_top_tickers(self, since, limit):
+        '''Get the most analyzed tickers since the given time, most requested first'''
+        with self.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+SELECT ticker_symbol, COUNT(*) AS requests FROM analysis_logs
+WHERE created_at >= %s
+GROUP BY ticker_symbol
+ORDER BY requests DESC
+LIMIT %s
+            '''
+            cursor.execute(sql, (since, limit))
+            return [row['ticker_symbol'] for row in cursor.fetchall()]
+
+    def get_watchlist(self, user_id):
+        '''Get the tickers on a user's watchlist, oldest first'''
+        with self.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+SELECT ticker_symbol FROM watchlists
+WHERE user_id = %s
+ORDER BY id
+            '''
+            cursor.execute(sql, (user_id,))
+            return [row['ticker_symbol'] for row in cursor.fetchall()]
+
+    def add_to_watchlist(self, user_id, ticker_symbols):
+        '''Add tickers to a user's watchlist, ignoring ones already on it. Returns the number added'''
+        if not ticker_symbols:
+            return 0
+        with self.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+INSERT IGNORE INTO watchlists (user_id, ticker_symbol)
+VALUES (%s, %s)
+            '''
+            return cursor.executemany(sql, [(user_id, ticker_symbol) for ticker_symbol in ticker_symbols])
+
+    def remove_from_watchlist(self, user_id, ticker_symbols):
+        '''Remove tickers from a user's watchlist. Returns the number removed'''
+        if not ticker_symbols:
+            return 0
+        with self.connection() as connection, connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(ticker_symbols))
+            sql = f'''
+DELETE FROM watchlists
+WHERE user_id = %s AND ticker_symbol IN ({placeholders})
+            '''
+            return cursor.execute(sql, (user_id, *ticker_symbols))
+        
+    def take_prewarm_budget(self, day, limit):
+        '''Count one prewarm prediction against day's budget, shared by all workers. False once limit is reached'''
+        if limit <= 0:
+            return False
+        with self.connection() as connection, connection.cursor() as cursor:
+            # Inserts report 1 row, increments 2 and a full budget 0
+            sql = '''
+INSERT INTO prewarm_budget (day, predictions) VALUES (%s, 1)
+ON DUPLICATE KEY UPDATE predictions = IF(predictions < %s, predictions + 1, predictions)
+            '''
+            return cursor.execute(sql, (day, limit)) > 0
+
+    def return_prewarm_budget(self, day):
+        '''Give back a prediction taken with take_prewarm_budget that was not used'''
+        with self.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+UPDATE prewarm_budget SET predictions = predictions - 1
+WHERE day = %s AND predictions > 0
+            '''
+            cursor.execute(sql, (day,))
+        
     def get_user_credits(self, telegram_id):
         '''Get user's current credits and check if they need renewal'''
         user = self.get_user(telegram_id)
         if not user:
             return 0
         
-        self.check_and_renew_credits(user)
-        
-        updated_user = self.get_user(telegram_id)
-        return updated_user['credits']
+        user = self.check_and_renew_credits(user)
+        return user['credits']
     
     def check_and_renew_credits(self, user):
-        '''Check if credits need to be renewed and update them'''
-        self.ensure_connection()
-        
+        '''Renew credits if the last reset was more than 24 hours ago. Returns the up-to-date user'''
         last_reset = user['last_reset']
         current_time = datetime.now()
+        renew_before = current_time - timedelta(days=1)
         
-        # If last reset was more than 24 hours ago, renew credits
-        if (current_time - last_reset).days >= 1:
-            with self.connection.cursor() as cursor:
-                if user['credits'] < 3:
-                    sql = '''
-UPDATE users 
-SET credits = 3, last_reset = %s 
-WHERE id = %s
-                    '''
-                    cursor.execute(sql, (current_time, user['id']))
-                else:
-                    sql = '''
+        if last_reset > renew_before:
+            return user
+
+        with self.credit_lock(user['telegram_id']):
+            with self.connection() as connection, connection.cursor() as cursor:
+                sql = '''
 UPDATE users 
-SET last_reset = %s 
-WHERE id = %s
-                    '''
-                    cursor.execute(sql, (current_time, user['id']))
-                
-                self.connection.commit()
+SET credits = LAST_INSERT_ID(GREATEST(credits, 3)), last_reset = %s 
+WHERE id = %s AND last_reset <= %s
+                '''
+                cursor.execute(sql, (current_time, user['id'], renew_before))
+                renewed = cursor.rowcount == 1
+                credits = cursor.lastrowid
+
+            if renewed:
+                self.write_through(user['telegram_id'], credits=credits, last_reset=current_time)
+
+        if not renewed:
+            # Renewed elsewhere in the meantime, so the cached row is stale
+            return self.fetch_user(user['telegram_id'])
+        return {**user, 'credits': credits, 'last_reset': current_time}
     
     def use_credit(self, telegram_id):
-        '''Use one credit for analysis. Returns (success, credits_left)'''
-        user = self.get_user(telegram_id)
-        if not user:
-            return False, 0
-            
-        self.check_and_renew_credits(user)
-        user = self.get_user(telegram_id)
-        
-        if user['credits'] <= 0:
-            return False, 0
-            
-        # Use one credit
-        self.ensure_connection()
-        with self.connection.cursor() as cursor:
-            sql = '''
+        '''
+        Use one credit for analysis. Returns (success, credits_left)
+        Renewal and decrement happen in one conditional UPDATE, so concurrent
+        requests cannot overdraw. The new balance is returned through
+        LAST_INSERT_ID() in the OK packet, saving a follow-up SELECT.
+        '''
+        current_time = datetime.now()
+        renew_before = current_time - timedelta(days=1)
+
+        with self.credit_lock(telegram_id):
+            with self.connection() as connection, connection.cursor() as cursor:
+                # Assignments run left to right, so credits must be set before last_reset
+                sql = '''
 UPDATE users
-SET credits = credits - 1
+SET credits = LAST_INSERT_ID(IF(last_reset <= %s, GREATEST(credits, 3), credits) - 1),
+    last_reset = IF(last_reset <= %s, %s, last_reset)
 WHERE telegram_id = %s
-            '''
-            cursor.execute(sql, (telegram_id,))
-            self.connection.commit()
-            
-        updated_user = self.get_user(telegram_id)
-        return True, updated_user['credits']
+AND (credits > 0 OR last_reset <= %s)
+                '''
+                cursor.execute(sql, (renew_before, renew_before, current_time, telegram_id, renew_before))
+                # No row matches for an unknown user, or one without credits that is not due for renewal
+                success = cursor.rowcount == 1
+                credits_left = cursor.lastrowid if success else 0
+
+            # Write the new balance through to the cached row; a failure means it is 0
+            changes = {'credits': credits_left}
+            user = self.user_cache.peek(telegram_id)
+            if success and user is not None and user['last_reset'] <= renew_before:
+                changes['last_reset'] = current_time
+            self.write_through(telegram_id, **changes)
+
+        return success, credits_left
+    
+    def refund_credit(self, telegram_id):
+        '''Give back a credit taken by use_credit, e.g. when the analysis timed out'''
+        with self.credit_lock(telegram_id):
+            with self.connection() as connection, connection.cursor() as cursor:
+                sql = '''
+UPDATE users SET credits = LAST_INSERT_ID(credits + 1)
+WHERE telegram_id = %s
+                '''
+                refunded = cursor.execute(sql, (telegram_id,)) == 1
+                credits = cursor.lastrowid
+
+            if refunded:
+                self.write_through(telegram_id, credits=credits)
+        return refunded
     
     def get_credits_info(self, telegram_id):
         '''Get detailed information about user's credits'''
@@ -184,8 +345,7 @@ WHERE telegram_id = %s
                 'next_reset': datetime.now() + timedelta(days=1)
             }
             
-        self.check_and_renew_credits(user)
-        user = self.get_user(telegram_id)
+        user = self.check_and_renew_credits(user)
         next_reset = user['last_reset'] + timedelta(days=1)
         
         return {
@@ -195,6 +355,5 @@ WHERE telegram_id = %s
         }
             
     def close(self):
-        '''Close the database connection'''
-        if self.connection and self.connection.open:
-            self.connection.close()
\ No newline at end of file
+        '''Close all pooled database connections'''
+        self.pool.close()
\ No newline at end of file
@@ -0,0 +1,3 @@
+from services.dispatch.dispatch_service import DispatchService
+
+__all__ = ['DispatchService']
@@ -0,0 +1,33 @@
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from services.metrics.metrics import span
+from config.config import MARKET_DATA_WORKERS, DB_WORKERS
+
+class DispatchService:
+    '''Run blocking service calls on bounded thread pools so the bot event loop stays responsive'''
+
+    def __init__(self, market_data_workers: int = MARKET_DATA_WORKERS, db_workers: int = DB_WORKERS):
+        self.market_data_pool = ThreadPoolExecutor(max_workers=market_data_workers, thread_name_prefix='market-data')
+        self.db_pool = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix='db')
+
+    async def run_market_data(self, func, *args, **kwargs):
+        '''Run a Yahoo Finance / NewsAPI call on the market data pool'''
+        return await self._run(self.market_data_pool, func, *args, **kwargs)
+
+    async def run_db(self, func, *args, **kwargs):
+        '''Run a database call on the DB pool, timed as a db.<function> stage including the wait for a thread'''
+        with span(f'db.{getattr(func, "__name__", "call")}'):
+            return await self._run(self.db_pool, func, *args, **kwargs)
+
+    async def _run(self, pool: ThreadPoolExecutor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Carry the caller's context over, so spans recorded in the thread join its trace
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(pool, functools.partial(context.run, func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        '''Stop all pools, optionally waiting for queued work to finish'''
+        for pool in (self.market_data_pool, self.db_pool):
+            pool.shutdown(wait=wait, cancel_futures=not wait)
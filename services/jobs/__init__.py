@@ -0,0 +1,3 @@
+from services.jobs.job_queue import JobQueue, JobRejected, JobTimeout
+
+__all__ = ['JobQueue', 'JobRejected', 'JobTimeout']
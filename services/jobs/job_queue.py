@@ -0,0 +1,176 @@
+import time
+import asyncio
+import contextvars
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+from services.metrics.metrics import record
+from config.config import LLM_MAX_CONCURRENT_JOBS, LLM_JOB_TIMEOUT, JOB_POSITION_UPDATE_INTERVAL
+
+class JobRejected(Exception):
+    '''The user already has a job queued or running'''
+
+class JobTimeout(Exception):
+    '''The job did not finish within the queue timeout, including time spent waiting'''
+
+class JobFailed(Exception):
+    '''The job's work was cancelled from elsewhere, e.g. a shared load it was waiting on'''
+
+class _Job:
+    __slots__ = ('user_id', 'run', 'on_position', 'future', 'task', 'enqueued_at', 'position', 'notified_at', 'reporter', 'context', 'abandoned')
+
+    def __init__(self, user_id: Hashable, run, on_position):
+        self.user_id = user_id
+        self.run = run
+        self.on_position = on_position
+        self.future = asyncio.get_running_loop().create_future()
+        self.task = None
+        self.enqueued_at = time.monotonic()
+        self.position = None
+        self.notified_at = float('-inf')
+        # Task sending the latest position update, if one is in flight
+        self.reporter = None
+        # The submitter's context, so the job runs inside its request trace
+        self.context = contextvars.copy_context()
+        # Set once the submitter stops waiting, so the job's cancellation is expected
+        self.abandoned = False
+
+class JobQueue:
+    '''
+    FIFO queue for LLM jobs with a global concurrency cap and at most one job in flight per user.
+    Waiting jobs are told their position as the queue moves. A job that has not finished
+    within `timeout` seconds of submission is cancelled and JobTimeout is raised to its caller.
+    '''
+
+    def __init__(
+        self,
+        max_concurrent: int = LLM_MAX_CONCURRENT_JOBS,
+        timeout: float = LLM_JOB_TIMEOUT,
+        position_update_interval: float = JOB_POSITION_UPDATE_INTERVAL,
+    ):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.position_update_interval = position_update_interval
+        self.waiting = deque()
+        self.running = 0
+        self.users = set()
+        # Recent queue wait times in seconds, for percentiles
+        self.wait_times = deque(maxlen=1000)
+        self.metrics = {'submitted': 0, 'completed': 0, 'failed': 0, 'timeouts': 0, 'rejected': 0, 'peak_depth': 0}
+
+    def has_job(self, user_id: Hashable) -> bool:
+        return user_id in self.users
+
+    async def submit(
+        self,
+        user_id: Hashable,
+        run: Callable[[], Awaitable[Any]],
+        on_position: Optional[Callable[[int], Awaitable[None]]] = None,
+    ) -> Any:
+        '''
+        Queue run() and return its result. on_position(n) is called with the job's place in
+        the queue while it waits, and with 0 when it starts.
+        Raises JobRejected if the user already has a job, JobTimeout if it takes too long and
+        JobFailed if run() was cancelled without the submitter giving up on it.
+        '''
+        if user_id in self.users:
+            self.metrics['rejected'] += 1
+            raise JobRejected(user_id)
+
+        job = _Job(user_id, run, on_position)
+        self.users.add(user_id)
+        self.waiting.append(job)
+        self.metrics['submitted'] += 1
+        self.metrics['peak_depth'] = max(self.metrics['peak_depth'], len(self.waiting))
+        try:
+            self.dispatch()
+            self.notify_positions()
+            return await asyncio.wait_for(asyncio.shield(job.future), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics['timeouts'] += 1
+            raise JobTimeout(user_id)
+        finally:
+            self.users.discard(user_id)
+            job.abandoned = True
+            if job.task is not None:
+                job.task.cancel()
+            elif job in self.waiting:
+                self.waiting.remove(job)
+                if job.reporter is not None:
+                    job.reporter.cancel()
+                self.notify_positions()
+
+    def dispatch(self):
+        '''Start waiting jobs while there is capacity'''
+        while self.running < self.max_concurrent and self.waiting:
+            job = self.waiting.popleft()
+            self.running += 1
+            wait = time.monotonic() - job.enqueued_at
+            self.wait_times.append(wait)
+            job.context.run(record, 'llm.queue', wait)
+            job.task = asyncio.create_task(self.execute(job), context=job.context)
+
+    async def execute(self, job: _Job):
+        try:
+            if job.reporter is not None:
+                # Let a position edit already on its way land first, so it cannot overwrite what run() shows
+                await asyncio.wait([job.reporter])
+            if job.on_position is not None and job.position:
+                job.position = 0
+                await self.report(job, 0)
+            result = await job.run()
+            self.metrics['completed'] += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        except asyncio.CancelledError:
+            if job.abandoned:
+                job.future.cancel()
+                raise
+            # Cancelled from inside run(), e.g. a coalesced load whose leader timed out;
+            # the submitter is still waiting and gets an error it can handle
+            self.metrics['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(JobFailed(job.user_id))
+        except Exception as e:
+            self.metrics['failed'] += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        finally:
+            self.running -= 1
+            self.dispatch()
+            self.notify_positions()
+
+    def notify_positions(self):
+        '''Tell waiting jobs their new position, at most once per interval each'''
+        now = time.monotonic()
+        for position, job in enumerate(self.waiting, start=1):
+            if job.on_position is None or job.position == position:
+                continue
+            # Still sending the previous position; the queue's next move sends this one
+            if job.reporter is not None and not job.reporter.done():
+                continue
+            if job.position is not None and now - job.notified_at < self.position_update_interval:
+                continue
+            job.position = position
+            job.notified_at = now
+            job.reporter = asyncio.create_task(self.report(job, position))
+
+    async def report(self, job: _Job, position: int):
+        try:
+            await job.on_position(position)
+        except Exception as e:
+            print(f"Error sending queue position: {e}")
+
+    def stats(self) -> Dict:
+        waits = sorted(self.wait_times)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))] * 1000, 1) if waits else 0.0
+
+        return {
+            **self.metrics,
+            'depth': len(self.waiting),
+            'running': self.running,
+            'wait_p50_ms': percentile(0.5),
+            'wait_p95_ms': percentile(0.95),
+            'wait_max_ms': round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
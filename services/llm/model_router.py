@@ -0,0 +1,246 @@
+import time
+import asyncio
+from collections import deque
+from typing import Dict, List, Optional
+from services.llm.replicate_client import AsyncReplicateClient, StreamError
+from services.metrics.metrics import span, record, annotate
+from config.config import (
+    LLM_MODELS,
+    LLM_DEADLINE,
+    LLM_HEDGE_AFTER,
+    LLM_UNHEALTHY_AFTER,
+    LLM_UNHEALTHY_COOLDOWN,
+)
+
+class ModelStats:
+    '''Recent latency and health of one model'''
+
+    def __init__(self, window: int = 200):
+        # Seconds from creation to the last token, and to the first token
+        self.latencies = deque(maxlen=window)
+        self.first_token = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self.counts = {'succeeded': 0, 'failed': 0, 'canceled': 0}
+
+    def record_success(self, latency: float, first_token: float):
+        self.latencies.append(latency)
+        self.first_token.append(first_token)
+        self.consecutive_failures = 0
+        self.counts['succeeded'] += 1
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.counts['failed'] += 1
+        if self.consecutive_failures >= LLM_UNHEALTHY_AFTER:
+            self.unhealthy_until = time.monotonic() + LLM_UNHEALTHY_COOLDOWN
+
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.unhealthy_until
+
+    def percentile(self, samples, p: float) -> Optional[float]:
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    def summary(self) -> Dict:
+        def ms(value):
+            return None if value is None else round(value * 1000)
+
+        return {
+            **self.counts,
+            'healthy': self.healthy(),
+            'p50_ms': ms(self.percentile(self.latencies, 0.5)),
+            'p95_ms': ms(self.percentile(self.latencies, 0.95)),
+            'first_token_p50_ms': ms(self.percentile(self.first_token, 0.5)),
+            'first_token_p95_ms': ms(self.percentile(self.first_token, 0.95)),
+        }
+
+class _Attempt:
+    __slots__ = ('model', 'task', 'prediction_id', 'started_at', 'first_token_at', 'expired')
+
+    def __init__(self, model: str):
+        self.model = model
+        self.task = None
+        self.prediction_id = None
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        # Set when the call's deadline passes while this attempt is still running
+        self.expired = False
+
+class ModelRouter:
+    '''
+    Run predictions on the fastest healthy model, with a deadline per call.
+    If the chosen model has not produced a token within LLM_HEDGE_AFTER seconds, the next
+    model is started as a hedge. With a streaming caller the first model to produce a token
+    is kept; otherwise the first to finish wins. The other prediction is canceled.
+    A model that fails is retried on the next one while time remains.
+    '''
+
+    def __init__(
+        self,
+        client: AsyncReplicateClient,
+        models: List[str] = LLM_MODELS,
+        deadline: float = LLM_DEADLINE,
+        hedge_after: float = LLM_HEDGE_AFTER,
+    ):
+        self.client = client
+        self.models = list(models)
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.model_stats = {model: ModelStats() for model in self.models}
+        self.metrics = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'retries': 0, 'deadline_exceeded': 0}
+
+    def order(self) -> List[str]:
+        '''Healthy models by median latency, unmeasured ones in configured order; unhealthy last'''
+        def key(model):
+            stats = self.model_stats[model]
+            p50 = stats.percentile(stats.latencies, 0.5)
+            return (not stats.healthy(), p50 is None, p50 or 0.0, self.models.index(model))
+        return sorted(self.models, key=key)
+
+    async def run(self, input: Dict, on_token=None, deadline: Optional[float] = None) -> Dict:
+        '''
+        Return a prediction dict with status, output (list of tokens), id and model.
+        On failure or deadline the status is 'failed' with an error message.
+        '''
+        self.metrics['calls'] += 1
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        candidates = deque(self.order())
+        attempts: List[_Attempt] = []
+        committed: List[_Attempt] = []
+        failure = {'status': 'failed', 'error': 'No model available', 'output': []}
+
+        async def on_first_token(attempt: _Attempt):
+            # A streaming caller sticks with the first model that starts talking
+            if on_token is not None and not committed:
+                committed.append(attempt)
+                self.cancel(attempts, keep=attempt)
+
+        async def forward(attempt: _Attempt, token: str):
+            if on_token is not None and committed and committed[0] is attempt:
+                await on_token(token)
+
+        def launch():
+            attempt = _Attempt(candidates.popleft())
+            attempt.task = asyncio.create_task(self.attempt(attempt, input, on_first_token, forward))
+            attempts.append(attempt)
+            return attempt
+
+        primary = launch()
+        hedge = None
+        try:
+            while True:
+                pending = [attempt for attempt in attempts if not attempt.task.done()]
+                now = time.monotonic()
+                if now >= deadline_at:
+                    self.metrics['deadline_exceeded'] += 1
+                    for attempt in pending:
+                        attempt.expired = True
+                    return {**failure, 'error': f'Deadline of {deadline or self.deadline:g}s exceeded'}
+
+                if not pending:
+                    # Everything so far failed; retry on the next model
+                    if not candidates or committed:
+                        return failure
+                    self.metrics['retries'] += 1
+                    launch()
+                    continue
+
+                timeout = deadline_at - now
+                can_hedge = hedge is None and candidates and primary.first_token_at is None and not committed
+                if can_hedge:
+                    timeout = min(timeout, max(primary.started_at + self.hedge_after - now, 0))
+
+                done, _ = await asyncio.wait([attempt.task for attempt in pending], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                for attempt in attempts:
+                    if attempt.task not in done or attempt.task.cancelled():
+                        continue
+                    prediction = attempt.task.result()
+                    if prediction['status'] == 'succeeded':
+                        if attempt is hedge:
+                            self.metrics['hedge_wins'] += 1
+                        # Includes Replicate's own queue and model start-up before the first token
+                        record('llm.first_token', (attempt.first_token_at or time.monotonic()) - attempt.started_at)
+                        annotate(model=attempt.model, prediction_id=prediction.get('id'))
+                        return prediction
+                    failure = prediction
+                    if committed and committed[0] is attempt:
+                        # Tokens already reached the user, so another model cannot take over
+                        return failure
+
+                still_silent = primary.first_token_at is None and not committed
+                if not done and can_hedge and still_silent and time.monotonic() >= primary.started_at + self.hedge_after:
+                    self.metrics['hedges'] += 1
+                    hedge = launch()
+        finally:
+            self.cancel(attempts)
+
+    async def attempt(self, attempt: _Attempt, input: Dict, on_first_token, forward) -> Dict:
+        stats = self.model_stats[attempt.model]
+        output: List[str] = []
+        try:
+            with span('llm.create'):
+                prediction = await self.client.create_prediction(attempt.model, input, stream=True)
+            attempt.prediction_id = prediction.get('id')
+            if not prediction.get('urls', {}).get('stream'):
+                prediction = await self.client.wait(prediction)
+                attempt.first_token_at = time.monotonic()
+                output = prediction.get('output') or []
+                if isinstance(output, str):
+                    output = [output]
+                if prediction['status'] == 'succeeded':
+                    await on_first_token(attempt)
+                    for token in output:
+                        await forward(attempt, token)
+            else:
+                async for token in self.client.stream(prediction):
+                    if attempt.first_token_at is None:
+                        attempt.first_token_at = time.monotonic()
+                        await on_first_token(attempt)
+                    output.append(token)
+                    await forward(attempt, token)
+                prediction = {**prediction, 'status': 'succeeded'}
+        except asyncio.CancelledError:
+            # A model that hangs until the deadline counts against its health;
+            # losing a hedge or the caller giving up does not
+            if attempt.expired:
+                stats.record_failure()
+            else:
+                stats.counts['canceled'] += 1
+            raise
+        except StreamError as e:
+            prediction = {'id': attempt.prediction_id, 'status': e.status, 'error': e.detail}
+        except Exception as e:
+            prediction = {'id': attempt.prediction_id, 'status': 'failed', 'error': str(e)}
+
+        if prediction['status'] == 'succeeded':
+            now = time.monotonic()
+            stats.record_success(now - attempt.started_at, (attempt.first_token_at or now) - attempt.started_at)
+        else:
+            stats.record_failure()
+        return {**prediction, 'output': output, 'model': attempt.model}
+
+    def cancel(self, attempts: List[_Attempt], keep: Optional[_Attempt] = None):
+        '''Stop every unfinished attempt except `keep`, on Replicate as well as locally'''
+        for attempt in attempts:
+            if attempt is keep or attempt.task.done():
+                continue
+            attempt.task.cancel()
+            if attempt.prediction_id:
+                asyncio.create_task(self.cancel_prediction(attempt.prediction_id))
+
+    async def cancel_prediction(self, prediction_id: str):
+        try:
+            await self.client.cancel_prediction(prediction_id)
+        except Exception as e:
+            print(f"Error canceling prediction {prediction_id}: {e}")
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            'order': self.order(),
+            'models': {model: stats.summary() for model, stats in self.model_stats.items()},
+        }
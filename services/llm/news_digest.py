@@ -0,0 +1,66 @@
+import json
+import hashlib
+from typing import Callable, Dict, List, Optional, Tuple
+from services.cache.ttl_cache import TTLCache
+from services.data.news_service import NewsService
+from services.llm.replicate_service import ReplicateService
+from services.dispatch.dispatch_service import DispatchService
+from services.metrics.metrics import span
+from config.config import NEWS_DIGEST_TTL, NEWS_DIGEST_ARTICLES
+
+# Article fields that identify a digest; content snippets can change without the story changing
+DIGEST_FIELDS = ('url', 'title', 'published_at')
+
+class DigestUnavailable(Exception):
+    pass
+
+class NewsDigest:
+    '''Shared /news summary, keyed by the set of articles it summarizes'''
+
+    def __init__(self, news_service: NewsService, replicate_service: ReplicateService, dispatch: DispatchService):
+        self.news_service = news_service
+        self.replicate_service = replicate_service
+        self.dispatch = dispatch
+        self.cache = TTLCache(max_size=8, ttl=NEWS_DIGEST_TTL)
+
+    async def get_digest(self, on_build: Optional[Callable[[], None]] = None) -> Tuple[str, str, bool]:
+        '''
+        Return (summary, prediction_id, cache_hit). Headlines come from the NewsAPI
+        cache; a new prediction runs only when the article set changes, and
+        concurrent callers for the same set share it. Failures are not cached.
+        on_build() is called just before a new prediction starts.
+        '''
+        with span('newsapi.fetch'):
+            news_articles = await self.dispatch.run_market_data(self.news_service.get_highlighted_news, limit=NEWS_DIGEST_ARTICLES)
+        if not news_articles:
+            return "無法獲取最新環球新聞，請稍後再試。", 'error_id', False
+
+        built = False
+
+        async def build():
+            nonlocal built
+            built = True
+            if on_build is not None:
+                on_build()
+            return await self.build(news_articles)
+
+        try:
+            summary, prediction_id = await self.cache.get_or_load_async(self.digest_key(news_articles), build)
+            return summary, prediction_id, not built
+        except DigestUnavailable as e:
+            return str(e), 'error_id', False
+
+    async def refresh(self, on_build: Optional[Callable[[], None]] = None) -> Tuple[str, str, bool]:
+        '''Re-check headlines and build a digest if they changed, ahead of the next user request'''
+        self.news_service.invalidate_highlighted_news()
+        return await self.get_digest(on_build)
+
+    def digest_key(self, news_articles: List[Dict]) -> str:
+        articles = sorted([article.get(field) for field in DIGEST_FIELDS] for article in news_articles)
+        return hashlib.sha256(json.dumps(articles, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    async def build(self, news_articles: List[Dict]) -> Tuple[str, str]:
+        summary, prediction_id = await self.replicate_service.summarize_news(news_articles)
+        if prediction_id == 'error_id':
+            raise DigestUnavailable(summary)
+        return summary, prediction_id
@@ -0,0 +1,89 @@
+from typing import List
+from services.data.models import StockData, Indicators, Signals
+from services.llm.prompts.prompt_base import BasePrompt
+from services.llm.prompts.prompt_compiler import (
+    compact_number,
+    compact_large,
+    money,
+    percent,
+    pick,
+    join_present,
+    field_lines,
+)
+
+class BatchAnalysisPrompt(BasePrompt):
+    '''Prompt generator for a comparative analysis of several stocks'''
+
+    # Identical for every batch and placed first, so providers can reuse the cached prefix
+    INSTRUCTIONS = '''你是一位金融分析師，正在為一個投資組合中的股票提供比較分析。請根據文末提供的股票資料，按照以下結構提供簡潔的比較分析：
+
+<b>組合概覽</b>
+[用2-3句話總結這組股票的整體表現、行業分佈和集中風險。]
+
+<b>個股摘要</b>
+[每隻股票一行，按吸引力由高至低排列]
+[股票代號] | [當前價格] | [🔺/🔻] [一個月百分比變動 %] | [買入/賣出/持有] [🟢/🔴/🟡]
+[一句話說明主要理由]
+
+<b>比較洞察</b>
+[第1段]：[比較估值、動能和技術指標，指出相對強弱。]
+[第2段]：[指出股票之間的相關性、共同風險或互相對沖的地方，並引用新聞。]
+
+<b>組合風險級別：[低/中/高] [⚪/🟠/🔴]</b>
+[用2-3句話評估整體風險並提出調整建議。]
+
+請保持回應簡潔，只使用 <b> 標籤，專注於股票之間的差異。資料中沒有列出的數據點即為缺失，請確認分析的局限性。
+
+---
+'''
+
+    def build_prompt(stocks_data: List[StockData]) -> str:
+        rows = [BatchAnalysisPrompt.format_stock(stock_data) for stock_data in stocks_data]
+        tickers = '、'.join(stock_data.ticker for stock_data in stocks_data)
+        stocks_section = '\n\n'.join(rows)
+
+        return f'''{BatchAnalysisPrompt.INSTRUCTIONS}
+股票資料（{len(stocks_data)} 隻：{tickers}）：
+{stocks_section}
+
+請按上述結構比較以上股票。'''
+
+    def format_stock(stock_data: StockData) -> str:
+        '''One stock's block, leaving out fields without a value'''
+        stock_info = stock_data.stock_info
+        history = stock_data.historical_data
+        indicators = history.current_indicators if history else Indicators()
+        signals = history.technical_signals if history else Signals()
+        recommendation = stock_info.recommendation
+
+        def labelled(label, value):
+            return None if value is None else f'{label} {value}'
+
+        sma50 = pick(signals.price_above_sma50, '高於', '低於')
+        sma200 = pick(signals.price_above_sma200, '高於', '低於')
+        fields = field_lines([
+            ('價格', join_present([
+                money(stock_info.current_price),
+                labelled('一個月變動', percent(history.percent_change) if history else None),
+                labelled('波動率', compact_number(history.volatility) if history else None),
+            ])),
+            ('估值', join_present([
+                labelled('市值', compact_large(stock_info.market_cap, '$')),
+                labelled('市盈率', compact_number(stock_info.pe_ratio, 1)),
+                labelled('預期市盈率', compact_number(stock_info.forward_pe, 1)),
+                labelled('股息收益率', percent(stock_info.dividend_yield)),
+            ])),
+            ('分析師', join_present([
+                recommendation.capitalize() if recommendation else None,
+                labelled('目標均價', money(stock_info.target_mean_price)),
+            ])),
+            ('技術', join_present([
+                labelled('RSI', compact_number(indicators.rsi, 1)),
+                labelled('MACD', pick(signals.macd_bullish, '看漲', '看跌')),
+                f'價格{sma50} 50 日均線' if sma50 else None,
+                f'{sma200} 200 日均線' if sma200 else None,
+            ])),
+            ('新聞', join_present((item.title for item in stock_data.news[:2]), '；')),
+        ])
+        header = join_present([stock_info.name, stock_info.sector])
+        return f"{stock_data.ticker}{f' ({header})' if header else ''}\n{fields}"
@@ -0,0 +1,84 @@
+import re
+import math
+from typing import Iterable, Optional, Tuple
+
+# Values yfinance and the data services use for "no data"
+MISSING = (None, '', 'N/A', 'n/a', 'none', 'Unknown')
+
+# CJK, full-width punctuation and emoji mostly take one token or more each
+WIDE_CHARS = re.compile(r'[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef\U0001f000-\U0001faff]')
+
+def is_missing(value) -> bool:
+    if isinstance(value, float):
+        return math.isnan(value)
+    return value in MISSING
+
+def compact_number(value, decimals: int = 2) -> Optional[str]:
+    '''Round to at most `decimals` places and drop trailing zeros, e.g. 12.50 -> "12.5"'''
+    if is_missing(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    text = f'{number:.{decimals}f}'
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+    return '0' if text == '-0' else text
+
+def compact_large(value, prefix: str = '') -> Optional[str]:
+    '''Three significant digits with a T/B/M/K suffix, e.g. 2_345_678_901 -> "2.35B"'''
+    if is_missing(value):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return str(value)
+    for size, suffix in ((1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K')):
+        if abs(number) >= size:
+            scaled = number / size
+            return f'{prefix}{compact_number(scaled, max(0, 2 - int(math.log10(abs(scaled)))))}{suffix}'
+    return f'{prefix}{compact_number(number)}'
+
+def money(value) -> Optional[str]:
+    '''Price with cents below $1000, whole dollars above'''
+    if is_missing(value):
+        return None
+    try:
+        text = compact_number(value, 2 if abs(float(value)) < 1000 else 0)
+    except (TypeError, ValueError):
+        text = str(value)
+    return None if text is None else f'${text}'
+
+def percent(value, decimals: int = 2) -> Optional[str]:
+    '''Format a value already in percent, e.g. 1.234 -> "1.23%"'''
+    text = compact_number(value, decimals)
+    return None if text is None else f'{text}%'
+
+def ratio_percent(value) -> Optional[str]:
+    '''Format a ratio such as 0.2345 as "23.5%"'''
+    text = compact_number(float(value) * 100, 1) if not is_missing(value) else None
+    return None if text is None else f'{text}%'
+
+def pick(flag: Optional[bool], when_true: str, when_false: str) -> Optional[str]:
+    '''Label for a signal that may be unknown'''
+    return None if flag is None else when_true if flag else when_false
+
+def join_present(parts: Iterable[Optional[str]], separator: str = '，') -> Optional[str]:
+    return separator.join(part for part in parts if not is_missing(part)) or None
+
+def field_lines(fields: Iterable[Tuple[str, Optional[str]]]) -> str:
+    '''"- label：value" lines, leaving out fields without a value'''
+    return '\n'.join(f'- {label}：{value}' for label, value in fields if not is_missing(value))
+
+def sections(parts: Iterable[Tuple[str, str]]) -> str:
+    '''Join titled sections, leaving out empty ones'''
+    return '\n\n'.join(f'{title}：\n{body}' for title, body in parts if body)
+
+def estimate_tokens(text: str) -> int:
+    '''
+    Rough token count for Llama-style BPE tokenizers: about one token per CJK character
+    or emoji and one per four other characters. Used for reporting, not for limits.
+    '''
+    wide = len(WIDE_CHARS.findall(text))
+    return wide + math.ceil((len(text) - wide) / 4)
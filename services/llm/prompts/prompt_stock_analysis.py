@@ -1,106 +1,21 @@
-from typing import Dict
-from datetime import datetime
-from utils.formatters import format_large_number
+from services.data.models import StockData, Indicators, Signals
 from services.llm.prompts.prompt_base import BasePrompt
+from services.llm.prompts.prompt_compiler import (
+    compact_number,
+    compact_large,
+    money,
+    percent,
+    ratio_percent,
+    pick,
+    field_lines,
+    sections,
+)
 
 class StockAnalysisPrompt(BasePrompt):
     '''Prompt generator for stock analysis'''
 
-    def build_prompt(stock_data: Dict) -> str:
-        stock_info = stock_data['stock_info']
-        historical_data = stock_data['historical_data']
-        news = stock_data['news']
-
-        financial_summary = f'''
-- 當前價格：${stock_info['current_price']}
-- 市值：{format_large_number(stock_info['market_cap'])}
-- 市盈率：{stock_info['pe_ratio']}
-- 預期市盈率：{stock_info['forward_pe']}
-- 每股收益：${stock_info['eps']}
-- 預期每股收益：${stock_info['forward_eps']}
-- 營業收入：{format_large_number(stock_info['revenue'])}
-- 股息收益率：{stock_info['dividend_yield']}%
-- 目標均價：${stock_info['target_mean_price']}
-- 分析師建議：{stock_info['recommendation'].capitalize()}
-- 分析師人數：{stock_info['num_analyst_opinions']}
-'''
-
-        price_history_text = f'''
-- 日期範圍：{historical_data['start_date']} 至 {historical_data['end_date']}
-- 起始價格：${historical_data['start_price']}
-- 當前價格：${historical_data['end_price']}
-- 變動：${historical_data['price_change']} ({historical_data['percent_change']}%)
-- 一個月範圍：${historical_data['min_price']} - ${historical_data['max_price']}
-- 平均成交量：{format_large_number(historical_data['avg_volume'])}
-- 52 週範圍：${stock_info['fifty_two_week_low']} - ${stock_info['fifty_two_week_high']}
-- 50 日移動平均線：${stock_info['fifty_day_average']}
-- 200 日移動平均線：${stock_info['two_hundred_day_average']}
-'''
-        
-        technical_analysis_section = f'''
-- RSI (14)：{historical_data['current_indicators']['rsi']} ({'超買' if historical_data['technical_signals']['rsi_overbought'] else '超賣' if historical_data['technical_signals']['rsi_oversold'] else '中性'})
-- MACD：{historical_data['current_indicators']['macd']} (訊號線：{historical_data['current_indicators']['macd_signal']})
-- MACD 訊號：{'看漲' if historical_data['technical_signals']['macd_bullish'] else '看跌'}
-- 20 日簡單移動平均線：${historical_data['current_indicators']['sma20']}
-- 價格與 20 日均線關係：{'Above' if historical_data['technical_signals']['price_above_sma20'] else 'Below'}
-- 布林帶：上軌 ${historical_data['current_indicators']['upper_bollinger']} / 下軌 ${historical_data['current_indicators']['lower_bollinger']}
-- ATR：${historical_data['current_indicators']['atr']}
-- 一個月波動率：{historical_data['volatility']}
-'''
-        
-        financial_health_section = f'''
-- 利潤率：{f"{float(stock_info['profit_margins']) * 100:.2f}%" if stock_info['profit_margins'] != 'N/A' else 'N/A'}
-- 營運利潤率：{f"{float(stock_info['operating_margins']) * 100:.2f}%" if stock_info['operating_margins'] != 'N/A' else 'N/A'}
-- 毛利率：{f"{float(stock_info['gross_margins']) * 100:.2f}%" if stock_info['gross_margins'] != 'N/A' else 'N/A'}
-- 股本回報率：{f"{float(stock_info['return_on_equity']) * 100:.2f}%" if stock_info['return_on_equity'] != 'N/A' else 'N/A'}
-- 資產回報率：{f"{float(stock_info['return_on_assets']) * 100:.2f}%" if stock_info['return_on_assets'] != 'N/A' else 'N/A'}
-- 負債權益比：{stock_info['debt_to_equity']}
-- 流動比率：{stock_info['current_ratio']}
-- 速動比率：{stock_info['quick_ratio']}
-- 營運現金流：{format_large_number(stock_info['operating_cash_flow'])}
-- 自由現金流：{format_large_number(stock_info['free_cash_flow'])}
-- 總現金：{format_large_number(stock_info['total_cash'])}
-- 總負債：{format_large_number(stock_info['total_debt'])}
-- PEG 比率：{stock_info['peg_ratio']}
-- 市淨率：{stock_info['price_to_book']}
-- 市銷率：{stock_info['price_to_sales']}
-'''
-        
-        news_items = []
-        for i, news_item in enumerate(news[:5]):  # Limit to 5 most recent news items
-            content = news_item['content']
-            date_str = datetime.strptime(content['pubDate'], '%Y-%m-%dT%H:%M:%SZ').strftime('%Y-%m-%d')
-            news_items.append(f"{date_str}: {content['title']}")
-
-        news_section = "\n".join(news_items)
-
-        # Create the prompt
-        prompt = f'''
-你是一位金融分析師，正在為股票 {stock_data['ticker']} ({stock_info['name']}) 提供見解。
-
-公司資料：
-- 股票代號：{stock_data['ticker']}
-- 公司名稱：{stock_info['name']}
-- 行業：{stock_info['sector']}
-- 產業：{stock_info['industry']}
-- 業務概要：{stock_info['business_summary']}
-
-財務指標：
-{financial_summary}
-
-市場數據：
-{price_history_text}
-
-技術分析：
-{technical_analysis_section}
-    
-財務健康：
-{financial_health_section}
-
-最新消息：
-{news_section}
-
-根據這些資料，請按照以下結構提供財務分析：
+    # Identical for every stock and placed first, so providers can reuse the cached prefix
+    INSTRUCTIONS = '''你是一位金融分析師。請根據文末提供的股票資料，按照以下結構提供財務分析：
 [股票代號] | [當前價格] | [🔺(上升)/🔻(下降)] [百分比變動 %]
 
 <b>公司概覽</b>
@@ -128,7 +43,7 @@ class StockAnalysisPrompt(BasePrompt):
 
 輸出格式示例：
 # ACME | $123.45 | 🔺 1.92%
-    
+
 <b>公司概覽</b>
 ACME公司是科技行業的領先企業，專注於AI驅動的解決方案。該公司最近擴展了產品線並獲得了幾個高知名度的合約，為未來幾個季度的強勁增長奠定了基礎。
 
@@ -150,6 +65,103 @@ ACME公司是科技行業的領先企業，專注於AI驅動的解決方案。
 <b>風險級別：中等 🟠</b>
 []
 
-請保持回應簡潔，專注於最重要的見解。如果某些數據點缺失，請確認分析的局限性。
-        '''
-        return prompt
\ No newline at end of file
+請保持回應簡潔，專注於最重要的見解。資料中沒有列出的數據點即為缺失，請確認分析的局限性。
+
+---
+'''
+
+    def build_prompt(stock_data: StockData) -> str:
+        '''INSTRUCTIONS followed by the stock's data, leaving out fields without a value'''
+        ticker = stock_data.ticker
+        stock_info = stock_data.stock_info
+        history = stock_data.historical_data
+        indicators = history.current_indicators if history else Indicators()
+        signals = history.technical_signals if history else Signals()
+
+        def range_of(low, high):
+            low, high = money(low), money(high)
+            return f'{low} - {high}' if low and high else None
+
+        recommendation = stock_info.recommendation
+        company = field_lines([
+            ('行業', stock_info.sector),
+            ('產業', stock_info.industry),
+            ('業務概要', stock_info.business_summary),
+        ])
+
+        financial_summary = field_lines([
+            ('當前價格', money(stock_info.current_price)),
+            ('市值', compact_large(stock_info.market_cap, '$')),
+            ('市盈率', compact_number(stock_info.pe_ratio, 1)),
+            ('預期市盈率', compact_number(stock_info.forward_pe, 1)),
+            ('每股收益', money(stock_info.eps)),
+            ('預期每股收益', money(stock_info.forward_eps)),
+            ('營業收入', compact_large(stock_info.revenue, '$')),
+            ('股息收益率', percent(stock_info.dividend_yield)),
+            ('目標均價', money(stock_info.target_mean_price)),
+            ('分析師建議', recommendation.capitalize() if recommendation else None),
+            ('分析師人數', stock_info.num_analyst_opinions),
+        ])
+
+        price_history = field_lines([
+            ('日期範圍', f'{history.start_date} 至 {history.end_date}' if history else None),
+            ('起始價格', money(history.start_price) if history else None),
+            ('變動', f'{money(history.price_change)} ({percent(history.percent_change)})' if history else None),
+            ('一個月範圍', range_of(history.min_price, history.max_price) if history else None),
+            ('平均成交量', compact_large(history.avg_volume) if history else None),
+            ('52 週範圍', range_of(stock_info.fifty_two_week_low, stock_info.fifty_two_week_high)),
+            ('50 日移動平均線', money(stock_info.fifty_day_average)),
+            ('200 日移動平均線', money(stock_info.two_hundred_day_average)),
+        ])
+
+        rsi = compact_number(indicators.rsi, 1)
+        rsi_state = pick(signals.rsi_overbought, '超買', pick(signals.rsi_oversold, '超賣', '中性'))
+        macd = compact_number(indicators.macd)
+        macd_signal = compact_number(indicators.macd_signal)
+        bollinger = (money(indicators.upper_bollinger), money(indicators.lower_bollinger))
+        technical_analysis = field_lines([
+            ('RSI (14)', f'{rsi} ({rsi_state})' if rsi and rsi_state else rsi),
+            ('MACD', f'{macd} (訊號線：{macd_signal})' if macd and macd_signal else macd),
+            ('MACD 訊號', pick(signals.macd_bullish, '看漲', '看跌')),
+            ('20 日簡單移動平均線', money(indicators.sma20)),
+            ('價格與 20 日均線關係', pick(signals.price_above_sma20, 'Above', 'Below')),
+            ('布林帶', f'上軌 {bollinger[0]} / 下軌 {bollinger[1]}' if all(bollinger) else None),
+            ('ATR', money(indicators.atr)),
+            ('一個月波動率', compact_number(history.volatility) if history else None),
+        ])
+
+        financial_health = field_lines([
+            ('利潤率', ratio_percent(stock_info.profit_margins)),
+            ('營運利潤率', ratio_percent(stock_info.operating_margins)),
+            ('毛利率', ratio_percent(stock_info.gross_margins)),
+            ('股本回報率', ratio_percent(stock_info.return_on_equity)),
+            ('資產回報率', ratio_percent(stock_info.return_on_assets)),
+            ('負債權益比', compact_number(stock_info.debt_to_equity, 1)),
+            ('流動比率', compact_number(stock_info.current_ratio)),
+            ('速動比率', compact_number(stock_info.quick_ratio)),
+            ('營運現金流', compact_large(stock_info.operating_cash_flow, '$')),
+            ('自由現金流', compact_large(stock_info.free_cash_flow, '$')),
+            ('總現金', compact_large(stock_info.total_cash, '$')),
+            ('總負債', compact_large(stock_info.total_debt, '$')),
+            ('PEG 比率', compact_number(stock_info.peg_ratio)),
+            ('市淨率', compact_number(stock_info.price_to_book, 1)),
+            ('市銷率', compact_number(stock_info.price_to_sales, 1)),
+        ])
+
+        news_items = [f'{item.date}: {item.title}' if item.date else item.title for item in stock_data.news[:5]]
+
+        data = sections([
+            ('公司資料', company),
+            ('財務指標', financial_summary),
+            ('市場數據', price_history),
+            ('技術分析', technical_analysis),
+            ('財務健康', financial_health),
+            ('最新消息', '\n'.join(news_items)),
+        ])
+
+        return f'''{StockAnalysisPrompt.INSTRUCTIONS}
+股票：{ticker} ({stock_info.name})
+
+{data}
+
+請按上述結構分析 {ticker}。'''
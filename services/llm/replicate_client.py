@@ -0,0 +1,248 @@
+import asyncio
+import heapq
+import json
+import time
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from config.config import (
+    REPLICATE_TOKEN,
+    REPLICATE_API_BASE,
+    REPLICATE_MAX_CONNECTIONS,
+    REPLICATE_POLL_MIN_INTERVAL,
+    REPLICATE_POLL_MAX_INTERVAL,
+)
+
+TERMINAL_STATUSES = ('succeeded', 'failed', 'canceled')
+
+class AsyncReplicateClient:
+    '''Asyncio client for the Replicate predictions API on one shared HTTP session'''
+
+    def __init__(
+        self,
+        api_token: str = REPLICATE_TOKEN,
+        base_url: str = REPLICATE_API_BASE,
+        max_connections: int = REPLICATE_MAX_CONNECTIONS,
+        poll_min_interval: float = REPLICATE_POLL_MIN_INTERVAL,
+        poll_max_interval: float = REPLICATE_POLL_MAX_INTERVAL,
+    ):
+        self.api_token = api_token
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.tracker = PredictionTracker(self, poll_min_interval, poll_max_interval)
+        self._http = None
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        '''Shared HTTP session, created on first use inside the running event loop'''
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={'Authorization': f'Bearer {self.api_token}'},
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(30.0),
+            )
+        return self._http
+
+    async def create_prediction(self, model: str, input: Dict, stream: bool = False) -> Dict:
+        '''Create a prediction for an official model ("owner/name")'''
+        response = await self.http.post(
+            f'/models/{model}/predictions',
+            json={'input': input, 'stream': stream},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def get_prediction(self, prediction_id: str) -> Dict:
+        response = await self.http.get(f'/predictions/{prediction_id}')
+        response.raise_for_status()
+        return response.json()
+
+    async def cancel_prediction(self, prediction_id: str) -> Dict:
+        response = await self.http.post(f'/predictions/{prediction_id}/cancel')
+        response.raise_for_status()
+        return response.json()
+
+    async def wait(self, prediction: Dict) -> Dict:
+        '''Wait until a prediction reaches a terminal status'''
+        if prediction.get('status') in TERMINAL_STATUSES:
+            return prediction
+        return await self.tracker.track(prediction['id'])
+
+    async def stream(self, prediction: Dict) -> AsyncIterator[str]:
+        '''
+        Yield output tokens from a prediction created with stream=True.
+        Raises StreamError if the prediction fails or is canceled mid-stream.
+        '''
+        headers = {'Accept': 'text/event-stream', 'Cache-Control': 'no-store'}
+        timeout = httpx.Timeout(30.0, read=None)
+        async with self.http.stream('GET', prediction['urls']['stream'], headers=headers, timeout=timeout) as response:
+            response.raise_for_status()
+            event, data = 'message', []
+            async for line in response.aiter_lines():
+                if line:
+                    field, _, value = line.partition(':')
+                    if value.startswith(' '):
+                        value = value[1:]
+                    if field == 'event':
+                        event = value
+                    elif field == 'data':
+                        data.append(value)
+                    continue
+
+                # A blank line dispatches the buffered event
+                payload = '\n'.join(data)
+                if event == 'output':
+                    yield payload
+                elif event == 'error':
+                    raise StreamError('failed', payload)
+                elif event == 'done':
+                    reason = json.loads(payload).get('reason') if payload.strip() else None
+                    if reason in ('canceled', 'error'):
+                        raise StreamError('canceled' if reason == 'canceled' else 'failed', reason)
+                    return
+                event, data = 'message', []
+
+    async def run_streaming(self, model: str, input: Dict, on_token) -> Dict:
+        '''
+        Create a streaming prediction and pass each token to the async on_token callback.
+        Returns a prediction dict with the collected output, like run().
+        '''
+        prediction = await self.create_prediction(model, input, stream=True)
+        if not prediction.get('urls', {}).get('stream'):
+            return await self.wait(prediction)
+
+        output: List[str] = []
+        try:
+            async for token in self.stream(prediction):
+                output.append(token)
+                await on_token(token)
+        except StreamError as e:
+            return {**prediction, 'status': e.status, 'error': e.detail, 'output': output}
+        return {**prediction, 'status': 'succeeded', 'output': output}
+
+    async def run(self, model: str, input: Dict) -> Dict:
+        '''Create a prediction and wait for it to finish'''
+        prediction = await self.create_prediction(model, input)
+        return await self.wait(prediction)
+
+    async def aclose(self):
+        await self.tracker.stop()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+class StreamError(Exception):
+    def __init__(self, status: str, detail: str):
+        super().__init__(f'Prediction {status}: {detail}')
+        self.status = status
+        self.detail = detail
+
+class PredictionTracker:
+    '''
+    Poll many in-flight predictions from a single worker task.
+    Each prediction is polled on its own schedule, starting at poll_min_interval
+    and backing off towards poll_max_interval while it is still running.
+    '''
+
+    BACKOFF = 1.5
+    MAX_CONCURRENT_POLLS = 32
+
+    def __init__(self, client: AsyncReplicateClient, poll_min_interval: float, poll_max_interval: float):
+        self.client = client
+        self.poll_min_interval = poll_min_interval
+        self.poll_max_interval = poll_max_interval
+        self._schedule = []
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._intervals: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._waiters)
+
+    async def track(self, prediction_id: str) -> Dict:
+        self._ensure_worker()
+        future = self._waiters.get(prediction_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters[prediction_id] = future
+            self._intervals[prediction_id] = self.poll_min_interval
+            heapq.heappush(self._schedule, (time.monotonic() + self.poll_min_interval, prediction_id))
+            self._wakeup.set()
+        # Shield so one cancelled caller does not cancel the shared future
+        return await asyncio.shield(future)
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENT_POLLS)
+        while True:
+            if not self._schedule:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._schedule[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.monotonic()
+            due = []
+            while self._schedule and self._schedule[0][0] <= now:
+                _, prediction_id = heapq.heappop(self._schedule)
+                if prediction_id in self._waiters:
+                    due.append(prediction_id)
+
+            await asyncio.gather(*(self._poll(prediction_id, semaphore) for prediction_id in due))
+
+    async def _poll(self, prediction_id: str, semaphore: asyncio.Semaphore):
+        future = self._waiters[prediction_id]
+        try:
+            async with semaphore:
+                prediction = await self.client.get_prediction(prediction_id)
+        except Exception as e:
+            self._finish(prediction_id)
+            if not future.done():
+                future.set_exception(e)
+            return
+
+        if prediction.get('status') in TERMINAL_STATUSES:
+            self._finish(prediction_id)
+            if not future.done():
+                future.set_result(prediction)
+            return
+
+        interval = min(self._intervals[prediction_id] * self.BACKOFF, self.poll_max_interval)
+        self._intervals[prediction_id] = interval
+        heapq.heappush(self._schedule, (time.monotonic() + interval, prediction_id))
+
+    def _finish(self, prediction_id: str):
+        self._waiters.pop(prediction_id, None)
+        self._intervals.pop(prediction_id, None)
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        for future in self._waiters.values():
+            if not future.done():
+                future.cancel()
+        self._waiters.clear()
+        self._intervals.clear()
+        self._schedule.clear()
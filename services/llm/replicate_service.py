@@ -1,126 +1,200 @@
-import os
 import re
-import replicate
-from typing import Tuple, Dict, Any
+import hashlib
+from collections import deque
+from typing import Tuple, Dict, Any, List
+from services.cache.ttl_cache import TTLCache
+from services.llm.replicate_client import AsyncReplicateClient
+from services.llm.model_router import ModelRouter
+from services.data.models import StockData
+from services.metrics.metrics import span, annotate
+from utils.telegram_html import strip_incomplete_tag, close_open_tags, is_balanced, scan_tags
 from services.llm.prompts.prompt_stock_analysis import StockAnalysisPrompt
+from services.llm.prompts.prompt_batch_analysis import BatchAnalysisPrompt
+from services.llm.prompts.prompt_compiler import estimate_tokens
+from config.config import ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL
 
-class ReplicateService:
-    def __init__(self):
-        self.client = replicate.Client(api_token=os.getenv('REPLICATE_API_TOKEN'))
+BLANK_LINES = re.compile(r'\n{3,}')
+# < before a digit, whitespace, dot or =; > after a digit or whitespace, or before =.
+# Both branches start with a literal, so the regex engine skips ahead to the next < or >.
+UNSAFE_BRACKET = re.compile(r'<(?=[\d\s.=])|>(?:(?<=[\d\s]>)|(?==))')
+BRACKET_ENTITIES = {'<': '&lt;', '>': '&gt;'}
+
+class PredictionFailed(Exception):
+    pass
 
-    def get_financial_insight(self, stock_data: Dict) -> Tuple[str, str]:
+class ReplicateService:
+    def __init__(self, client: AsyncReplicateClient = None):
+        self.client = client or AsyncReplicateClient()
+        self.router = ModelRouter(self.client)
+        # Finished analyses as (text, prediction_id), keyed by ticker and prompt hash
+        self.analysis_cache = TTLCache(max_size=ANALYSIS_CACHE_SIZE, ttl=ANALYSIS_CACHE_TTL)
+        # Estimated input tokens of recent prompts sent to the model, per prompt kind
+        self.prompt_tokens: Dict[str, deque] = {}
+
+    async def get_financial_insight(self, stock_data: StockData, on_token=None, on_generate=None) -> Tuple[str, str, bool]:
+        '''
+        Generate the analysis for stock_data. Returns (text, prediction_id, cache_hit)
+        Identical prompts within ANALYSIS_CACHE_TTL are served from the cache, and
+        concurrent requests for the same prompt share one prediction.
+        If on_token is given, the prediction is streamed and each output token is
+        passed to the async on_token callback as it arrives. on_generate() is called
+        just before a new prediction starts.
+        '''
         try:
-            if 'error' in stock_data:
-                return f'獲取股票數據時出錯： {stock_data["error"]}'
+            if stock_data.error:
+                return f'獲取股票數據時出錯： {stock_data.error}', 'error_id', False
                                 
-            # Build prompt with stock data
-            prompt = StockAnalysisPrompt.build_prompt(stock_data)
-
-            prediction = self.client.predictions.create(
-                'meta/llama-4-maverick-instruct',
-                input={
-                    'prompt': prompt,
-                    'max_tokens': 8192,
-                    'top_p': 0.9,
-                    'temperature': 0.75,
-                }
-            )
-
-            prediction.wait()
-
-            if prediction.status == 'failed':
-                return f'生成分析時出錯： {prediction.error}', 'error_id'
+            key = self.analysis_cache_key(stock_data.ticker, stock_data.to_json())
+            generated = False
+
+            async def generate():
+                nonlocal generated
+                generated = True
+                if on_generate is not None:
+                    on_generate()
+                # Build prompt with stock data
+                with span('prompt.build'):
+                    prompt = StockAnalysisPrompt.build_prompt(stock_data)
+                return await self.generate(prompt, on_token, kind='stock')
+
+            insights, prediction_id = await self.analysis_cache.get_or_load_async(key, generate)
+            return insights, prediction_id, not generated
+        except PredictionFailed as e:
+            return f'生成分析時出錯： {e}', 'error_id', False
+        except Exception as e:
+            return f'Error occur when generating financial insight: {str(e)}', 'error_id', False
 
-            prediction_id = prediction.id
-            output = prediction.output
+    async def get_batch_insight(self, stocks_data: List[StockData], on_token=None) -> Tuple[str, str, bool]:
+        '''
+        Generate one comparative analysis for several stocks. Returns (text, prediction_id, cache_hit)
+        Cached and coalesced the same way as get_financial_insight.
+        '''
+        try:
+            key = self.analysis_cache_key(
+                ','.join(stock_data.ticker for stock_data in stocks_data),
+                b'\n'.join(stock_data.to_json() for stock_data in stocks_data),
+            )
+            generated = False
+
+            async def generate():
+                nonlocal generated
+                generated = True
+                with span('prompt.build'):
+                    prompt = BatchAnalysisPrompt.build_prompt(stocks_data)
+                return await self.generate(prompt, on_token, kind='batch')
+
+            insights, prediction_id = await self.analysis_cache.get_or_load_async(key, generate)
+            return insights, prediction_id, not generated
+        except PredictionFailed as e:
+            return f'生成分析時出錯： {e}', 'error_id', False
+        except Exception as e:
+            return f'Error occur when generating batch insight: {str(e)}', 'error_id', False
 
-            # For streaming output, combine all output
-            if isinstance(output, list):
-                full_output = ''.join(output)
-            else:
-                full_output = str(output)
+    def analysis_cache_key(self, ticker: str, data: bytes) -> Tuple[str, str]:
+        '''Analyses are keyed by the serialized stock data, so a cache hit skips building the prompt'''
+        return ticker, hashlib.sha256(data).hexdigest()
 
-            # Remove <think> blocks
-            cleaned_output = self.remove_think_blocks(full_output)
+    async def generate(self, prompt: str, on_token=None, kind: str = 'stock') -> Tuple[str, str]:
+        '''Run one prediction and return (formatted_output, prediction_id). Raises PredictionFailed.'''
+        self.record_prompt(kind, prompt)
+        with span('llm.run'):
+            prediction = await self.router.run(self.build_input(prompt), on_token)
 
-            # Sanitize for Telegram HTML parsing
-            sanitized_output = self.sanitize_telegram_html(cleaned_output)
+        if prediction['status'] != 'succeeded':
+            raise PredictionFailed(prediction.get('error'))
 
-            return sanitized_output, prediction_id
-        except Exception as e:
-            return f'Error occur when generating financial insight: {str(e)}', 'error_id'
+        return self.format_output(prediction['output']), prediction['id']
         
-    def summarize_news(self, news_articles):
+    async def summarize_news(self, news_articles):
         try:
             if not news_articles or len(news_articles) == 0:
                 return "無法獲取最新環球新聞，請稍後再試。", "error_id"
                                     
             # Build prompt with news articles
             from services.llm.prompts.prompt_news_summary import NewsSummaryPrompt
-            prompt = NewsSummaryPrompt.build_prompt(news_articles)
-
-            print(f"Generated prompt for news summarization: {prompt}")  # Debugging output
-
-            prediction = self.client.predictions.create(
-                'meta/llama-4-maverick-instruct',
-                input={
-                    'prompt': prompt,
-                    'max_tokens': 8192,
-                    'top_p': 0.9,
-                    'temperature': 0.75,
-                }
-            )
+            with span('prompt.build'):
+                prompt = NewsSummaryPrompt.build_prompt(news_articles)
+            self.record_prompt('news', prompt)
 
-            prediction.wait()
+            with span('llm.run'):
+                prediction = await self.router.run(self.build_input(prompt))
 
-            if prediction.status == 'failed':
-                return f'生成新聞摘要時出錯： {prediction.error}', 'error_id'
+            if prediction['status'] != 'succeeded':
+                return f'生成新聞摘要時出錯： {prediction.get("error")}', 'error_id'
 
-            prediction_id = prediction.id
-            output = prediction.output
-
-            # For streaming output, combine all output
-            if isinstance(output, list):
-                full_output = ''.join(output)
-            else:
-                full_output = str(output)
-
-            # Remove <think> blocks
-            cleaned_output = self.remove_think_blocks(full_output)
-
-            # Sanitize for Telegram HTML parsing
-            sanitized_output = self.sanitize_telegram_html(cleaned_output)
-
-            return sanitized_output, prediction_id
+            return self.format_output(prediction['output']), prediction['id']
         except Exception as e:
             return f'Error occur when generating news summary: {str(e)}', 'error_id'
 
+    def record_prompt(self, kind: str, prompt: str):
+        tokens = estimate_tokens(prompt)
+        self.prompt_tokens.setdefault(kind, deque(maxlen=500)).append(tokens)
+        annotate(prompt_tokens=tokens)
+
+    def prompt_stats(self) -> Dict:
+        '''Estimated input tokens per prompt kind over recent predictions'''
+        return {
+            kind: {'count': len(tokens), 'avg': round(sum(tokens) / len(tokens)), 'max': max(tokens)}
+            for kind, tokens in self.prompt_tokens.items() if tokens
+        }
+
+    def build_input(self, prompt: str) -> Dict[str, Any]:
+        return {
+            'prompt': prompt,
+            'max_tokens': 8192,
+            'top_p': 0.9,
+            'temperature': 0.75,
+        }
+
+    def format_output(self, output) -> str:
+        '''Join prediction output and prepare it for Telegram'''
+        # For streaming output, combine all output
+        if isinstance(output, list):
+            full_output = ''.join(output)
+        else:
+            full_output = str(output)
+
+        # Remove <think> blocks
+        cleaned_output = self.remove_think_blocks(full_output)
+
+        # Sanitize for Telegram HTML parsing
+        sanitized_output = self.sanitize_telegram_html(cleaned_output)
+        if not is_balanced(sanitized_output):
+            open_tags, stray_tags = scan_tags(sanitized_output)
+            print(f"Unbalanced HTML in model output: open {open_tags}, unmatched closing {stray_tags}")
+        return sanitized_output
+
+    def format_partial_output(self, text: str) -> str:
+        '''Prepare a partial streaming buffer for display as Telegram HTML'''
+        # Hide an unfinished <think> block until its closing tag arrives
+        think_start = text.rfind('<think>')
+        if think_start != -1 and '</think>' not in text[think_start:]:
+            text = text[:think_start]
+
+        text = strip_incomplete_tag(text)
+        cleaned_output = self.remove_think_blocks(text)
+        sanitized_output = self.sanitize_telegram_html(cleaned_output)
+        return close_open_tags(sanitized_output)
+
     def remove_think_blocks(self, text: str) -> str:
         '''Remove content between <think> and </think> tags'''
-        pattern = r'<think>.*?</think>'
-        cleaned_text = re.sub(pattern, '', text, flags=re.DOTALL)
-        cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
-        return cleaned_text.strip()
-    
+        if '<think>' in text:
+            # Same blocks as a non-greedy <think>.*?</think> regex, found with str.find
+            parts, position = [], 0
+            while True:
+                start = text.find('<think>', position)
+                end = text.find('</think>', start + 7) if start != -1 else -1
+                if end == -1:
+                    break
+                parts.append(text[position:start])
+                position = end + 8
+            parts.append(text[position:])
+            text = ''.join(parts)
+        if '\n\n\n' in text:
+            text = BLANK_LINES.sub('\n\n', text)
+        return text.strip()
+
     def sanitize_telegram_html(self, text: str) -> str:
         '''Sanitize text for Telegram HTML parsing to prevent parsing issues with < and > characters'''
-        # Replace standalone < symbols that might cause HTML parsing issues
-        text = re.sub(r'<(\d|\s|\.)', r'&lt;\1', text)
-        text = re.sub(r'(\d|\s)>', r'\1&gt;', text)
-        
-        # Handle comparison operators like <= and >=
-        text = text.replace('<=', '&lt;=')
-        text = text.replace('>=', '&gt;=')
-        
-        # Preserve legitimate HTML tags that Telegram supports
-        # Telegram supports <b>, <strong>, <i>, <em>, <u>, <ins>, <s>, <strike>, <del>, <a>, <code>, <pre>
-        allowed_tags = r'</?(?:b|strong|i|em|u|ins|s|strike|del|a|code|pre)(?:\s+[^>]*)?>'
-        
-        # Function to replace matches with placeholders
-        def preserve_tag(match):
-            return match.group(0)
-        
-        # Preserve allowed HTML tags
-        text = re.sub(allowed_tags, preserve_tag, text, flags=re.IGNORECASE)
-        
-        return text
+        # Escapes stray brackets and comparison operators in one pass; supported tags are left as they are
+        return UNSAFE_BRACKET.sub(lambda match: BRACKET_ENTITIES[match.group(0)], text)
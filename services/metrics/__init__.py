@@ -0,0 +1,3 @@
+from services.metrics.metrics import registry, span, record, annotate, set_outcome, traced
+
+__all__ = ['registry', 'span', 'record', 'annotate', 'set_outcome', 'traced']
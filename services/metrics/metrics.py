@@ -0,0 +1,170 @@
+import os
+import re
+import json
+import time
+import threading
+import functools
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from config.config import TRACE_LOG
+
+# Seconds; from cache lookups up to predictions that run into the job timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 180)
+
+class Histogram:
+    '''Prometheus-style histogram with one series per combination of label values; safe to observe from any thread'''
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket..., count above the last bucket], sum
+        self.series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+            series[0][index] += 1
+            series[1][0] += value
+
+    def totals(self) -> Dict[Tuple[str, ...], Tuple[int, float]]:
+        '''(count, sum) of each series'''
+        with self.lock:
+            return {values: (sum(counts), total[0]) for values, (counts, total) in self.series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = sorted((values, list(counts), total[0]) for values, (counts, total) in self.series.items())
+        for values, counts, total in series:
+            labels = [f'{name}="{escape_label(value)}"' for name, value in zip(self.labels, values)]
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                bucket_labels = ','.join(labels + [f'le="{le}"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {cumulative}')
+            suffix = '{' + ','.join(labels) + '}' if labels else ''
+            lines.append(f'{self.name}_sum{suffix} {total:.6f}')
+            lines.append(f'{self.name}_count{suffix} {cumulative}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Histogram] = []
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, help, labels, buckets)
+        self.metrics.append(histogram)
+        return histogram
+
+    def render(self, gauges: Optional[Dict] = None) -> str:
+        '''Prometheus text exposition of every metric, plus numeric leaves of `gauges` as momentum_* gauges'''
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for name, value in flatten_gauges(gauges or {}):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+def escape_label(value: str) -> str:
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def flatten_gauges(stats: Dict, prefix: str = 'momentum') -> Iterable[Tuple[str, float]]:
+    '''(metric_name, value) for every number in a nested stats dict, e.g. stats['job_queue']['depth'] -> momentum_job_queue_depth'''
+    for key, value in stats.items():
+        name = f'{prefix}_{re.sub(r"[^a-zA-Z0-9_]", "_", str(key))}'
+        if isinstance(value, dict):
+            yield from flatten_gauges(value, name)
+        elif isinstance(value, (bool, int, float)):
+            yield name, float(value)
+
+registry = Registry()
+STAGE_SECONDS = registry.histogram('momentum_stage_seconds', 'Time spent in one stage of handling a request', ('stage',))
+REQUEST_SECONDS = registry.histogram('momentum_request_seconds', 'Time from receiving a request to the final reply', ('kind', 'outcome'))
+
+class Trace:
+    '''Spans and fields of one request, printed as a single JSON line when it finishes'''
+    __slots__ = ('id', 'kind', 'started_at', 'spans', 'fields', 'outcome')
+
+    def __init__(self, kind: str):
+        self.id = os.urandom(6).hex()
+        self.kind = kind
+        self.started_at = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.fields: Dict = {}
+        self.outcome = 'ok'
+
+    def add(self, stage: str, started_at: float, seconds: float):
+        self.spans.append((stage, started_at - self.started_at, seconds))
+
+    def finish(self):
+        total = time.perf_counter() - self.started_at
+        REQUEST_SECONDS.observe(total, self.kind, self.outcome)
+        if TRACE_LOG:
+            print(json.dumps({
+                'trace': self.id,
+                'kind': self.kind,
+                'outcome': self.outcome,
+                'total_ms': round(total * 1000, 1),
+                **self.fields,
+                # Offset from the start of the request and duration, in ms
+                'spans': [[stage, round(offset * 1000, 1), round(seconds * 1000, 1)] for stage, offset, seconds in self.spans],
+            }, ensure_ascii=False, default=str))
+
+# Trace of the request being handled; copied into job tasks and dispatch threads
+current_trace: ContextVar[Optional[Trace]] = ContextVar('current_trace', default=None)
+
+def record(stage: str, seconds: float, started_at: Optional[float] = None):
+    '''Observe a stage duration measured elsewhere, adding it to the current trace if there is one'''
+    STAGE_SECONDS.observe(seconds, stage)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, time.perf_counter() - seconds if started_at is None else started_at, seconds)
+
+@contextmanager
+def span(stage: str):
+    '''Time the enclosed block as `stage`; works around both blocking and awaited code'''
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started_at, started_at)
+
+def annotate(**fields):
+    '''Add fields such as ticker or cache_hit to the current trace'''
+    trace = current_trace.get()
+    if trace is not None:
+        trace.fields.update(fields)
+
+def set_outcome(outcome: str):
+    '''Label the current request, e.g. 'invalid' or 'no_credits', instead of the default 'ok' '''
+    trace = current_trace.get()
+    if trace is not None:
+        trace.outcome = outcome
+
+def traced(kind: str):
+    '''Decorate an async handler so each call is traced as one request of `kind`'''
+    def decorate(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            trace = Trace(kind)
+            token = current_trace.set(trace)
+            try:
+                return await func(*args, **kwargs)
+            except BaseException:
+                trace.outcome = 'error'
+                raise
+            finally:
+                current_trace.reset(token)
+                trace.finish()
+        return wrapper
+    return decorate
@@ -0,0 +1,4 @@
+from services.persistence.stores import MemoryStore, SQLiteStore, MySQLStore, build_store
+from services.persistence.store_persistence import StorePersistence
+
+__all__ = ['MemoryStore', 'SQLiteStore', 'MySQLStore', 'build_store', 'StorePersistence']
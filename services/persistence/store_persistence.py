@@ -0,0 +1,216 @@
+import json
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, Optional
+from telegram.ext import Application, BasePersistence, PersistenceInput
+from services.dispatch.dispatch_service import DispatchService
+from config.config import (
+    PERSISTENCE_UPDATE_INTERVAL,
+    PERSISTENCE_STATE_TTL,
+    PERSISTENCE_MAX_ENTRIES,
+    PERSISTENCE_RELOAD_AFTER,
+    PERSISTENCE_PURGE_INTERVAL,
+)
+
+class _Entry:
+    '''Bookkeeping for one user's or chat's data held in memory'''
+    __slots__ = ('stored', 'checked_at', 'dirty')
+
+    def __init__(self, stored: Optional[str], checked_at: float):
+        # Serialized data as last read from or written to the store
+        self.stored = stored
+        self.checked_at = checked_at
+        # Used since it was last handed to update_*_data, so it must not be evicted
+        self.dirty = False
+
+class StorePersistence(BasePersistence):
+    '''
+    PTB persistence for user_data and chat_data on a MemoryStore, SQLiteStore or MySQLStore.
+    Nothing is loaded at startup: each user's data is read on first use in refresh_user_data.
+    Changed data is serialized as compact JSON and written in one batch per update interval;
+    unchanged data is not rewritten, so idle conversation state expires after
+    PERSISTENCE_STATE_TTL. At most PERSISTENCE_MAX_ENTRIES users and chats stay in memory.
+    '''
+
+    KINDS = ('user', 'chat')
+
+    def __init__(self, store, dispatch: DispatchService, update_interval: float = PERSISTENCE_UPDATE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=True, user_data=True, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.dispatch = dispatch
+        # Set once the application is built, to unload evicted entries from it
+        self.application: Application = None
+        self.entries: Dict[str, OrderedDict] = {kind: OrderedDict() for kind in self.KINDS}
+        # (kind, key) -> serialized data, or None to delete
+        self.pending: Dict[tuple, Optional[str]] = {}
+        self.write_task = None
+        self.purged_at = time.monotonic()
+        self.metrics = {'loads': 0, 'writes': 0, 'batches': 0, 'skipped': 0, 'evicted': 0, 'purged': 0}
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict):
+        await self.refresh('user', user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict):
+        await self.refresh('chat', chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict):
+        pass
+
+    async def update_user_data(self, user_id: int, data: dict):
+        self.stage('user', user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict):
+        self.stage('chat', chat_id, data)
+
+    async def update_bot_data(self, data: dict):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def update_conversation(self, name: str, key, new_state):
+        pass
+
+    async def drop_user_data(self, user_id: int):
+        self.drop('user', user_id)
+
+    async def drop_chat_data(self, chat_id: int):
+        self.drop('chat', chat_id)
+
+    async def refresh(self, kind: str, key: int, data: dict):
+        '''
+        Load data on first use. Entries that are clean and older than PERSISTENCE_RELOAD_AFTER
+        are re-read, since another worker may have handled this chat in the meantime.
+        '''
+        entries = self.entries[kind]
+        entry = entries.get(key)
+        now = time.monotonic()
+        if entry is None or (not entry.dirty and now - entry.checked_at >= PERSISTENCE_RELOAD_AFTER):
+            stored = await self.dispatch.run_db(self.store.load, kind, key)
+            self.metrics['loads'] += 1
+            if entry is None or stored != entry.stored:
+                data.clear()
+                if stored:
+                    data.update(json.loads(stored))
+            entry = entries.get(key) or _Entry(stored, now)
+            entry.stored = stored
+            entry.checked_at = now
+            entries[key] = entry
+
+        entry.dirty = True
+        entries.move_to_end(key)
+
+    def stage(self, kind: str, key: int, data: dict):
+        payload = json.dumps(data, separators=(',', ':'), ensure_ascii=False, default=str) if data else None
+        entry = self.entries[kind].get(key)
+        if entry is None:
+            entry = self.entries[kind][key] = _Entry(None, time.monotonic())
+        entry.dirty = False
+        if payload == entry.stored:
+            self.metrics['skipped'] += 1
+            if len(self.entries[kind]) > PERSISTENCE_MAX_ENTRIES:
+                # Nothing to write, but the write task also runs eviction
+                self.schedule_write()
+            return
+
+        entry.stored = payload
+        entry.checked_at = time.monotonic()
+        self.pending[(kind, key)] = payload
+        self.schedule_write()
+
+    def drop(self, kind: str, key: int):
+        self.entries[kind].pop(key, None)
+        self.pending[(kind, key)] = None
+        self.schedule_write()
+
+    def schedule_write(self):
+        # PTB stages every changed entry in one gather, so a single task picks them all up
+        if self.write_task is None:
+            self.write_task = asyncio.get_running_loop().create_task(self.write_pending())
+
+    async def write_pending(self):
+        try:
+            await asyncio.sleep(0)
+            while self.pending:
+                pending, self.pending = self.pending, {}
+                try:
+                    await self.dispatch.run_db(self.write, pending)
+                except Exception as e:
+                    print(f"Error writing persistence data: {e}")
+                    # Keep newer values staged since the failed batch was taken
+                    self.pending = {**pending, **self.pending}
+                    return
+
+            if time.monotonic() - self.purged_at >= PERSISTENCE_PURGE_INTERVAL:
+                self.purged_at = time.monotonic()
+                self.metrics['purged'] += await self.dispatch.run_db(self.store.purge)
+            self.evict()
+        finally:
+            self.write_task = None
+
+    def write(self, pending: Dict[tuple, Optional[str]]):
+        expires_at = time.time() + PERSISTENCE_STATE_TTL
+        rows = [(kind, key, payload, expires_at) for (kind, key), payload in pending.items() if payload is not None]
+        if rows:
+            self.store.save(rows)
+        for kind in self.KINDS:
+            deleted = [key for (row_kind, key), payload in pending.items() if row_kind == kind and payload is None]
+            if deleted:
+                self.store.delete(kind, deleted)
+        self.metrics['writes'] += len(pending)
+        self.metrics['batches'] += 1
+
+    def evict(self):
+        '''Unload the least recently used clean entries beyond PERSISTENCE_MAX_ENTRIES'''
+        if self.application is None:
+            return
+        # PTB has no public way to unload data without deleting it from persistence
+        loaded = {'user': self.application._user_data, 'chat': self.application._chat_data}
+        for kind, entries in self.entries.items():
+            excess = len(entries) - PERSISTENCE_MAX_ENTRIES
+            if excess <= 0:
+                continue
+            evicted = []
+            for key, entry in entries.items():
+                if len(evicted) == excess:
+                    break
+                if not entry.dirty and (kind, key) not in self.pending:
+                    evicted.append(key)
+            for key in evicted:
+                del entries[key]
+                loaded[kind].pop(key, None)
+            self.metrics['evicted'] += len(evicted)
+
+    async def flush(self):
+        '''Write everything still staged, e.g. on shutdown'''
+        if self.write_task is not None:
+            await self.write_task
+        if self.pending:
+            pending, self.pending = self.pending, {}
+            await self.dispatch.run_db(self.write, pending)
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            'pending': len(self.pending),
+            **{f'{kind}_entries': len(entries) for kind, entries in self.entries.items()},
+        }
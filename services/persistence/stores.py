@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from services.database.db_service import DatabaseService
+
+# (kind, key, data, expires_at) as written by StorePersistence
+Row = Tuple[str, int, str, float]
+
+class MemoryStore:
+    '''In-process store for tests and local runs; state is lost on restart'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows: Dict[Tuple[str, int], Tuple[str, float]] = {}
+
+    def load(self, kind: str, key: int) -> Optional[str]:
+        with self._lock:
+            row = self._rows.get((kind, key))
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def save(self, rows: List[Row]):
+        with self._lock:
+            for kind, key, data, expires_at in rows:
+                self._rows[(kind, key)] = (data, expires_at)
+
+    def delete(self, kind: str, keys: Iterable[int]):
+        with self._lock:
+            for key in keys:
+                self._rows.pop((kind, key), None)
+
+    def purge(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._rows.items() if expires_at <= now]
+            for key in expired:
+                del self._rows[key]
+        return len(expired)
+
+    def close(self):
+        pass
+
+class SQLiteStore:
+    '''Single-host store in a local SQLite file'''
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('''
+CREATE TABLE IF NOT EXISTS persistence_data (
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (kind, id)
+)
+        ''')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS persistence_data_expires_at ON persistence_data (expires_at)')
+
+    def load(self, kind: str, key: int) -> Optional[str]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT data FROM persistence_data WHERE kind = ? AND id = ? AND expires_at > ?',
+                (kind, key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def save(self, rows: List[Row]):
+        with self._lock:
+            self._connection.execute('BEGIN')
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO persistence_data (kind, id, data, expires_at) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self._connection.execute('COMMIT')
+
+    def delete(self, kind: str, keys: Iterable[int]):
+        with self._lock:
+            self._connection.executemany(
+                'DELETE FROM persistence_data WHERE kind = ? AND id = ?',
+                [(kind, key) for key in keys]
+            )
+
+    def purge(self) -> int:
+        with self._lock:
+            return self._connection.execute(
+                'DELETE FROM persistence_data WHERE expires_at <= ?', (time.time(),)
+            ).rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+class MySQLStore:
+    '''Store shared by all replicas, in the persistence_data table'''
+
+    def __init__(self, db_service: DatabaseService):
+        self.db_service = db_service
+
+    def load(self, kind: str, key: int) -> Optional[str]:
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+SELECT data FROM persistence_data
+WHERE kind = %s AND id = %s AND expires_at > %s
+            '''
+            cursor.execute(sql, (kind, key, time.time()))
+            row = cursor.fetchone()
+            return row['data'] if row else None
+
+    def save(self, rows: List[Row]):
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+INSERT INTO persistence_data (kind, id, data, expires_at)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE data = VALUES(data), expires_at = VALUES(expires_at)
+            '''
+            cursor.executemany(sql, rows)
+
+    def delete(self, kind: str, keys: Iterable[int]):
+        keys = list(keys)
+        if not keys:
+            return
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(keys))
+            cursor.execute(
+                f'DELETE FROM persistence_data WHERE kind = %s AND id IN ({placeholders})',
+                (kind, *keys)
+            )
+
+    def purge(self) -> int:
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            return cursor.execute('DELETE FROM persistence_data WHERE expires_at <= %s', (time.time(),))
+
+    def close(self):
+        pass
+
+def build_store(backend: str, db_service: DatabaseService, sqlite_path: str):
+    '''Store for the configured PERSISTENCE_BACKEND: mysql, sqlite or memory'''
+    if backend == 'mysql':
+        return MySQLStore(db_service)
+    if backend == 'sqlite':
+        return SQLiteStore(sqlite_path)
+    if backend == 'memory':
+        return MemoryStore()
+    raise ValueError(f'Unknown persistence backend: {backend}')
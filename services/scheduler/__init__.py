@@ -0,0 +1,3 @@
+from services.scheduler.prewarm_service import PrewarmService
+
+__all__ = ['PrewarmService']
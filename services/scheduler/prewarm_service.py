@@ -0,0 +1,191 @@
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from utils.market_hours import is_market_open
+from services.database.db_service import DatabaseService
+from services.data.yahoo_service import YahooFinanceService
+from services.data.models import StockData
+from services.llm.replicate_service import ReplicateService
+from services.llm.news_digest import NewsDigest
+from services.dispatch.dispatch_service import DispatchService
+from config.config import (
+    PREWARM_INTERVAL,
+    PREWARM_TOP_TICKERS,
+    PREWARM_LOOKBACK_HOURS,
+    PREWARM_RANK_INTERVAL,
+    PREWARM_ANALYSES,
+    PREWARM_ANALYSIS_INTERVAL,
+    PREWARM_CONCURRENCY,
+    PREWARM_MAX_PREDICTIONS_PER_DAY,
+    STOCK_QUOTE_TTL,
+    ANALYSIS_CACHE_TTL,
+    NEWS_DIGEST_INTERVAL,
+)
+
+class PrewarmService:
+    '''
+    Background job that keeps the most requested tickers warm. During market hours
+    it refreshes their market data and, if enabled, pre-generates their analyses.
+    It also rebuilds the shared news digest on a fixed cadence.
+    '''
+
+    def __init__(
+        self,
+        db_service: DatabaseService,
+        yahoo_service: YahooFinanceService,
+        replicate_service: ReplicateService,
+        news_digest: NewsDigest,
+        dispatch: DispatchService,
+    ):
+        self.db_service = db_service
+        self.yahoo_service = yahoo_service
+        self.replicate_service = replicate_service
+        self.news_digest = news_digest
+        self.dispatch = dispatch
+        self.semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        self.task = None
+        self.top_tickers = []
+        self.ranked_at = float('-inf')
+        self.news_built_at = float('-inf')
+        # ticker -> monotonic time its market data / analysis was last warmed
+        self.warm_data = {}
+        self.warm_analyses = {}
+        self.metrics = {
+            'cycles': 0,
+            'tickers_refreshed': 0,
+            'analyses_generated': 0,
+            'news_digests': 0,
+            'predictions_charged': 0,
+            'budget_exhausted': 0,
+            'errors': 0,
+            'requests': 0,
+            'served_warm_data': 0,
+            'served_warm_analysis': 0,
+        }
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+    async def run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics['errors'] += 1
+                print(f"Prewarm cycle failed: {e}")
+            await asyncio.sleep(PREWARM_INTERVAL)
+
+    async def run_once(self):
+        self.metrics['cycles'] += 1
+        now = time.monotonic()
+
+        if now - self.news_built_at >= NEWS_DIGEST_INTERVAL:
+            self.news_built_at = now
+            await self.refresh_news()
+
+        if now - self.ranked_at >= PREWARM_RANK_INTERVAL:
+            self.ranked_at = now
+            since = datetime.now() - timedelta(hours=PREWARM_LOOKBACK_HOURS)
+            self.top_tickers = await self.dispatch.run_db(self.db_service.get_top_tickers, since, PREWARM_TOP_TICKERS)
+
+        tickers = [ticker for ticker in self.top_tickers if is_market_open(ticker)]
+        if tickers:
+            await self.refresh_tickers(tickers)
+
+    async def refresh_news(self):
+        async def refresh(on_build):
+            async with self.semaphore:
+                return await self.news_digest.refresh(on_build)
+
+        result = await self.charged(refresh)
+        if result is not None:
+            summary, prediction_id, cache_hit = result
+            if prediction_id != 'error_id' and not cache_hit:
+                self.metrics['news_digests'] += 1
+
+    async def refresh_tickers(self, tickers: List[str]):
+        batch_data = await self.dispatch.run_market_data(self.yahoo_service.refresh_batch_stock_data, tickers)
+        warmed_at = time.monotonic()
+        stocks_data = [stock_data for stock_data in batch_data.values() if not stock_data.error]
+        for stock_data in stocks_data:
+            self.warm_data[stock_data.ticker] = warmed_at
+        self.metrics['tickers_refreshed'] += len(stocks_data)
+
+        if PREWARM_ANALYSES:
+            due = [
+                stock_data for stock_data in stocks_data
+                if warmed_at - self.warm_analyses.get(stock_data.ticker, float('-inf')) >= PREWARM_ANALYSIS_INTERVAL
+            ]
+            await asyncio.gather(*(self.pregenerate(stock_data) for stock_data in due))
+
+    async def pregenerate(self, stock_data: StockData):
+        async def generate(on_generate):
+            async with self.semaphore:
+                return await self.replicate_service.get_financial_insight(stock_data, on_generate=on_generate)
+
+        result = await self.charged(generate)
+        if result is None:
+            return
+        insights, prediction_id, cache_hit = result
+        if prediction_id != 'error_id':
+            self.warm_analyses[stock_data.ticker] = time.monotonic()
+            if not cache_hit:
+                self.metrics['analyses_generated'] += 1
+
+    async def charged(self, produce: Callable[[Callable[[], None]], Awaitable]) -> Optional[tuple]:
+        '''
+        Reserve a prediction from the daily budget, which MySQL keeps for all workers, and run
+        produce(on_generate). The reservation is given back unless produce calls on_generate(),
+        i.e. unless a new prediction actually ran. Returns None if the budget is used up.
+        '''
+        day = datetime.now().date()
+        if not await self.dispatch.run_db(self.db_service.take_prewarm_budget, day, PREWARM_MAX_PREDICTIONS_PER_DAY):
+            self.metrics['budget_exhausted'] += 1
+            return None
+
+        generated = False
+
+        def on_generate():
+            nonlocal generated
+            generated = True
+            self.metrics['predictions_charged'] += 1
+
+        try:
+            return await produce(on_generate)
+        finally:
+            if not generated:
+                try:
+                    await self.dispatch.run_db(self.db_service.return_prewarm_budget, day)
+                except Exception as e:
+                    print(f"Error returning prewarm budget: {e}")
+
+    def record_request(self, ticker: str, cache_hit: bool):
+        '''Count a user analysis and whether the prewarm job had already warmed it'''
+        now = time.monotonic()
+        self.metrics['requests'] += 1
+        if now - self.warm_data.get(ticker, float('-inf')) < STOCK_QUOTE_TTL:
+            self.metrics['served_warm_data'] += 1
+        if cache_hit and now - self.warm_analyses.get(ticker, float('-inf')) < ANALYSIS_CACHE_TTL:
+            self.metrics['served_warm_analysis'] += 1
+
+    def stats(self) -> Dict:
+        requests = self.metrics['requests']
+        return {
+            **self.metrics,
+            'warm_data_rate': self.metrics['served_warm_data'] / requests if requests else 0.0,
+            'warm_analysis_rate': self.metrics['served_warm_analysis'] / requests if requests else 0.0,
+        }
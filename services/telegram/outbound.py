@@ -0,0 +1,242 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from telegram import Chat, Message
+from telegram.error import BadRequest, RetryAfter
+from services.metrics.metrics import record
+from utils.telegram_html import MAX_MESSAGE_LENGTH, split_html, split_text
+from config.config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_GLOBAL_BURST,
+    TELEGRAM_CHAT_RATE,
+    TELEGRAM_CHAT_BURST,
+    TELEGRAM_GROUP_RATE,
+    TELEGRAM_MAX_RETRIES,
+)
+
+class TokenBucket:
+    '''
+    `rate` tokens a second, holding at most `capacity`. Callers take a token in arrival order
+    and are told how long to wait for it, so a burst is spread out rather than rejected.
+    '''
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        # Time the token count applies at; in the future while the bucket is paused
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def reserve(self) -> float:
+        '''Take a token and return the seconds until it may be used'''
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        return self.updated - now + max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self):
+        delay = self.reserve()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            # A pause that started while this caller slept holds it back as well
+            delay = self.paused_until - time.monotonic()
+
+    def pause(self, seconds: float):
+        '''Hand out no tokens for `seconds`, then one at once and the rest at the usual rate'''
+        now = time.monotonic()
+        until = now + seconds
+        if until <= self.updated:
+            return
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        # One call may go as soon as the pause ends; a backlog of waiting callers is kept
+        self.tokens = min(self.tokens, 0.0) + 1
+        self.updated = until
+        self.paused_until = max(self.paused_until, until)
+
+    def idle(self) -> bool:
+        '''Full and not paused, so dropping it loses nothing'''
+        now = time.monotonic()
+        return now >= self.updated and self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class _PendingEdit:
+    __slots__ = ('kwargs', 'future')
+
+    def __init__(self, kwargs: Dict):
+        self.kwargs = kwargs
+        self.future = asyncio.get_running_loop().create_future()
+
+class OutboundSender:
+    '''
+    Sends, edits and deletes the bot's messages within Telegram's flood limits.
+    Every call takes a token from its chat's bucket, then from the global bucket, waiting
+    in line while either is empty. A 429 response pauses the chat's bucket for the
+    retry_after it names and the call is retried, up to `max_retries` times.
+    Texts over the message length limit are split into several messages, HTML at tag
+    boundaries. An edit of a message whose previous edit is still waiting for a token
+    replaces that edit's text, so only the newest text is sent.
+    '''
+
+    # Chat buckets kept before idle ones are dropped
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(
+        self,
+        global_rate: float = TELEGRAM_GLOBAL_RATE,
+        global_burst: int = TELEGRAM_GLOBAL_BURST,
+        chat_rate: float = TELEGRAM_CHAT_RATE,
+        chat_burst: int = TELEGRAM_CHAT_BURST,
+        group_rate: float = TELEGRAM_GROUP_RATE,
+        max_retries: int = TELEGRAM_MAX_RETRIES,
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_burst) if global_rate > 0 else None
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.pending_edits: Dict[tuple, _PendingEdit] = {}
+        self.metrics = {
+            'sent': 0, 'edited': 0, 'deleted': 0, 'split': 0, 'coalesced': 0,
+            'retry_after': 0, 'not_modified': 0, 'failed': 0,
+        }
+
+    def chat_bucket(self, chat: Chat) -> Optional[TokenBucket]:
+        bucket = self.chat_buckets.get(chat.id)
+        if bucket is None:
+            rate = self.group_rate if chat.type in (Chat.GROUP, Chat.SUPERGROUP) else self.chat_rate
+            if rate <= 0:
+                return None
+            if len(self.chat_buckets) >= self.MAX_CHAT_BUCKETS:
+                self.chat_buckets = {chat_id: kept for chat_id, kept in self.chat_buckets.items() if not kept.idle()}
+            bucket = self.chat_buckets[chat.id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    async def acquire(self, chat: Chat):
+        '''Wait for a token from the chat's bucket and then from the global one'''
+        started = time.perf_counter()
+        bucket = self.chat_bucket(chat)
+        if bucket is not None:
+            await bucket.acquire()
+        if self.global_bucket is not None:
+            await self.global_bucket.acquire()
+        record('telegram.wait', time.perf_counter() - started, started)
+
+    async def call(self, chat: Chat, request: Callable[[], Awaitable], retry: bool = True):
+        '''
+        Run request() once tokens are available. On a 429 the chat is paused for retry_after
+        and the request retried; with retry=False the RetryAfter is raised after the pause is set.
+        '''
+        attempt = 0
+        while True:
+            await self.acquire(chat)
+            try:
+                return await request()
+            except RetryAfter as e:
+                self.metrics['retry_after'] += 1
+                bucket = self.chat_bucket(chat)
+                if bucket is not None:
+                    bucket.pause(e.retry_after)
+                if not retry or attempt >= self.max_retries:
+                    self.metrics['failed'] += 1
+                    raise
+                attempt += 1
+                if bucket is None:
+                    await asyncio.sleep(e.retry_after)
+
+    def split(self, text: str, parse_mode: Optional[str]) -> List[str]:
+        if len(text) <= MAX_MESSAGE_LENGTH:
+            return [text]
+        self.metrics['split'] += 1
+        parts = split_html(text) if parse_mode == 'HTML' else split_text(text)
+        return parts or [text[:MAX_MESSAGE_LENGTH]]
+
+    async def send(self, message: Message, text: str, parse_mode: Optional[str] = None, reply_markup=None) -> Message:
+        '''Reply in message's chat, as several messages if text is too long; the markup goes on the last'''
+        return await self.send_parts(message, self.split(text, parse_mode), parse_mode, reply_markup)
+
+    async def send_parts(self, message: Message, parts: List[str], parse_mode: Optional[str], reply_markup) -> Message:
+        sent = None
+        for i, part in enumerate(parts):
+            markup = reply_markup if i == len(parts) - 1 else None
+            sent = await self.call(
+                message.chat,
+                lambda part=part, markup=markup: message.reply_text(text=part, parse_mode=parse_mode, reply_markup=markup),
+            )
+            self.metrics['sent'] += 1
+        return sent
+
+    async def edit(
+        self,
+        message: Message,
+        text: str,
+        parse_mode: Optional[str] = None,
+        reply_markup=None,
+        retry: bool = True,
+    ) -> Optional[Message]:
+        '''
+        Edit message's text. Text over the length limit goes into the message up to the first
+        break and the rest is sent as new messages, with the markup on the last.
+        '''
+        parts = self.split(text, parse_mode)
+        if len(parts) > 1:
+            await self.edit(message, parts[0], parse_mode, retry=retry)
+            return await self.send_parts(message, parts[1:], parse_mode, reply_markup)
+
+        key = (message.chat_id, message.message_id)
+        kwargs = {'text': parts[0], 'parse_mode': parse_mode, 'reply_markup': reply_markup}
+        pending = self.pending_edits.get(key)
+        if pending is not None:
+            # The earlier edit has not been sent yet; it sends this text instead
+            pending.kwargs = kwargs
+            self.metrics['coalesced'] += 1
+            return await asyncio.shield(pending.future)
+
+        pending = self.pending_edits[key] = _PendingEdit(kwargs)
+
+        def request():
+            # Edits arriving from here on wait for a token of their own
+            if self.pending_edits.get(key) is pending:
+                del self.pending_edits[key]
+            return message.edit_text(**pending.kwargs)
+
+        try:
+            result = await self.call(message.chat, request, retry=retry)
+            self.metrics['edited'] += 1
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                self.fail(key, pending, e)
+                raise
+            # Same text and markup as the message already has
+            self.metrics['not_modified'] += 1
+            result = message
+        except BaseException as e:
+            self.fail(key, pending, e)
+            raise
+        pending.future.set_result(result)
+        return result
+
+    def fail(self, key: tuple, pending: _PendingEdit, error: BaseException):
+        if self.pending_edits.get(key) is pending:
+            del self.pending_edits[key]
+        if isinstance(error, asyncio.CancelledError):
+            pending.future.cancel()
+        else:
+            pending.future.set_exception(error)
+            # Retrieved by coalesced callers if there are any
+            pending.future.exception()
+
+    async def delete(self, message: Message) -> bool:
+        result = await self.call(message.chat, message.delete)
+        self.metrics['deleted'] += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            **self.metrics,
+            'chat_buckets': len(self.chat_buckets),
+            'pending_edits': len(self.pending_edits),
+        }
@@ -0,0 +1,69 @@
+import time
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter
+from services.telegram.outbound import OutboundSender
+from utils.telegram_html import truncate_html
+from config.config import STREAM_EDIT_TOKENS, STREAM_EDIT_INTERVAL, STREAM_EDIT_MIN_INTERVAL
+
+class StreamingReply:
+    '''
+    Progressively edit a placeholder message while LLM tokens stream in.
+    An edit is sent every `edit_tokens` tokens or `edit_interval` seconds, but never
+    more often than `min_interval` seconds to stay inside Telegram's edit limits.
+    Edits go through the outbound sender but are not retried: a flood-limited edit is
+    skipped and the next one carries the newer text anyway.
+    '''
+
+    def __init__(
+        self,
+        outbound: OutboundSender,
+        message: Message,
+        render,
+        edit_tokens: int = STREAM_EDIT_TOKENS,
+        edit_interval: float = STREAM_EDIT_INTERVAL,
+        min_interval: float = STREAM_EDIT_MIN_INTERVAL,
+    ):
+        self.outbound = outbound
+        self.message = message
+        self.render = render
+        self.edit_tokens = edit_tokens
+        self.edit_interval = edit_interval
+        self.min_interval = min_interval
+        self.buffer = []
+        self.pending_tokens = 0
+        self.last_edit = time.monotonic()
+        self.next_allowed = self.last_edit
+        self.last_text = None
+
+    async def on_token(self, token: str):
+        self.buffer.append(token)
+        self.pending_tokens += 1
+
+        now = time.monotonic()
+        if now < self.next_allowed:
+            return
+        if self.pending_tokens >= self.edit_tokens or now - self.last_edit >= self.edit_interval:
+            await self._edit(self.render(''.join(self.buffer)))
+
+    async def _edit(self, text: str):
+        # Only the first message's worth is shown while streaming; finish() sends the rest
+        text = truncate_html(text)
+        now = time.monotonic()
+        self.pending_tokens = 0
+        self.last_edit = now
+        self.next_allowed = now + self.min_interval
+
+        if not text.strip() or text == self.last_text:
+            return
+        try:
+            await self.outbound.edit(self.message, text, parse_mode='HTML', retry=False)
+            self.last_text = text
+        except RetryAfter as e:
+            self.next_allowed = time.monotonic() + e.retry_after
+        except BadRequest as e:
+            # A partial buffer can still be rejected by the HTML parser; the next edit will retry
+            print(f'Skipping streaming edit: {e}')
+
+    async def finish(self, text: str, reply_markup=None) -> Message:
+        '''Replace the placeholder with the final text; text over the length limit continues in new messages'''
+        return await self.outbound.edit(self.message, text, parse_mode='HTML', reply_markup=reply_markup)
@@ -1,25 +1,140 @@
-from typing import Dict
+import asyncio
+from functools import cached_property
+from typing import Dict, List
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand, MenuButtonCommands
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler, ContextTypes, filters
 from utils.validation import Validation
 from services.database.db_service import DatabaseService
-from services.data.yahoo_service import YahooFinanceService
-from services.llm.replicate_service import ReplicateService
-from services.data.news_service import NewsService
+from services.updates.update_queue import UpdateQueue
+from services.updates.webhook_app import WebhookApp
+from services.updates.update_worker import UpdateWorker
+from services.persistence.stores import build_store
+from services.persistence.store_persistence import StorePersistence
+from services.jobs.job_queue import JobQueue, JobRejected, JobTimeout, JobFailed
+from services.dispatch.dispatch_service import DispatchService
+from services.telegram.outbound import OutboundSender
+from services.telegram.streaming_reply import StreamingReply
+from services.metrics.metrics import span, annotate, set_outcome, traced
+from config.config import (
+    TELEGRAM_API_BASE,
+    CONCURRENT_UPDATES,
+    STREAM_ANALYSIS,
+    MAX_BATCH_TICKERS,
+    MAX_WATCHLIST_SIZE,
+    PREWARM_ENABLED,
+    BOT_MODE,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    PERSISTENCE_BACKEND,
+    PERSISTENCE_SQLITE_PATH,
+)
 
 class TelegramService:
-    def __init__(self, token: str, db_service: DatabaseService):
-        self.application = Application.builder().token(token).build()
-        self.yahoo_service = YahooFinanceService()
-        self.replicate_service = ReplicateService()
-        self.validation = Validation()
+    def __init__(self, token: str, db_service: DatabaseService, dispatch_service: DispatchService = None):
         self.db_service = db_service
-        self.news_service = NewsService()
+        self.dispatch = dispatch_service or DispatchService()
+        # user_data (awaiting_ticker) survives restarts and is shared by all workers
+        self.persistence = StorePersistence(
+            build_store(PERSISTENCE_BACKEND, db_service, PERSISTENCE_SQLITE_PATH),
+            self.dispatch,
+        )
+        self.application = (
+            Application.builder()
+            .token(token)
+            .base_url(TELEGRAM_API_BASE)
+            .concurrent_updates(CONCURRENT_UPDATES)
+            .persistence(self.persistence)
+            .post_init(self.post_init)
+            .post_shutdown(self.post_shutdown)
+            .build()
+        )
+        self.persistence.application = self.application
+        self.validation = Validation()
+        # Every message the bot sends, edits or deletes goes through here for flood control
+        self.outbound = OutboundSender()
+        self.job_queue = JobQueue()
+        self.prewarm_start = None
+
+    # Market data and LLM services pull in pandas, yfinance and newsapi, so they are
+    # built on first use rather than before the bot starts taking updates
+
+    @cached_property
+    def yahoo_service(self):
+        from services.data.yahoo_service import YahooFinanceService
+        return YahooFinanceService()
+
+    @cached_property
+    def replicate_service(self):
+        from services.llm.replicate_service import ReplicateService
+        return ReplicateService()
+
+    @cached_property
+    def news_service(self):
+        from services.data.news_service import NewsService
+        return NewsService()
+
+    @cached_property
+    def news_digest(self):
+        from services.llm.news_digest import NewsDigest
+        return NewsDigest(self.news_service, self.replicate_service, self.dispatch)
+
+    @cached_property
+    def prewarm_service(self):
+        from services.scheduler.prewarm_service import PrewarmService
+        return PrewarmService(
+            self.db_service,
+            self.yahoo_service,
+            self.replicate_service,
+            self.news_digest,
+            self.dispatch,
+        )
+
+    def built(self, name: str) -> bool:
+        '''Whether a lazily built service has been created yet'''
+        return name in self.__dict__
+
+    async def post_init(self, application: Application):
+        if PREWARM_ENABLED:
+            # Don't hold up the first update while the market data stack is imported
+            self.prewarm_start = asyncio.create_task(self.start_prewarm())
+
+    async def start_prewarm(self):
+        prewarm_service = await self.dispatch.run_market_data(lambda: self.prewarm_service)
+        prewarm_service.start()
+
+    async def post_shutdown(self, application: Application):
+        if self.prewarm_start is not None:
+            self.prewarm_start.cancel()
+        if self.built('prewarm_service'):
+            await self.prewarm_service.stop()
+        if self.built('replicate_service'):
+            await self.replicate_service.client.aclose()
+
+    def stats(self) -> Dict:
+        '''Operational metrics of the services behind the bot'''
+        stats = {
+            'job_queue': self.job_queue.stats(),
+            'telegram_outbound': self.outbound.stats(),
+            'persistence': self.persistence.stats(),
+            'db_pool': self.db_service.pool_stats(),
+            'user_cache': self.db_service.cache_stats(),
+        }
+        if self.built('prewarm_service'):
+            stats['prewarm'] = self.prewarm_service.stats()
+        if self.built('replicate_service'):
+            stats['analysis_cache'] = self.replicate_service.analysis_cache.stats()
+            stats['model_router'] = self.replicate_service.router.stats()
+            stats['prompt_tokens'] = self.replicate_service.prompt_stats()
+        return stats
 
     async def setup_chat_menu(self):        
         commands = [
             BotCommand('analyze', '分析股票'),
+            BotCommand('watchlist', '我的關注列表'),
             BotCommand('credits', '查看剩餘點數'),
             BotCommand('news', '環球新聞分析'),
         ]
@@ -29,7 +144,8 @@ class TelegramService:
 
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         user = update.effective_user
-        self.db_service.get_or_create_user(
+        await self.dispatch.run_db(
+            self.db_service.get_or_create_user,
             telegram_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -40,8 +156,45 @@ class TelegramService:
         await self.render_home_page(update.message)
 
     async def analyze_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        # /analyze NVDA AAPL 0700 analyzes the given tickers directly
+        if context.args:
+            db_user = await self.get_db_user(update.effective_user)
+            await self.process_tickers(update, context, ' '.join(context.args), db_user)
+            return
+
         await self.analyze_stock(update, context)
 
+    async def watchlist_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        await self.render_watchlist(update)
+
+    async def watch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        '''Add tickers to the watchlist, e.g. /watch NVDA 0700'''
+        tickers, error_message = self.validation.parse_tickers(' '.join(context.args))
+        if error_message:
+            await self.outbound.send(update.message, text=f'{error_message}。用法：/watch NVDA 0700')
+            return
+
+        db_user = await self.get_db_user(update.effective_user)
+        watchlist = await self.dispatch.run_db(self.db_service.get_watchlist, db_user['id'])
+        new_tickers = [ticker for ticker in tickers if ticker not in watchlist]
+        if len(watchlist) + len(new_tickers) > MAX_WATCHLIST_SIZE:
+            await self.outbound.send(update.message, text=f'關注列表最多只可加入 {MAX_WATCHLIST_SIZE} 隻股票。')
+            return
+
+        await self.dispatch.run_db(self.db_service.add_to_watchlist, db_user['id'], new_tickers)
+        await self.render_watchlist(update)
+
+    async def unwatch_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        '''Remove tickers from the watchlist, e.g. /unwatch NVDA'''
+        tickers, error_message = self.validation.parse_tickers(' '.join(context.args))
+        if error_message:
+            await self.outbound.send(update.message, text=f'{error_message}。用法：/unwatch NVDA')
+            return
+
+        db_user = await self.get_db_user(update.effective_user)
+        await self.dispatch.run_db(self.db_service.remove_from_watchlist, db_user['id'], tickers)
+        await self.render_watchlist(update)
+
     async def credits_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.check_credits(update)
 
@@ -66,7 +219,8 @@ class TelegramService:
                 '<a href="https://github.com/fuzionix/momentum">GitHub</a>'
             )
             
-            await query.message.reply_text(
+            await self.outbound.send(
+                query.message,
                 text=about_text,
                 parse_mode='HTML',
             )
@@ -74,6 +228,9 @@ class TelegramService:
         elif query.data == 'analyze_stock':
             await self.analyze_stock(update, context)
 
+        elif query.data == 'analyze_watchlist':
+            await self.analyze_watchlist(update, context)
+
         elif query.data == "check_credits":
             await self.check_credits(update)
 
@@ -95,24 +252,108 @@ class TelegramService:
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        await message.reply_text(
+        await self.outbound.send(
+            message,
             text='Momentum 提供由 AI 推理模型驅動的全面財務分析。',
             reply_markup=reply_markup
         )
 
+    async def get_db_user(self, user) -> Dict:
+        return await self.dispatch.run_db(
+            self.db_service.get_or_create_user,
+            telegram_id=user.id,
+            username=user.username,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            language=user.language_code
+        )
+
+    async def render_watchlist(self, update: Update):
+        message = update.message
+        if message is None and update.callback_query:
+            message = update.callback_query.message
+
+        db_user = await self.get_db_user(update.effective_user)
+        watchlist = await self.dispatch.run_db(self.db_service.get_watchlist, db_user['id'])
+        if not watchlist:
+            await self.outbound.send(
+                message,
+                text='您的關注列表是空的。\n\n使用 /watch NVDA 0700 加入股票。',
+            )
+            return
+
+        keyboard = [
+            [InlineKeyboardButton('分析關注列表', callback_data='analyze_watchlist')],
+            [InlineKeyboardButton('返回首頁', callback_data='go_home')],
+        ]
+        await self.outbound.send(
+            message,
+            text=(
+                f'<b>您的關注列表（{len(watchlist)}）</b>\n\n'
+                + '\n'.join(f'．{ticker}' for ticker in watchlist)
+                + '\n\n使用 /watch 加入或 /unwatch 移除股票。'
+            ),
+            parse_mode='HTML',
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+
+    async def analyze_watchlist(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        '''Analyze every ticker on the watchlist as one batch'''
+        db_user = await self.get_db_user(update.effective_user)
+        watchlist = await self.dispatch.run_db(self.db_service.get_watchlist, db_user['id'])
+        if not watchlist:
+            await self.render_watchlist(update)
+            return
+
+        await self.process_batch(update, context, watchlist[:MAX_BATCH_TICKERS], db_user)
+
     async def render_out_of_credits(self, message, telegram_id):
-        credit_info = self.db_service.get_credits_info(telegram_id)
+        credit_info = await self.dispatch.run_db(self.db_service.get_credits_info, telegram_id)
         next_reset = credit_info['next_reset']
 
         time_until_reset = next_reset - datetime.now()
         hours = int(time_until_reset.total_seconds() // 3600)
         minutes = int((time_until_reset.total_seconds() % 3600) // 60)
 
-        await message.reply_text(
+        await self.outbound.send(
+            message,
             text=f"⚠️ 您的點數已用完！ \n\n點數將在大約 {hours}小時 {minutes}分鐘後更新。",
             parse_mode="HTML",
         )
             
+    async def render_job_in_progress(self, message):
+        await self.outbound.send(
+            message,
+            text='⏳ 您已有一個請求正在處理中，請等待完成後再試。',
+        )
+
+    async def run_llm_job(self, telegram_id: int, loading_message, loading_text: str, run):
+        '''
+        Run an LLM call through the job queue, showing the queue position on loading_message.
+        Returns the result, or None if the job was rejected, timed out or failed; the credit is refunded then.
+        '''
+        async def on_position(position: int):
+            if position == 0:
+                await self.outbound.edit(loading_message, text=loading_text)
+            else:
+                await self.outbound.edit(loading_message, text=f'⏳ 目前使用人數眾多，您排在第 {position} 位，請稍候 ...')
+
+        try:
+            return await self.job_queue.submit(telegram_id, run, on_position)
+        except JobRejected:
+            set_outcome('rejected')
+            await self.dispatch.run_db(self.db_service.refund_credit, telegram_id)
+            await self.outbound.edit(loading_message, text='⏳ 您已有一個請求正在處理中，請等待完成後再試。')
+        except JobTimeout:
+            set_outcome('timeout')
+            await self.dispatch.run_db(self.db_service.refund_credit, telegram_id)
+            await self.outbound.edit(loading_message, text='⌛ 處理時間過長，請稍後再試。已退回 1 點點數。')
+        except JobFailed:
+            set_outcome('failed')
+            await self.dispatch.run_db(self.db_service.refund_credit, telegram_id)
+            await self.outbound.edit(loading_message, text='❌ 處理請求時出錯，請稍後再試。已退回 1 點點數。')
+        return None
+
     async def message_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         '''Handle messages based on previous context'''
         user = update.effective_user
@@ -124,25 +365,43 @@ class TelegramService:
                 'mode': 'idle'
             }
 
-            db_user = self.db_service.get_or_create_user(
-                telegram_id=user.id,
-                username=user.username,
-                first_name=user.first_name,
-                last_name=user.last_name,
-                language=user.language_code
+            db_user = await self.get_db_user(user)
+            await self.process_tickers(update, context, message_text, db_user)
+            return
+
+    async def process_tickers(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, db_user: Dict):
+        '''Analyze one ticker, or several as a batch when the text lists more than one'''
+        tickers, _ = self.validation.parse_tickers(text)
+        if len(tickers) <= 1:
+            # Invalid input is reported by process_ticker
+            await self.process_ticker(update, context, tickers[0] if tickers else text, db_user)
+            return
+
+        if len(tickers) > MAX_BATCH_TICKERS:
+            await self.outbound.send(
+                update.message,
+                text=f'每次最多只可分析 {MAX_BATCH_TICKERS} 隻股票。',
             )
-            await self.process_ticker(update, context, message_text, db_user)
+            context.user_data['awaiting_ticker'] = {
+                'mode': 'analyze_stock'
+            }
             return
+
+        await self.process_batch(update, context, tickers, db_user)
         
+    @traced('analyze')
     async def process_ticker(self, update: Update, context: ContextTypes.DEFAULT_TYPE, ticker_symbol: str, db_user: Dict):
         '''Process ticker symbol for different exchanges'''
         # Validate ticker symbol
-        is_valid, error_message = self.validation.validate_ticker(ticker_symbol)
+        with span('validate'):
+            is_valid, error_message = self.validation.validate_ticker(ticker_symbol)
         if not is_valid:
+            set_outcome('invalid')
             message = self.validation.format_telegram_message(
                 f'{error_message}。請使用有效的股票代碼重試。'
             )
-            await update.message.reply_text(
+            await self.outbound.send(
+                update.message,
                 text=message,
                 parse_mode='MarkdownV2'
             )
@@ -152,54 +411,180 @@ class TelegramService:
             }
             return
 
+        if self.job_queue.has_job(db_user['telegram_id']):
+            set_outcome('busy')
+            await self.render_job_in_progress(update.message)
+            return
+
         # Format ticker based on its characteristics
         formatted_ticker = self.validation.format_ticker(ticker_symbol)
+        annotate(ticker=formatted_ticker)
         
         message = self.validation.format_telegram_message(
             f'正在分析 {formatted_ticker} ...'
         )
-        loading_message = await update.message.reply_text(
-            text=message,
-            parse_mode='MarkdownV2'
-        )
+        with span('telegram.send'):
+            loading_message = await self.outbound.send(
+                update.message,
+                text=message,
+                parse_mode='MarkdownV2'
+            )
 
-        stock_data = self.yahoo_service.get_stock_data(formatted_ticker)
-        if 'error' in stock_data:
-            await loading_message.delete()
+        stock_data = await self.dispatch.run_market_data(self.yahoo_service.get_stock_data, formatted_ticker)
+        if stock_data.error:
+            set_outcome('data_error')
+            await self.outbound.delete(loading_message)
             error_msg = f"❌ 獲取股票數據時出錯。請使用有效的股票代碼重試。"
             context.user_data['awaiting_ticker'] = {
                 'mode': 'analyze_stock'
             }
-            await update.message.reply_text(
+            await self.outbound.send(
+                update.message,
                 text=error_msg,
             )
             return
         
-        success, credits_left = self.db_service.use_credit(db_user.get('telegram_id'))
+        success, credits_left = await self.dispatch.run_db(self.db_service.use_credit, db_user.get('telegram_id'))
         if not success:
+            set_outcome('no_credits')
             await self.render_out_of_credits(update.message, db_user.get('telegram_id'))
             return
         
-        insights, replicate_id = self.replicate_service.get_financial_insight(stock_data)
+        streaming_reply = None
+        if STREAM_ANALYSIS:
+            streaming_reply = StreamingReply(self.outbound, loading_message, self.replicate_service.format_partial_output)
+
+        async def run():
+            if streaming_reply:
+                return await self.replicate_service.get_financial_insight(stock_data, on_token=streaming_reply.on_token)
+            return await self.replicate_service.get_financial_insight(stock_data)
 
-        self.db_service.log_analysis(
+        result = await self.run_llm_job(db_user['telegram_id'], loading_message, f'正在分析 {formatted_ticker} ...', run)
+        if result is None:
+            return
+        insights, replicate_id, cache_hit = result
+        annotate(cache_hit=cache_hit)
+        if replicate_id == 'error_id':
+            set_outcome('llm_error')
+
+        await self.dispatch.run_db(
+            self.db_service.log_analysis,
             user_id=db_user['id'],
             ticker_symbol=formatted_ticker,
-            replicate_id=replicate_id
+            replicate_id=replicate_id,
+            cache_hit=cache_hit
         )
+        # Counted only once the prewarm job exists; it is not built just to count a request
+        if self.built('prewarm_service'):
+            self.prewarm_service.record_request(formatted_ticker, cache_hit)
+
+        keyboard = [
+            [InlineKeyboardButton('返回首頁', callback_data='go_home')],
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        with span('telegram.send'):
+            if streaming_reply:
+                await streaming_reply.finish(insights, reply_markup=reply_markup)
+                return
+
+            await self.outbound.delete(loading_message)
+
+            await self.outbound.send(
+                update.message,
+                text=insights,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
+
+    @traced('batch')
+    async def process_batch(self, update: Update, context: ContextTypes.DEFAULT_TYPE, tickers: List[str], db_user: Dict):
+        '''Analyze several tickers with one data fetch and one comparative prediction, for one credit'''
+        message = update.message
+        if message is None and update.callback_query:
+            message = update.callback_query.message
+
+        if self.job_queue.has_job(db_user['telegram_id']):
+            set_outcome('busy')
+            await self.render_job_in_progress(message)
+            return
+
+        annotate(tickers=tickers)
+        loading_text = f'正在分析 {", ".join(tickers)} ...'
+        with span('telegram.send'):
+            loading_message = await self.outbound.send(
+                message,
+                text=loading_text,
+            )
+
+        batch_data = await self.dispatch.run_market_data(self.yahoo_service.get_batch_stock_data, tickers)
+        stocks_data = [stock_data for stock_data in batch_data.values() if not stock_data.error]
+        failed = [ticker for ticker, stock_data in batch_data.items() if stock_data.error]
+        if not stocks_data:
+            set_outcome('data_error')
+            await self.outbound.delete(loading_message)
+            await self.outbound.send(
+                message,
+                text="❌ 獲取股票數據時出錯。請使用有效的股票代碼重試。",
+            )
+            return
+
+        success, credits_left = await self.dispatch.run_db(self.db_service.use_credit, db_user.get('telegram_id'))
+        if not success:
+            set_outcome('no_credits')
+            await self.outbound.delete(loading_message)
+            await self.render_out_of_credits(message, db_user.get('telegram_id'))
+            return
+
+        streaming_reply = None
+        if STREAM_ANALYSIS:
+            streaming_reply = StreamingReply(self.outbound, loading_message, self.replicate_service.format_partial_output)
+
+        async def run():
+            if streaming_reply:
+                return await self.replicate_service.get_batch_insight(stocks_data, on_token=streaming_reply.on_token)
+            return await self.replicate_service.get_batch_insight(stocks_data)
+
+        result = await self.run_llm_job(db_user['telegram_id'], loading_message, loading_text, run)
+        if result is None:
+            return
+        insights, replicate_id, cache_hit = result
+        annotate(cache_hit=cache_hit)
+        if replicate_id == 'error_id':
+            set_outcome('llm_error')
+
+        for stock_data in stocks_data:
+            await self.dispatch.run_db(
+                self.db_service.log_analysis,
+                user_id=db_user['id'],
+                ticker_symbol=stock_data.ticker,
+                replicate_id=replicate_id,
+                cache_hit=cache_hit
+            )
+            if self.built('prewarm_service'):
+                self.prewarm_service.record_request(stock_data.ticker, cache_hit)
 
-        await loading_message.delete()
+        if failed:
+            insights += f'\n\n⚠️ 無法獲取以下股票的數據：{", ".join(failed)}'
 
         keyboard = [
             [InlineKeyboardButton('返回首頁', callback_data='go_home')],
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await update.message.reply_text(
-            text=insights,
-            parse_mode='HTML',
-            reply_markup=reply_markup
-        )
+        with span('telegram.send'):
+            if streaming_reply:
+                await streaming_reply.finish(insights, reply_markup=reply_markup)
+                return
+
+            await self.outbound.delete(loading_message)
+
+            await self.outbound.send(
+                message,
+                text=insights,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
 
     async def check_credits(self, update: Update):
         """Send credit information to the user"""
@@ -210,7 +595,7 @@ class TelegramService:
         if message is None and update.callback_query:
             message = update.callback_query.message
 
-        credit_info = self.db_service.get_credits_info(telegram_id)
+        credit_info = await self.dispatch.run_db(self.db_service.get_credits_info, telegram_id)
         credits = credit_info['credits']
         next_reset = credit_info['next_reset']
         
@@ -232,7 +617,8 @@ class TelegramService:
         elif credits == 1:
             credit_text += "⚠️ 您只剩下 1 點點數！請謹慎使用。"
 
-        await message.reply_text(
+        await self.outbound.send(
+            message,
             text=credit_text,
             parse_mode="HTML",
         )
@@ -246,7 +632,7 @@ class TelegramService:
         if message is None and update.callback_query:
             message = update.callback_query.message
 
-        credits = self.db_service.get_user_credits(telegram_id)
+        credits = await self.dispatch.run_db(self.db_service.get_user_credits, telegram_id)
         if credits <= 0:
             await self.render_out_of_credits(message, telegram_id)
             return
@@ -254,13 +640,15 @@ class TelegramService:
         context.user_data['awaiting_ticker'] = {
             'mode': 'analyze_stock'
         }
-        await message.reply_text(
-            text='請輸入股票代碼。例如：NVDA, 0700',
+        await self.outbound.send(
+            message,
+            text='請輸入股票代碼。例如：NVDA, 0700\n\n一次輸入多個代碼可進行組合分析，例如：NVDA AAPL 0700',
         )
 
     async def news_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         await self.get_financial_news(update)
 
+    @traced('news')
     async def get_financial_news(self, update: Update):
         """Fetch and summarize financial news"""
         user = update.effective_user
@@ -270,17 +658,26 @@ class TelegramService:
         if message is None and update.callback_query:
             message = update.callback_query.message
 
-        credits = self.db_service.get_user_credits(telegram_id)
+        credits = await self.dispatch.run_db(self.db_service.get_user_credits, telegram_id)
         if credits <= 0:
+            set_outcome('no_credits')
             await self.render_out_of_credits(message, telegram_id)
             return
 
-        loading_message = await message.reply_text(
-            text='正在獲取最新新聞摘要 ...',
-        )
+        if self.job_queue.has_job(telegram_id):
+            set_outcome('busy')
+            await self.render_job_in_progress(message)
+            return
 
-        news_articles = self.news_service.get_highlighted_news(limit=5)
-        db_user = self.db_service.get_or_create_user(
+        loading_text = '正在獲取最新新聞摘要 ...'
+        with span('telegram.send'):
+            loading_message = await self.outbound.send(
+                message,
+                text=loading_text,
+            )
+
+        db_user = await self.dispatch.run_db(
+            self.db_service.get_or_create_user,
             telegram_id=user.id,
             username=user.username,
             first_name=user.first_name,
@@ -288,36 +685,81 @@ class TelegramService:
             language=user.language_code
         )
         
-        success, credits_left = self.db_service.use_credit(db_user.get('telegram_id'))
+        success, credits_left = await self.dispatch.run_db(self.db_service.use_credit, db_user.get('telegram_id'))
         if not success:
-            await loading_message.delete()
+            set_outcome('no_credits')
+            await self.outbound.delete(loading_message)
             await self.render_out_of_credits(message, db_user.get('telegram_id'))
             return
 
-        summary, replicate_id = self.replicate_service.summarize_news(news_articles)
-
-        await loading_message.delete()
+        # Shared digest, usually pre-built by the prewarm job
+        result = await self.run_llm_job(telegram_id, loading_message, loading_text, self.news_digest.get_digest)
+        if result is None:
+            return
+        summary, replicate_id, cache_hit = result
+        annotate(cache_hit=cache_hit)
+        if replicate_id == 'error_id':
+            set_outcome('llm_error')
 
         keyboard = [
             [InlineKeyboardButton('返回首頁', callback_data='go_home')],
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
-        await message.reply_text(
-            text=summary,
-            parse_mode='HTML',
-            reply_markup=reply_markup
-        )
+        with span('telegram.send'):
+            await self.outbound.delete(loading_message)
+
+            await self.outbound.send(
+                message,
+                text=summary,
+                parse_mode='HTML',
+                reply_markup=reply_markup
+            )
 
     def setup(self):
         self.application.add_handler(CommandHandler('start', self.start_command))
         self.application.add_handler(CommandHandler('analyze', self.analyze_command))
         self.application.add_handler(CommandHandler('credits', self.credits_command))
         self.application.add_handler(CommandHandler('news', self.news_command))
+        self.application.add_handler(CommandHandler('watchlist', self.watchlist_command))
+        self.application.add_handler(CommandHandler('watch', self.watch_command))
+        self.application.add_handler(CommandHandler('unwatch', self.unwatch_command))
         
         self.application.add_handler(CallbackQueryHandler(self.button_callback))
         self.application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.message_handler))
 
     def run(self):
         # self.setup_chat_menu()
-        self.application.run_polling()
+        if BOT_MODE == 'webhook':
+            asyncio.run(self.run_webhook())
+        elif BOT_MODE == 'worker':
+            asyncio.run(self.run_worker())
+        else:
+            self.application.run_polling()
+
+    async def run_webhook(self):
+        '''Receive updates over HTTPS and queue them for the workers'''
+        import uvicorn
+
+        webhook_app = WebhookApp(UpdateQueue(self.db_service), self.dispatch, WEBHOOK_PATH, WEBHOOK_SECRET_TOKEN)
+        async with self.application:
+            await self.application.bot.set_webhook(
+                url=WEBHOOK_URL.rstrip('/') + WEBHOOK_PATH,
+                secret_token=WEBHOOK_SECRET_TOKEN,
+                allowed_updates=Update.ALL_TYPES,
+            )
+            server = uvicorn.Server(uvicorn.Config(webhook_app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, log_level='warning'))
+            await server.serve()
+
+    async def run_worker(self):
+        '''Process queued updates for this worker's share of chats'''
+        worker = UpdateWorker(self.application, UpdateQueue(self.db_service), self.dispatch)
+        async with self.application:
+            # start() runs the periodic persistence updates
+            await self.application.start()
+            await self.post_init(self.application)
+            try:
+                await worker.run()
+            finally:
+                await self.application.stop()
+                await self.post_shutdown(self.application)
@@ -0,0 +1,5 @@
+from services.updates.update_queue import UpdateQueue
+from services.updates.webhook_app import WebhookApp
+from services.updates.update_worker import UpdateWorker
+
+__all__ = ['UpdateQueue', 'WebhookApp', 'UpdateWorker']
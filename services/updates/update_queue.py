@@ -0,0 +1,115 @@
+import math
+from typing import Dict, List, Set
+from services.database.db_service import DatabaseService
+from config.config import UPDATE_QUEUE_PARTITIONS, UPDATE_QUEUE_LEASE
+
+class UpdateQueue:
+    '''
+    MySQL-backed queue of raw Telegram updates shared by the webhook receiver and the workers.
+    Updates are partitioned by chat id. Each partition is leased to one worker at a time,
+    which processes it in update_id order, so a chat's updates are never handled out of order
+    or by two workers at once. Leases are spread evenly over the live workers.
+    '''
+
+    def __init__(self, db_service: DatabaseService, partitions: int = UPDATE_QUEUE_PARTITIONS, lease: float = UPDATE_QUEUE_LEASE):
+        self.db_service = db_service
+        self.partitions = partitions
+        self.lease = lease
+
+    def partition(self, chat_id: int) -> int:
+        return chat_id % self.partitions
+
+    def enqueue(self, update_id: int, chat_id: int, payload: str) -> bool:
+        '''Store an update. Telegram redelivers on timeouts, so duplicates are ignored. Returns True if new'''
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            sql = '''
+INSERT IGNORE INTO telegram_updates (update_id, chat_id, partition_id, payload)
+VALUES (%s, %s, %s, %s)
+            '''
+            return cursor.execute(sql, (update_id, chat_id, self.partition(chat_id), payload)) == 1
+
+    def ensure_partitions(self):
+        '''Create one lease row per partition, dropping rows left from a larger partition count'''
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('DELETE FROM update_partitions WHERE partition_id >= %s', (self.partitions,))
+            cursor.executemany(
+                'INSERT IGNORE INTO update_partitions (partition_id) VALUES (%s)',
+                [(partition_id,) for partition_id in range(self.partitions)]
+            )
+
+    def claim(self, owner: str, busy: Set[int] = frozenset()) -> List[int]:
+        '''
+        Heartbeat, renew this worker's leases and rebalance towards an equal share.
+        Partitions in `busy` still have updates in flight and are never released.
+        Returns the partitions this worker now owns.
+        '''
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('''
+INSERT INTO update_workers (owner, heartbeat) VALUES (%s, NOW(3))
+ON DUPLICATE KEY UPDATE heartbeat = NOW(3)
+            ''', (owner,))
+            cursor.execute('''
+DELETE FROM update_workers WHERE heartbeat < NOW(3) - INTERVAL %s SECOND
+            ''', (self.lease,))
+            cursor.execute('SELECT COUNT(*) AS count FROM update_workers')
+            share = math.ceil(self.partitions / max(cursor.fetchone()['count'], 1))
+
+            held = cursor.execute('''
+UPDATE update_partitions SET lease_until = NOW(3) + INTERVAL %s SECOND
+WHERE owner = %s
+            ''', (self.lease, owner))
+
+            if held < share:
+                cursor.execute('''
+UPDATE update_partitions SET owner = %s, lease_until = NOW(3) + INTERVAL %s SECOND
+WHERE owner IS NULL OR lease_until < NOW(3)
+ORDER BY partition_id
+LIMIT %s
+                ''', (owner, self.lease, share - held))
+            elif held > share:
+                cursor.execute('SELECT partition_id FROM update_partitions WHERE owner = %s ORDER BY partition_id DESC', (owner,))
+                idle = [row['partition_id'] for row in cursor.fetchall() if row['partition_id'] not in busy]
+                self._release(cursor, owner, idle[:held - share])
+
+            cursor.execute('SELECT partition_id FROM update_partitions WHERE owner = %s', (owner,))
+            return [row['partition_id'] for row in cursor.fetchall()]
+
+    def release(self, owner: str):
+        '''Give up all leases, e.g. on shutdown, so other workers take over immediately'''
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('UPDATE update_partitions SET owner = NULL, lease_until = NULL WHERE owner = %s', (owner,))
+            cursor.execute('DELETE FROM update_workers WHERE owner = %s', (owner,))
+
+    def _release(self, cursor, owner: str, partition_ids: List[int]):
+        if not partition_ids:
+            return
+        placeholders = ', '.join(['%s'] * len(partition_ids))
+        cursor.execute(f'''
+UPDATE update_partitions SET owner = NULL, lease_until = NULL
+WHERE owner = %s AND partition_id IN ({placeholders})
+        ''', (owner, *partition_ids))
+
+    def fetch(self, partition_ids: List[int], limit: int) -> List[Dict]:
+        '''Oldest pending updates in the given partitions, in update_id order'''
+        if not partition_ids:
+            return []
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(partition_ids))
+            sql = f'''
+SELECT update_id, chat_id, partition_id, payload FROM telegram_updates
+WHERE partition_id IN ({placeholders})
+ORDER BY update_id
+LIMIT %s
+            '''
+            cursor.execute(sql, (*partition_ids, limit))
+            return cursor.fetchall()
+
+    def delete(self, update_id: int):
+        '''Remove an update once it has been processed'''
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('DELETE FROM telegram_updates WHERE update_id = %s', (update_id,))
+
+    def pending(self) -> int:
+        with self.db_service.connection() as connection, connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) AS count FROM telegram_updates')
+            return cursor.fetchone()['count']
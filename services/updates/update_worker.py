@@ -0,0 +1,118 @@
+import os
+import json
+import uuid
+import socket
+import asyncio
+from collections import deque
+from typing import Dict
+from telegram import Update
+from telegram.ext import Application
+from services.updates.update_queue import UpdateQueue
+from services.dispatch.dispatch_service import DispatchService
+from config.config import UPDATE_QUEUE_BATCH, UPDATE_QUEUE_POLL_INTERVAL, CONCURRENT_UPDATES
+
+class UpdateWorker:
+    '''
+    Consume queued updates for the partitions this process leases. Different chats are
+    processed concurrently, while each chat's updates run one at a time in update_id order.
+    Rows are deleted only after processing, so a crashed worker's updates are retried.
+    '''
+
+    def __init__(self, application: Application, update_queue: UpdateQueue, dispatch: DispatchService):
+        self.application = application
+        self.update_queue = update_queue
+        self.dispatch = dispatch
+        self.owner = f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+        self.semaphore = asyncio.Semaphore(CONCURRENT_UPDATES)
+        self.partitions = []
+        # chat_id -> pending rows, and the task draining them
+        self.chat_queues: Dict[int, deque] = {}
+        self.chat_tasks: Dict[int, asyncio.Task] = {}
+        # update_id -> partition_id for every row taken but not yet deleted
+        self.in_flight: Dict[int, int] = {}
+        # Rows deleted while a fetch was running may still appear in its result
+        self.recently_done = set()
+        self.metrics = {'processed': 0, 'failed': 0}
+        self.stopping = False
+
+    async def run(self):
+        await self.dispatch.run_db(self.update_queue.ensure_partitions)
+        print(f"Update worker {self.owner} started")
+        try:
+            while True:
+                await self.poll()
+                await asyncio.sleep(UPDATE_QUEUE_POLL_INTERVAL)
+        finally:
+            await self.stop()
+
+    async def poll(self):
+        try:
+            busy = set(self.in_flight.values())
+            self.partitions = await self.dispatch.run_db(self.update_queue.claim, self.owner, busy)
+
+            # Bound the number of rows held in memory
+            limit = UPDATE_QUEUE_BATCH - len(self.in_flight)
+            if limit <= 0:
+                return
+            self.recently_done.clear()
+            rows = await self.dispatch.run_db(self.update_queue.fetch, self.partitions, limit + len(self.in_flight))
+        except Exception as e:
+            print(f"Error polling update queue: {e}")
+            return
+
+        for row in rows:
+            if row['update_id'] in self.in_flight or row['update_id'] in self.recently_done:
+                continue
+            self.in_flight[row['update_id']] = row['partition_id']
+            self.chat_queues.setdefault(row['chat_id'], deque()).append(row)
+            if row['chat_id'] not in self.chat_tasks:
+                self.chat_tasks[row['chat_id']] = asyncio.create_task(self.drain(row['chat_id']))
+
+    async def drain(self, chat_id: int):
+        '''Process one chat's rows in order until its queue is empty'''
+        rows = self.chat_queues[chat_id]
+        try:
+            while rows:
+                row = rows[0]
+                async with self.semaphore:
+                    await self.process(row)
+                await self.dispatch.run_db(self.update_queue.delete, row['update_id'])
+                rows.popleft()
+                del self.in_flight[row['update_id']]
+                self.recently_done.add(row['update_id'])
+        except Exception as e:
+            # Leave the rest for the next poll so the chat's order is kept
+            print(f"Error processing updates for chat {chat_id}: {e}")
+        finally:
+            # However drain ends, rows not deleted are fetched again and their partition released
+            for row in rows:
+                self.in_flight.pop(row['update_id'], None)
+            del self.chat_queues[chat_id]
+            del self.chat_tasks[chat_id]
+
+    async def process(self, row: Dict):
+        try:
+            update = Update.de_json(json.loads(row['payload']), self.application.bot)
+            await self.application.process_update(update)
+            self.metrics['processed'] += 1
+        except asyncio.CancelledError:
+            if self.stopping:
+                raise
+            # A handler cancelled from elsewhere counts as a failed update, not a stopped chat
+            self.metrics['failed'] += 1
+            print(f"Update {row['update_id']} was cancelled")
+        except Exception as e:
+            # Handler errors are not retried; a broken update must not block its chat
+            self.metrics['failed'] += 1
+            print(f"Error processing update {row['update_id']}: {e}")
+
+    async def stop(self):
+        self.stopping = True
+        for task in list(self.chat_tasks.values()):
+            task.cancel()
+        await asyncio.gather(*self.chat_tasks.values(), return_exceptions=True)
+        try:
+            await self.dispatch.run_db(self.update_queue.release, self.owner)
+        except Exception as e:
+            print(f"Error releasing update partitions: {e}")
+        print(f"Update worker {self.owner} stopped: {self.metrics}")
@@ -0,0 +1,99 @@
+import hmac
+import json
+from services.updates.update_queue import UpdateQueue
+from services.dispatch.dispatch_service import DispatchService
+
+SECRET_HEADER = b'x-telegram-bot-api-secret-token'
+
+class WebhookApp:
+    '''
+    Minimal ASGI app that receives Telegram webhook calls and stores them in the update queue.
+    Requests without the configured secret token are rejected. Updates are only enqueued here;
+    workers process them, so Telegram gets its 200 as soon as the row is written.
+    '''
+
+    def __init__(self, update_queue: UpdateQueue, dispatch: DispatchService, path: str, secret_token: str):
+        if not secret_token:
+            raise ValueError('A webhook secret token is required')
+        self.update_queue = update_queue
+        self.dispatch = dispatch
+        self.path = path
+        self.secret_token = secret_token.encode('utf-8')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        if scope['path'] == '/' and scope['method'] == 'GET':
+            await self.respond(send, 200, b'Momentum Financial Bot is running!')
+            return
+        if scope['path'] != self.path:
+            await self.respond(send, 404, b'Not Found')
+            return
+        if scope['method'] != 'POST':
+            await self.respond(send, 405, b'Method Not Allowed')
+            return
+
+        headers = dict(scope['headers'])
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, b''), self.secret_token):
+            await self.respond(send, 403, b'Forbidden')
+            return
+
+        try:
+            body = await self.read_body(receive)
+            data = json.loads(body)
+            update_id = int(data['update_id'])
+        except (ValueError, KeyError, TypeError):
+            await self.respond(send, 400, b'Bad Request')
+            return
+
+        try:
+            await self.dispatch.run_db(self.update_queue.enqueue, update_id, self.chat_id(data), body.decode('utf-8'))
+        except Exception as e:
+            # Telegram retries non-2xx responses, so the update is not lost
+            print(f"Error enqueuing update {update_id}: {e}")
+            await self.respond(send, 503, b'Service Unavailable')
+            return
+
+        await self.respond(send, 200, b'OK')
+
+    def chat_id(self, data: dict) -> int:
+        '''Chat an update belongs to, falling back to the sender for updates without a chat'''
+        for value in data.values():
+            if not isinstance(value, dict):
+                continue
+            chat = value.get('chat') or (value.get('message') or {}).get('chat')
+            if chat:
+                return int(chat['id'])
+            sender = value.get('from') or value.get('user')
+            if sender:
+                return int(sender['id'])
+        return 0
+
+    async def read_body(self, receive) -> bytes:
+        body = b''
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if not message.get('more_body'):
+                return body
+
+    async def respond(self, send, status: int, body: bytes):
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(b'content-type', b'text/plain; charset=utf-8'), (b'content-length', str(len(body)).encode())],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
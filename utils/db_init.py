@@ -43,10 +43,77 @@ CREATE TABLE IF NOT EXISTS analysis_logs (
     user_id INT NOT NULL,
     ticker_symbol VARCHAR(20) NOT NULL,
     replicate_id VARCHAR(255) NOT NULL,
+    cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id)
 )
                 """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS watchlists (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    ticker_symbol VARCHAR(20) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY (user_id, ticker_symbol),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+)
+                """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS telegram_updates (
+    update_id BIGINT PRIMARY KEY,
+    chat_id BIGINT NOT NULL,
+    partition_id INT NOT NULL,
+    payload MEDIUMTEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX (partition_id, update_id)
+)
+                """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS update_partitions (
+    partition_id INT PRIMARY KEY,
+    owner VARCHAR(128),
+    lease_until DATETIME(3),
+    INDEX (owner)
+)
+                """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS update_workers (
+    owner VARCHAR(128) PRIMARY KEY,
+    heartbeat DATETIME(3) NOT NULL
+)
+                """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS persistence_data (
+    kind VARCHAR(8) NOT NULL,
+    id BIGINT NOT NULL,
+    data MEDIUMTEXT NOT NULL,
+    expires_at DOUBLE NOT NULL,
+    PRIMARY KEY (kind, id),
+    INDEX (expires_at)
+)
+                """)
+
+                cursor.execute("""
+CREATE TABLE IF NOT EXISTS prewarm_budget (
+    day DATE PRIMARY KEY,
+    predictions INT NOT NULL
+)
+                """)
+
+                # Tables created before cache_hit was added
+                cursor.execute("""
+SELECT COUNT(*) AS count FROM information_schema.COLUMNS
+WHERE TABLE_SCHEMA = 'momentum' AND TABLE_NAME = 'analysis_logs' AND COLUMN_NAME = 'cache_hit'
+                """)
+                if cursor.fetchone()['count'] == 0:
+                    cursor.execute("""
+ALTER TABLE analysis_logs ADD COLUMN cache_hit BOOLEAN NOT NULL DEFAULT FALSE AFTER replicate_id
+                    """)
                 
                 connection.commit()
                 print("Database initialized successfully")
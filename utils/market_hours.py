@@ -0,0 +1,31 @@
+from datetime import datetime, time
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# Regular trading sessions by Yahoo ticker suffix: (timezone, open, close)
+MARKET_SESSIONS = {
+    '': ('America/New_York', time(9, 30), time(16, 0)),
+    'HK': ('Asia/Hong_Kong', time(9, 30), time(16, 0)),
+    'SS': ('Asia/Shanghai', time(9, 30), time(15, 0)),
+    'SZ': ('Asia/Shanghai', time(9, 30), time(15, 0)),
+    'T': ('Asia/Tokyo', time(9, 0), time(15, 30)),
+    'KS': ('Asia/Seoul', time(9, 0), time(15, 30)),
+    'TW': ('Asia/Taipei', time(9, 0), time(13, 30)),
+    'SI': ('Asia/Singapore', time(9, 0), time(17, 0)),
+    'AX': ('Australia/Sydney', time(10, 0), time(16, 0)),
+    'L': ('Europe/London', time(8, 0), time(16, 30)),
+    'DE': ('Europe/Berlin', time(9, 0), time(17, 30)),
+    'PA': ('Europe/Paris', time(9, 0), time(17, 30)),
+    'TO': ('America/Toronto', time(9, 30), time(16, 0)),
+}
+
+def market_session(ticker: str):
+    '''Trading session for a ticker, falling back to the US session for unknown suffixes'''
+    suffix = ticker.rsplit('.', 1)[1].upper() if '.' in ticker else ''
+    return MARKET_SESSIONS.get(suffix, MARKET_SESSIONS[''])
+
+def is_market_open(ticker: str, now: Optional[datetime] = None) -> bool:
+    '''Whether the ticker's exchange is in its regular session. Holidays are not considered'''
+    tz, open_time, close_time = market_session(ticker)
+    local = (now or datetime.now(ZoneInfo('UTC'))).astimezone(ZoneInfo(tz))
+    return local.weekday() < 5 and open_time <= local.time() <= close_time
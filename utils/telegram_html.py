@@ -0,0 +1,131 @@
+import re
+from typing import List, Tuple
+
+# Telegram message length limit, in characters
+MAX_MESSAGE_LENGTH = 4096
+
+TELEGRAM_TAGS = ('b', 'strong', 'i', 'em', 'u', 'ins', 's', 'strike', 'del', 'a', 'code', 'pre')
+TAG_PATTERN = re.compile(r'<(/?)(' + '|'.join(TELEGRAM_TAGS) + r')(?:\s+[^>]*)?>', re.IGNORECASE)
+INCOMPLETE_TAG_PATTERN = re.compile(r'<(?:/?[a-zA-Z][^<>]*|/)?$')
+
+def strip_incomplete_tag(text: str) -> str:
+    '''Drop a tag that has been opened but not yet closed at the end of a partial buffer, e.g. "...<b" '''
+    # An incomplete tag contains no other '<', so only the last one can start it
+    start = text.rfind('<')
+    if start == -1:
+        return text
+    return text[:start] if INCOMPLETE_TAG_PATTERN.match(text, start) else text
+
+def walk_tags(text: str, end: int = None) -> Tuple[List[Tuple[str, str]], List[str]]:
+    '''
+    Walk the Telegram tags in text[:end] once and return (open, stray): (name, opening tag)
+    of the tags still open at the end, outermost first, and closing tags with no opening tag
+    '''
+    stack, stray = [], []
+    for match in TAG_PATTERN.finditer(text, 0, len(text) if end is None else end):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append((name, match.group(0)))
+            continue
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i][0] == name:
+                # Drop everything opened after the matching tag as well
+                del stack[i:]
+                break
+        else:
+            stray.append(name)
+    return stack, stray
+
+def scan_tags(text: str) -> Tuple[List[str], List[str]]:
+    '''Names of the tags left open in text, outermost first, and of unmatched closing tags'''
+    stack, stray = walk_tags(text)
+    return [name for name, _ in stack], stray
+
+def is_balanced(text: str) -> bool:
+    '''True when every Telegram tag in text is closed in order and no closing tag is unmatched'''
+    stack = []
+    for match in TAG_PATTERN.finditer(text):
+        closing, name = match.group(1), match.group(2).lower()
+        if not closing:
+            stack.append(name)
+        elif stack and stack[-1] == name:
+            stack.pop()
+        else:
+            return False
+    return not stack
+
+def close_open_tags(text: str) -> str:
+    '''Append closing tags for any Telegram tags left open in text'''
+    stack, _ = scan_tags(text)
+    return text + ''.join(f'</{name}>' for name in reversed(stack))
+
+def find_break(text: str, start: int, end: int, html: bool = True) -> int:
+    '''
+    Where to cut text[start:end] so the first part ends before `end`: the last paragraph,
+    line or word break in the second half, else `end` moved back out of any tag or entity
+    '''
+    middle = start + (end - start) // 2
+    for separator in ('\n\n', '\n', ' '):
+        cut = text.rfind(separator, middle, end)
+        # Attributes can contain spaces, so a break must not be inside a tag
+        if cut > start and not (html and text.rfind('<', start, cut) > text.rfind('>', start, cut)):
+            return cut
+    cut = end
+    if html:
+        tag = text.rfind('<', start, cut)
+        if tag > text.rfind('>', start, cut):
+            cut = tag
+        entity = text.rfind('&', start, cut)
+        if entity != -1 and cut - entity <= 10 and ';' not in text[entity:cut]:
+            cut = entity
+    return cut if cut > start else end
+
+def split_text(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    '''Split plain text into parts of at most limit characters at paragraph, line or word breaks'''
+    parts = []
+    while len(text) > limit:
+        cut = find_break(text, 0, limit, html=False)
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    parts.append(text)
+    return [part for part in parts if part]
+
+def cut_html(body: str, start: int, limit: int) -> Tuple[int, List[Tuple[str, str]], str]:
+    '''
+    Where to end a message holding body[:limit], with the text from `start` on allowed to be
+    cut: returns (cut, open, closing) where body[:cut] + closing is at most limit characters
+    '''
+    end = limit
+    while True:
+        cut = find_break(body, start, end)
+        stack, _ = walk_tags(body, cut)
+        closing = ''.join(f'</{name}>' for name, _ in reversed(stack))
+        if cut + len(closing) <= limit or end <= start + 1:
+            return cut, stack, closing
+        # Leave room for the closing tags and look for an earlier break
+        end = max(start + 1, min(end - 1, limit - len(closing)))
+
+def truncate_html(text: str, limit: int = MAX_MESSAGE_LENGTH) -> str:
+    '''The first message split_html would make of text, with the tags open at the cut closed'''
+    if len(text) <= limit:
+        return text
+    cut, _, closing = cut_html(text, 0, limit)
+    return text[:cut].rstrip() + closing
+
+def split_html(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    '''
+    Split Telegram HTML into messages of at most limit characters, cutting at paragraph,
+    line or word breaks outside tags and entities. Tags open at a cut are closed at the
+    end of one part and reopened at the start of the next, so each part parses on its own.
+    '''
+    parts = []
+    reopen = ''
+    while len(reopen) + len(text) > limit:
+        body = reopen + text
+        cut, stack, closing = cut_html(body, len(reopen), limit)
+        parts.append(body[:cut].rstrip() + closing)
+        reopen = ''.join(tag for _, tag in stack)
+        text = body[cut:].lstrip()
+    parts.append(reopen + text)
+    # A cut just before closing tags leaves a part with nothing but tags
+    return [part for part in parts if TAG_PATTERN.sub('', part).strip()]
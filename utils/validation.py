@@ -38,6 +38,26 @@ class Validation:
         # Otherwise assume it's a US stock (return as is)
         return ticker
         
+    def parse_tickers(self, text: str) -> tuple[list[str], str]:
+        """
+        Split a message like "NVDA AAPL, 0700" into formatted, de-duplicated tickers
+        Returns (tickers, error_message)
+        """
+        tickers = []
+        for ticker in re.split(r'[\s,，]+', text or ''):
+            if not ticker:
+                continue
+            is_valid, error_message = self.validate_ticker(ticker)
+            if not is_valid:
+                return [], f"{error_message}：{ticker}"
+            formatted_ticker = self.format_ticker(ticker)
+            if formatted_ticker not in tickers:
+                tickers.append(formatted_ticker)
+
+        if not tickers:
+            return [], "股票代碼不能為空"
+        return tickers, ""
+
     def format_telegram_message(self, message: str) -> str:
         """
         Format message for Telegram's MarkdownV2 format